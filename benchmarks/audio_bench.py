@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Audio source lookup cost: pactl on every start vs the cached registry.
+
+Resolves the "auto" source and lists monitor sources the way recording
+start and the settings window do, first by running pactl each time (the
+old behaviour), then from a registry that is watching `pactl subscribe`:
+
+    python3 benchmarks/audio_bench.py --runs 50
+
+Needs a running PulseAudio or PipeWire server. Start latency logs
+(~/.config/quick-webm-recorder/start_latency.jsonl) also record the
+per-recording lookup time as audio_resolve_ms and the cost of a pactl
+lookup as audio_lookup_ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from audio import AudioSources  # noqa: E402
+
+
+def time_lookups(sources, runs):
+    """Milliseconds per resolve("auto") + monitor_sources() pair."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        sources.resolve("auto")
+        sources.monitor_sources()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summary(samples):
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    uncached = AudioSources()
+    pactl = time_lookups(uncached, args.runs)
+
+    cached = AudioSources()
+    cached.watch()
+    try:
+        registry = time_lookups(cached, args.runs)
+    finally:
+        cached.stop()
+
+    result = {
+        "runs": args.runs,
+        "default_source": uncached.resolve("auto"),
+        "pactl": summary(pactl),
+        "registry": summary(registry),
+        "saved_per_start_ms": round(statistics.median(pactl) - statistics.median(registry), 3),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
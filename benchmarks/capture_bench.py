@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Capture throughput benchmark under a virtual X server.
+
+Starts Xvfb with synthetic animated content (ffplay playing testsrc2),
+drives the real Recorder class over a matrix of region sizes, framerates
+and quality profiles, and writes JSON results that can be compared across
+releases:
+
+    python3 benchmarks/capture_bench.py -o results-1.1.json
+    python3 benchmarks/capture_bench.py -o results-1.2.json --compare results-1.1.json
+
+Requires Xvfb, ffmpeg and ffplay. The benchmark runs with a throwaway
+HOME so it never reads or writes the user's settings or calibration.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+SIZES = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+FRAMERATES = [15, 30, 60]
+PROFILES = ["lossless", "high", "medium", "low", "tiny"]
+BACKENDS = ["x11grab"]
+
+# Metrics where a higher value is a regression (the rest: lower is worse)
+HIGHER_IS_WORSE = {"dropped_frames", "duplicated_frames", "cpu_seconds", "peak_rss_mb",
+                   "size_mb", "start_latency_ms"}
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def start_xvfb(display, width, height):
+    xvfb = subprocess.Popen(
+        ['Xvfb', display, '-screen', '0', f'{width}x{height}x24', '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    # Wait for the server socket to appear
+    socket_path = f"/tmp/.X11-unix/X{display.lstrip(':')}"
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if xvfb.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Xvfb failed to start")
+        time.sleep(0.05)
+    return xvfb
+
+
+def start_content(width, height):
+    """Full-screen animated test pattern so every frame differs."""
+    return subprocess.Popen(
+        ['ffplay', '-loglevel', 'quiet', '-noborder', '-left', '0', '-top', '0',
+         '-x', str(width), '-y', str(height),
+         '-f', 'lavfi', f'testsrc2=size={width}x{height}:rate=60'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+class ProcessSampler:
+    """Samples CPU time and peak RSS of a process from /proc."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.cpu_seconds = 0.0
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        ticks = os.sysconf('SC_CLK_TCK')
+        while not self._stop.is_set():
+            try:
+                with open(f"/proc/{self.pid}/stat") as f:
+                    # Fields after the command name; utime and stime are 14 and 15
+                    fields = f.read().rsplit(')', 1)[1].split()
+                self.cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+                with open(f"/proc/{self.pid}/status") as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            self.peak_rss_kb = max(self.peak_rss_kb, int(line.split()[1]))
+            except (OSError, IndexError, ValueError):
+                return  # Process exited
+            self._stop.wait(0.1)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_case(recorder, config, backend, size_name, framerate, profile, duration):
+    width, height = SIZES[size_name]
+    config.capture_backend = backend
+    config.framerate = framerate
+    config.quality_profile = profile
+
+    recorder.start(0, 0, width, height)
+    sampler = ProcessSampler(recorder.process.pid)
+    # SHM capture runs in this process, so its CPU time counts too
+    own_cpu_start = time.process_time()
+    time.sleep(duration)
+    stats = recorder.get_stats() or {}
+    own_cpu = time.process_time() - own_cpu_start
+    sampler.stop()
+    output_path = recorder.stop()
+
+    frames = stats.get("frame") or 0
+    size_bytes = 0
+    if os.path.exists(output_path):
+        size_bytes = os.path.getsize(output_path)
+        os.remove(output_path)
+    return {
+        "backend": backend,
+        "size": size_name,
+        "framerate": framerate,
+        "profile": profile,
+        "achieved_fps": round(frames / duration, 2),
+        "speed": stats.get("speed"),
+        "dropped_frames": stats.get("drop_frames", 0),
+        # Padding ffmpeg inserted for frames that were captured late
+        "duplicated_frames": stats.get("dup_frames", 0),
+        "cpu_seconds": round(sampler.cpu_seconds + own_cpu, 2),
+        "peak_rss_mb": round(sampler.peak_rss_kb / 1024, 1),
+        "size_mb": round(size_bytes / 1e6, 2),
+        "start_latency_ms": (round(recorder.start_latency * 1000, 1)
+                             if recorder.start_latency is not None else None),
+    }
+
+
+def case_key(result):
+    return (result.get("backend", "x11grab"), result["size"], result["framerate"],
+            result["profile"])
+
+
+def compare(results, baseline_path, threshold):
+    """Print metrics that got worse than the baseline by more than threshold."""
+    with open(baseline_path) as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    regressions = 0
+    for result in results:
+        old = baseline.get(case_key(result))
+        if not old:
+            continue
+        for metric, value in result.items():
+            old_value = old.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old_value, (int, float)):
+                continue
+            if metric == "framerate" or old_value == 0:
+                continue
+            change = (value - old_value) / old_value
+            worse = change > threshold if metric in HIGHER_IS_WORSE else change < -threshold
+            if worse:
+                regressions += 1
+                print(f"REGRESSION {case_key(result)} {metric}: {old_value} -> {value} "
+                      f"({change * 100:+.0f}%)")
+    print(f"{regressions} regression(s) against {baseline_path}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--backends', default=",".join(BACKENDS),
+                        help="capture backends to compare: x11grab, shm")
+    parser.add_argument('--sizes', default=",".join(SIZES),
+                        help="comma-separated subset of " + ", ".join(SIZES))
+    parser.add_argument('--framerates', default=",".join(map(str, FRAMERATES)))
+    parser.add_argument('--profiles', default=",".join(PROFILES))
+    parser.add_argument('--duration', type=float, default=10, help="seconds per case")
+    parser.add_argument('--display', default=':99')
+    parser.add_argument('-o', '--output', default=f"capture-bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument('--compare', help="baseline results JSON to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative change treated as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    sizes = args.sizes.split(",")
+    framerates = [int(f) for f in args.framerates.split(",")]
+    profiles = args.profiles.split(",")
+    screen_w = max(SIZES[s][0] for s in sizes)
+    screen_h = max(SIZES[s][1] for s in sizes)
+
+    # Isolate from the user's config before the app modules read HOME
+    home = tempfile.mkdtemp(prefix="qwr-bench-")
+    os.environ['HOME'] = home
+    os.environ['DISPLAY'] = args.display
+    sys.path.insert(0, SRC_DIR)
+    from config import Config
+    from recorder import Recorder
+
+    config = Config()
+    config.output_dir = os.path.join(home, "out")
+    config.audio_source = "none"
+    recorder = Recorder(config)
+
+    xvfb = start_xvfb(args.display, screen_w, screen_h)
+    content = start_content(screen_w, screen_h)
+    results = []
+    try:
+        time.sleep(1)  # Let the content window map
+        for backend in backends:
+            for size_name in sizes:
+                for framerate in framerates:
+                    for profile in profiles:
+                        result = run_case(recorder, config, backend, size_name,
+                                          framerate, profile, args.duration)
+                        print(json.dumps(result))
+                        results.append(result)
+    finally:
+        content.terminate()
+        xvfb.terminate()
+        shutil.rmtree(home, ignore_errors=True)
+
+    ffmpeg_version = subprocess.run(['ffmpeg', '-version'], capture_output=True,
+                                    text=True).stdout.split("\n")[0]
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "ffmpeg": ffmpeg_version,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
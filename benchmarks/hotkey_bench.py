@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Hotkey backend cost: pynput listeners vs passive X key grabs.
+
+Starts Xvfb, runs each backend in a child process with the app's three
+default hotkeys bound, and measures the child's CPU time and wakeups
+(context switches across all its threads) while the keyboard is idle and
+while unrelated keys are typed. It then presses a bound chord a few times
+to check the backend still fires:
+
+    python3 benchmarks/hotkey_bench.py --duration 10 --rate 20
+
+Keys are typed through the XTEST extension. Requires Xvfb and
+python-xlib (installed with pynput).
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from capture_bench import SRC_DIR, start_xvfb
+
+BACKENDS = ["listener", "grab"]
+HOTKEYS = {"mp4": "<cmd>+<shift>+c", "gif": "<cmd>+<shift>+g", "replay": "<cmd>+<shift>+r"}
+TYPED_KEYS = "the quick brown fox jumps over a lazy dog"
+
+
+def run_child(backend):
+    """Bind HOTKEYS with one backend and report every trigger on stdout."""
+    sys.path.insert(0, SRC_DIR)
+    from gi.repository import GLib
+    from hotkey import KeyGrabber, ListenerHotkeys
+
+    hotkeys = KeyGrabber() if backend == "grab" else ListenerHotkeys()
+    for name, hotkey_str in HOTKEYS.items():
+        hotkeys.bind(name, hotkey_str, lambda name=name: print(f"fired {name}", flush=True))
+    hotkeys.start()
+    print("ready", flush=True)
+    try:
+        GLib.MainLoop().run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hotkeys.stop()
+
+
+def process_usage(pid):
+    """(CPU seconds, context switches) of a process, summed over its threads."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    switches = 0
+    for status in glob.glob(f"/proc/{pid}/task/*/status"):
+        try:
+            with open(status) as f:
+                for line in f:
+                    if line.startswith(("voluntary_ctxt_switches", "nonvoluntary_ctxt_switches")):
+                        switches += int(line.split()[1])
+        except OSError:
+            pass  # Thread exited
+    return cpu, switches
+
+
+class Keyboard:
+    """Synthetic key presses through XTEST."""
+
+    def __init__(self):
+        from Xlib import X, XK
+        from Xlib.display import Display
+        from Xlib.ext import xtest
+        self._X = X
+        self._xtest = xtest
+        self._display = Display()
+        self._keycode = lambda name: self._display.keysym_to_keycode(XK.string_to_keysym(name))
+
+    def tap(self, *names):
+        keycodes = [self._keycode(name) for name in names]
+        for keycode in keycodes:
+            self._xtest.fake_input(self._display, self._X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            self._xtest.fake_input(self._display, self._X.KeyRelease, keycode)
+        self._display.sync()
+
+
+def measure(pid, seconds, action=None, rate=0):
+    """Usage of pid over seconds, calling action rate times a second."""
+    cpu, switches = process_usage(pid)
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        if action and rate:
+            action(i)
+            i += 1
+            time.sleep(1 / rate)
+        else:
+            time.sleep(deadline - time.monotonic())
+    cpu_after, switches_after = process_usage(pid)
+    return {
+        "cpu_ms": round((cpu_after - cpu) * 1000, 1),
+        "wakeups_per_s": round((switches_after - switches) / seconds, 1),
+    }
+
+
+def run_backend(backend, keyboard, duration, rate, presses):
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', backend],
+                             stdout=subprocess.PIPE, text=True)
+    fired = []
+    ready = threading.Event()
+
+    def read_output():
+        for line in child.stdout:
+            if line.strip() == "ready":
+                ready.set()
+            elif line.startswith("fired"):
+                fired.append(line.split()[1])
+
+    threading.Thread(target=read_output, daemon=True).start()
+    if not ready.wait(10):
+        child.kill()
+        raise RuntimeError(f"{backend} backend failed to start")
+    time.sleep(1)  # Let listener threads settle
+
+    try:
+        idle = measure(child.pid, duration)
+        typing = measure(child.pid, duration,
+                         lambda i: keyboard.tap(TYPED_KEYS[i % len(TYPED_KEYS)].replace(' ', 'space')),
+                         rate)
+        for _ in range(presses):
+            keyboard.tap('Super_L', 'Shift_L', 'c')
+            time.sleep(0.2)
+        time.sleep(0.5)
+    finally:
+        child.terminate()
+        child.wait()
+    return {
+        "backend": backend,
+        "idle": idle,
+        "typing": typing,
+        "hotkey_presses": presses,
+        "hotkey_fired": fired.count("mp4"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--duration', type=float, default=10, help="seconds per phase")
+    parser.add_argument('--rate', type=float, default=20, help="typed keys per second")
+    parser.add_argument('--presses', type=int, default=5, help="bound chord presses")
+    parser.add_argument('--display', default=':99')
+    parser.add_argument('--backends', default=",".join(BACKENDS))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    xvfb = start_xvfb(args.display, 1280, 720)
+    os.environ['DISPLAY'] = args.display
+    try:
+        keyboard = Keyboard()
+        results = [run_backend(backend, keyboard, args.duration, args.rate, args.presses)
+                   for backend in args.backends.split(",")]
+    finally:
+        xvfb.terminate()
+    print(json.dumps({"duration": args.duration, "rate": args.rate, "results": results},
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
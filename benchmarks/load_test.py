@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Scheduling policy load test.
+
+Checks that the capture and post-processing priorities from Settings
+actually help on a loaded machine:
+
+- capture: records under Xvfb while one busy-loop process per CPU competes
+  for the processor, once per capture policy, and reports achieved fps and
+  dropped and duplicated frames
+- conversion: runs a GIF conversion next to a CPU-bound foreground task,
+  with and without low-priority conversions, and reports how much
+  foreground work got done
+
+    python3 benchmarks/load_test.py -o load.json
+
+Raising capture priority needs permission to lower nice values (root or
+an RLIMIT_NICE entry in /etc/security/limits.conf); the report records
+the nice value that was actually allowed. Requires Xvfb, ffmpeg and
+ffplay.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from capture_bench import SIZES, SRC_DIR, start_content, start_xvfb
+
+CAPTURE_POLICIES = {
+    "default": {"capture_priority": "normal", "capture_cpus": ""},
+    "high": {"capture_priority": "high", "capture_cpus": ""},
+}
+
+
+def _busy_loop():
+    while True:
+        pass
+
+
+def start_load(count):
+    """Start count CPU-bound processes at default priority."""
+    hogs = [multiprocessing.Process(target=_busy_loop, daemon=True) for _ in range(count)]
+    for hog in hogs:
+        hog.start()
+    return hogs
+
+
+def stop_load(hogs):
+    for hog in hogs:
+        hog.terminate()
+        hog.join()
+
+
+def run_capture_case(recorder, config, policy, size_name, framerate, duration):
+    width, height = SIZES[size_name]
+    with config.transaction():
+        for key, value in CAPTURE_POLICIES[policy].items():
+            setattr(config, key, value)
+        config.framerate = framerate
+
+    recorder.start(0, 0, width, height)
+    time.sleep(duration)
+    stats = recorder.get_stats() or {}
+    try:
+        nice = os.getpriority(os.PRIO_PROCESS, recorder.process.pid)
+    except OSError:
+        nice = None
+    output_path = recorder.stop()
+    if output_path and os.path.exists(output_path):
+        os.remove(output_path)
+
+    frames = stats.get("frame") or 0
+    return {
+        "test": "capture",
+        "policy": policy,
+        "size": size_name,
+        "framerate": framerate,
+        "capture_nice": nice,
+        "achieved_fps": round(frames / duration, 2),
+        "speed": stats.get("speed"),
+        "dropped_frames": stats.get("drop_frames", 0),
+        "duplicated_frames": stats.get("dup_frames", 0),
+    }
+
+
+def _count_work(seconds):
+    """Foreground CPU work: loop iterations completed in seconds."""
+    count = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        count += 1
+    return count
+
+
+def run_conversion_case(config, low_priority, work_dir, duration):
+    from priority import background_wrapper
+
+    config.background_low_priority = low_priority
+    source = os.path.join(work_dir, "source.mp4")
+    if not os.path.exists(source):
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error',
+                        '-f', 'lavfi', '-i', 'testsrc2=size=1920x1080:rate=30',
+                        '-t', '20', '-c:v', 'libx264', '-preset', 'ultrafast', source],
+                       check=True)
+    # Pin the foreground task and the conversion to one CPU so they compete
+    allowed = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, {min(allowed)})
+    try:
+        baseline = _count_work(duration)
+        conversion = subprocess.Popen(
+            background_wrapper(config) + ['ffmpeg', '-y', '-loglevel', 'error', '-i', source,
+             '-vf', 'fps=15,split[a][b];[a]palettegen[p];[b][p]paletteuse',
+             os.path.join(work_dir, "out.gif")],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        loaded = _count_work(duration)
+        conversion.kill()
+        conversion.wait()
+    finally:
+        os.sched_setaffinity(0, allowed)
+    return {
+        "test": "conversion",
+        "policy": "low" if low_priority else "default",
+        "foreground_work_ratio": round(loaded / baseline, 3) if baseline else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--sizes', default="1080p",
+                        help="comma-separated subset of " + ", ".join(SIZES))
+    parser.add_argument('--framerates', default="30,60")
+    parser.add_argument('--load', type=int, default=os.cpu_count() or 1,
+                        help="busy-loop processes to run during capture (default: one per CPU)")
+    parser.add_argument('--capture-cpus', default="",
+                        help="also test a policy pinning capture to these CPUs, e.g. 2,3")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per case")
+    parser.add_argument('--display', default=':99')
+    parser.add_argument('-o', '--output', default=f"load-test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    framerates = [int(f) for f in args.framerates.split(",")]
+    if args.capture_cpus:
+        CAPTURE_POLICIES["high+pinned"] = {"capture_priority": "high",
+                                           "capture_cpus": args.capture_cpus}
+    screen_w = max(SIZES[s][0] for s in sizes)
+    screen_h = max(SIZES[s][1] for s in sizes)
+
+    # Isolate from the user's config before the app modules read HOME
+    home = tempfile.mkdtemp(prefix="qwr-load-")
+    os.environ['HOME'] = home
+    os.environ['DISPLAY'] = args.display
+    sys.path.insert(0, SRC_DIR)
+    from config import Config
+    from recorder import Recorder
+
+    config = Config()
+    config.output_dir = os.path.join(home, "out")
+    config.audio_source = "none"
+    recorder = Recorder(config)
+
+    xvfb = start_xvfb(args.display, screen_w, screen_h)
+    content = start_content(screen_w, screen_h)
+    results = []
+    try:
+        time.sleep(1)  # Let the content window map
+        hogs = start_load(args.load)
+        try:
+            for policy in CAPTURE_POLICIES:
+                for size_name in sizes:
+                    for framerate in framerates:
+                        result = run_capture_case(recorder, config, policy, size_name,
+                                                  framerate, args.duration)
+                        print(json.dumps(result))
+                        results.append(result)
+        finally:
+            stop_load(hogs)
+
+        for low_priority in (False, True):
+            result = run_conversion_case(config, low_priority, home, args.duration)
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        content.terminate()
+        xvfb.terminate()
+        shutil.rmtree(home, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "load_processes": args.load,
+            "duration": args.duration,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Selection overlay paint cost: full repaints vs damage-limited frames.
+
+Replays a selection drag across an overlay the size of the whole desktop
+(two side-by-side 4K monitors by default) on an offscreen cairo surface,
+painting it the way the overlay's draw handler does:
+
+- full: the old behaviour, the whole overlay repainted for every pointer
+  motion event
+- damage: motion merged to one update per frame, repainting only the
+  region selection_damage() invalidates
+
+    python3 benchmarks/overlay_bench.py --pointer-hz 1000 --frame-hz 60
+
+Needs pycairo and PyGObject (GTK is imported but no display is used).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cairo
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from overlay import SelectionManager, paint_overlay, selection_damage  # noqa: E402
+
+
+def drag_path(width, height, events):
+    """Cutout rects for a drag from a third of the way in toward the far corner."""
+    x0, y0 = width // 3, height // 3
+    for i in range(1, events + 1):
+        yield x0, y0, (width - x0) * i // (events + 1), (height - y0) * i // (events + 1)
+
+
+def paint(surface, rect, damage=None):
+    """Milliseconds to paint one overlay frame, clipped to damage if given."""
+    cr = cairo.Context(surface)
+    started = time.perf_counter()
+    if damage is not None:
+        for i in range(damage.num_rectangles()):
+            r = damage.get_rectangle(i)
+            cr.rectangle(r.x, r.y, r.width, r.height)
+        cr.clip()
+    paint_overlay(cr, rect, SelectionManager.OVERLAY_OPACITY)
+    surface.flush()
+    return (time.perf_counter() - started) * 1000
+
+
+def region_area(region):
+    return sum(region.get_rectangle(i).width * region.get_rectangle(i).height
+               for i in range(region.num_rectangles()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--width', type=int, default=7680)
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--pointer-hz', type=int, default=1000, help="motion events per second")
+    parser.add_argument('--frame-hz', type=int, default=60, help="frame clock rate")
+    parser.add_argument('--seconds', type=float, default=2, help="length of the drag")
+    args = parser.parse_args()
+
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, args.width, args.height)
+    events = list(drag_path(args.width, args.height, int(args.pointer_hz * args.seconds)))
+
+    full = [paint(surface, rect) for rect in events]
+
+    per_frame = max(1, args.pointer_hz // args.frame_hz)
+    damage_times = []
+    damaged = []
+    drawn = None
+    paint(surface, drawn)
+    for rect in events[per_frame - 1::per_frame]:
+        damage = selection_damage(drawn, rect)
+        damaged.append(region_area(damage) / (args.width * args.height))
+        damage_times.append(paint(surface, rect, damage))
+        drawn = rect
+
+    result = {
+        "surface": f"{args.width}x{args.height}",
+        "pointer_hz": args.pointer_hz,
+        "frame_hz": args.frame_hz,
+        "full": {
+            "paints": len(full),
+            "median_ms": round(statistics.median(full), 3),
+            "paint_ms_per_drag_second": round(sum(full) / args.seconds, 1),
+        },
+        "damage": {
+            "paints": len(damage_times),
+            "median_ms": round(statistics.median(damage_times), 3),
+            "paint_ms_per_drag_second": round(sum(damage_times) / args.seconds, 1),
+            "median_damaged_fraction": round(statistics.median(damaged), 5),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
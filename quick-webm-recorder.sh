@@ -1,3 +1,7 @@
 #!/bin/bash
 cd /app/lib/quick-webm-recorder
-exec python3 main.py "$@"
+if [ $# -gt 0 ]; then
+    # Commands for the running instance (see control.py)
+    exec python3 control.py "$@"
+fi
+exec python3 main.py
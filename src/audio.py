@@ -0,0 +1,156 @@
+"""Cached PulseAudio/PipeWire source lookup.
+
+Resolving the "auto" source and listing monitor sources both mean
+running pactl, which costs several milliseconds each time. The registry
+asks once, then keeps its answer current by following `pactl subscribe`,
+so recording start and the settings window never wait on a subprocess.
+"""
+import subprocess
+import threading
+import time
+
+# Events that can change the default sink or the list of monitor sources.
+# Sink/source 'change' events fire on every volume tweak and are ignored.
+REFRESH_EVENTS = ("'change' on server", "'new' on sink", "'remove' on sink",
+                  "'new' on source", "'remove' on source")
+
+# Coalesce bursts of events (a device appearing adds a sink and a source)
+REFRESH_DELAY = 0.1
+RESUBSCRIBE_DELAY = 2
+
+
+def friendly_source_name(source_name):
+    """A compact display name for a monitor source."""
+    friendly = source_name.replace('alsa_output.', '').replace('.monitor', '')
+    friendly = friendly.replace('_', ' ').replace('-', ' ')
+    # Capitalize first letter of each word
+    return friendly.title()
+
+
+def query_default_sink():
+    try:
+        result = subprocess.run(
+            ['pactl', 'get-default-sink'],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip() or None
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def query_monitor_sources():
+    """[(source name, friendly name)] for every monitor source."""
+    sources = []
+    try:
+        result = subprocess.run(
+            ['pactl', 'list', 'short', 'sources'],
+            capture_output=True, text=True, check=True
+        )
+        for line in result.stdout.strip().split('\n'):
+            if '.monitor' in line:
+                parts = line.split('\t')
+                if len(parts) >= 2:
+                    sources.append((parts[1], friendly_source_name(parts[1])))
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        pass
+    return sources
+
+
+class AudioSources:
+    """Default sink and monitor sources, kept current by pactl subscribe.
+
+    Until watch() is called every lookup queries pactl directly, so
+    short-lived users (benchmarks, scripts) always see fresh values.
+    """
+
+    def __init__(self):
+        self._snapshot = None  # (default sink, monitor sources)
+        self.refresh_seconds = None  # How long the last pactl lookup took
+        self._watching = False
+        self._process = None
+        self._stop = threading.Event()
+        self._dirty = threading.Event()
+
+    def refresh(self):
+        """Query pactl now and cache the result."""
+        started = time.perf_counter()
+        self._snapshot = (query_default_sink(), query_monitor_sources())
+        self.refresh_seconds = time.perf_counter() - started
+        return self._snapshot
+
+    def _cached(self):
+        """The watched snapshot, or None when lookups should ask pactl."""
+        return self._snapshot if self._watching else None
+
+    def monitor_sources(self):
+        snapshot = self._cached()
+        if snapshot is None:
+            return query_monitor_sources()
+        return list(snapshot[1])
+
+    def default_sink(self):
+        snapshot = self._cached()
+        if snapshot is not None:
+            return snapshot[0]
+        # A single pactl call; the source list isn't needed
+        started = time.perf_counter()
+        sink = query_default_sink()
+        self.refresh_seconds = time.perf_counter() - started
+        return sink
+
+    def resolve(self, setting):
+        """Source name for an audio_source setting ("auto", "none" or a name)."""
+        if setting == "none":
+            return None
+        if setting == "auto":
+            default_sink = self.default_sink()
+            return f"{default_sink}.monitor" if default_sink else None
+        return setting
+
+    def watch(self):
+        """Resolve once and follow sink/source changes in the background."""
+        if self._watching:
+            return
+        self._watching = True
+        self._stop.clear()
+        self.refresh()
+        threading.Thread(target=self._subscribe_loop, daemon=True).start()
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._dirty.set()  # Wake the refresh thread so it exits
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+        self._watching = False
+
+    def _subscribe_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._process = subprocess.Popen(
+                    ['pactl', 'subscribe'],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+                )
+            except FileNotFoundError:
+                return  # No pactl; lookups keep returning the first answer
+            for line in self._process.stdout:
+                if any(event in line for event in REFRESH_EVENTS):
+                    self._dirty.set()
+            self._process.wait()
+            # The sound server restarted or pactl died; our view may be stale
+            self._dirty.set()
+            self._stop.wait(RESUBSCRIBE_DELAY)
+
+    def _refresh_loop(self):
+        while True:
+            self._dirty.wait()
+            if self._stop.is_set():
+                return
+            time.sleep(REFRESH_DELAY)
+            self._dirty.clear()
+            self.refresh()
+
+
+# Shared by every Config so all users see the same cached answer
+registry = AudioSources()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Encoder calibration: measure libx264 throughput on this machine.
+
+Run directly (python3 calibrate.py) or from the tray menu. Results are
+stored in the config dir and used by Recorder to pick the slowest (most
+compact) preset and the fewest threads that still encode in real time.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+from config import CONFIG_DIR
+from jobs import run_ffmpeg
+
+CALIBRATION_FILE = os.path.join(CONFIG_DIR, "encoder_calibration.json")
+
+# Region sizes to benchmark; other sizes scale from the nearest larger one
+REGION_SIZES = [(640, 360), (1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+# Slowest first: the first preset that keeps up gives the smallest files
+PRESETS = ["faster", "veryfast", "superfast", "ultrafast"]
+
+# Frames encoded per run; enough to get past encoder start-up
+BENCH_FRAMES = 90
+
+# Required encoding speed relative to the capture framerate, leaving room
+# for x11grab, audio and the rest of the desktop
+REALTIME_HEADROOM = 1.5
+
+_cache = {"mtime": None, "table": None}
+
+
+def thread_options():
+    """Thread counts to try: 0 (x264's automatic choice), then fixed counts."""
+    cpus = os.cpu_count() or 1
+    options = [0]
+    for n in (1, 2, 4, 8):
+        if n < cpus:
+            options.append(n)
+    return options
+
+
+def measure(width, height, preset, threads, job=None):
+    """Return encoded frames per second for one configuration.
+
+    Cancelling job stops the encode right away.
+    """
+    cmd = [
+        'ffmpeg', '-y', '-nostats', '-loglevel', 'error',
+        # Moving synthetic content so x264 has real work to do
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=60',
+        '-frames:v', str(BENCH_FRAMES),
+        '-c:v', 'libx264',
+        '-preset', preset,
+        '-threads', str(threads),
+        '-crf', '23',
+        '-pix_fmt', 'yuv420p',
+        '-f', 'null', '-',
+    ]
+    start = time.monotonic()
+    returncode = run_ffmpeg(cmd, job)
+    elapsed = time.monotonic() - start
+    if returncode != 0 or elapsed <= 0:
+        return 0.0
+    return BENCH_FRAMES / elapsed
+
+
+def run_calibration(job=None):
+    """Benchmark every size/preset/thread combination and save the table."""
+    runs = [(w, h, preset, threads)
+            for (w, h) in REGION_SIZES
+            for preset in PRESETS
+            for threads in thread_options()]
+    results = []
+    for i, (w, h, preset, threads) in enumerate(runs):
+        if job:
+            job.check_cancelled()
+            job.set_progress(i / len(runs))
+        fps = measure(w, h, preset, threads, job)
+        print(f"Calibration {w}x{h} {preset} threads={threads or 'auto'}: {fps:.1f} fps")
+        results.append({
+            "width": w,
+            "height": h,
+            "preset": preset,
+            "threads": threads,
+            "fps": round(fps, 1),
+        })
+
+    table = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    tmp_path = CALIBRATION_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(table, f, indent=2)
+    os.replace(tmp_path, CALIBRATION_FILE)
+    print(f"Calibration saved: {CALIBRATION_FILE}")
+    return table
+
+
+def load_calibration():
+    """Load the calibration table, or None if missing or stale."""
+    try:
+        mtime = os.path.getmtime(CALIBRATION_FILE)
+    except OSError:
+        return None
+    if _cache["mtime"] != mtime:
+        try:
+            with open(CALIBRATION_FILE, 'r') as f:
+                table = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Could not load calibration: {e}")
+            table = None
+        # A table measured on different hardware would be misleading
+        if table and table.get("cpu_count") != os.cpu_count():
+            table = None
+        _cache["mtime"] = mtime
+        _cache["table"] = table
+    return _cache["table"]
+
+
+def choose_encoder_settings(width, height, framerate, max_threads=None):
+    """Pick (preset, threads) for a region from the calibration table.
+
+    max_threads limits the choice to measurements with at most that many
+    threads (for recordings sharing the CPU, see group.py). Falls back to
+    ('ultrafast', max_threads or 0) when there is no calibration or nothing
+    measured keeps up.
+    """
+    fallback = ("ultrafast", max_threads or 0)
+    table = load_calibration()
+    if not table:
+        return fallback
+
+    pixels = width * height
+    sizes = sorted({(r["width"], r["height"]) for r in table["results"]},
+                   key=lambda s: s[0] * s[1])
+    # Nearest calibrated size at or above the region (or the largest)
+    size = next((s for s in sizes if s[0] * s[1] >= pixels), sizes[-1])
+    scale = (size[0] * size[1]) / pixels  # Throughput scales ~inversely with area
+
+    required = framerate * REALTIME_HEADROOM
+    candidates = [r for r in table["results"] if (r["width"], r["height"]) == size and
+                  (not max_threads or 0 < r["threads"] <= max_threads)]
+    for preset in PRESETS:
+        # Fewest threads that keep up leaves the most CPU for everything else;
+        # 0 (auto) is the last resort since it uses every core
+        by_threads = sorted((r for r in candidates if r["preset"] == preset),
+                            key=lambda r: r["threads"] or float('inf'))
+        for r in by_threads:
+            if r["fps"] * scale >= required:
+                return preset, r["threads"]
+    return fallback
+
+
+if __name__ == '__main__':
+    run_calibration()
@@ -1,6 +1,9 @@
+import copy
 import json
 import os
-import subprocess
+from contextlib import contextmanager
+
+import audio
 
 CONFIG_DIR = os.path.expanduser("~/.config/quick-webm-recorder")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "settings.json")
@@ -14,21 +17,65 @@ QUALITY_PROFILES = {
     "tiny": (35, "Tiny - Small files, reduced quality"),
 }
 
+# Video formats: name -> (file extension, description)
+VIDEO_FORMATS = {
+    "mp4": ("mp4", "MP4 (H.264) - Plays everywhere"),
+    "webm-vp9": ("webm", "WebM (VP9) - Smaller files"),
+    "webm-av1": ("webm", "WebM (AV1) - Smallest files, needs a fast CPU"),
+}
+
 DEFAULT_CONFIG = {
     "hotkey": "<cmd>+<shift>+c",
     "hotkey_gif": "<cmd>+<shift>+g",
+    "hotkey_replay": "<cmd>+<shift>+r",
+    "hotkey_backend": "grab",  # "grab" (passive X key grabs) or "listener" (pynput); needs a restart
     "output_dir": "~/Videos/Recordings",
     "framerate": 30,
     "gif_framerate": 15,  # Lower framerate for smaller GIFs
+    "gif_streaming": True,  # Encode GIFs during capture instead of converting after
     "quality_profile": "medium",  # One of QUALITY_PROFILES keys
+    "video_format": "mp4",  # One of VIDEO_FORMATS keys
     "audio_source": "auto",  # "auto", "none", or specific source name
+    "capture_backend": "x11grab",  # "x11grab" (inside ffmpeg) or "shm" (MIT-SHM in-process)
+    "capture_priority": "normal",  # "normal" or "high" (raised nice for live capture)
+    "capture_cpus": "",  # Pin live capture to these CPUs, e.g. "2,3" or "4-7"
+    "background_low_priority": True,  # Run conversions at nice 19 in the idle IO class
+    "two_stage_capture": False,  # Lossless intermediate, encode after stop
+    "screencast_mode": False,  # Skip unchanged frames (variable frame rate)
+    "fragmented_output": False,  # Crash-safe MP4 written in fragments
+    "standby": False,  # Pre-start ffmpeg once a region is selected
+    "snap_to_windows": True,  # A click during selection selects the window under it
+    "replay_enabled": False,  # Keep a rolling buffer of the screen
+    "replay_seconds": 30,  # How much of the buffer the replay hotkey saves
+    "replay_region": "",  # "X,Y,W,H" to buffer only part of the screen; empty for all of it
+    "recompress_enabled": False,  # Re-encode finished recordings smaller when idle
+    "recompress_workers": 1,  # Concurrent recompression encodes
+    "recompress_preset": "slow",  # x264 preset for recompression
+    "target_size_mb": 0,  # Fit recordings under this size (0 = off)
+    "extra_outputs": [],  # Extra encodes of the same capture, e.g. a reduced-fps GIF
 }
 
 
 class Config:
-    def __init__(self):
+    def __init__(self, persist=True):
+        """persist=False keeps the defaults in memory only; settings.json is
+        neither read nor written (for scripted use, see headless.py)."""
         self._config = DEFAULT_CONFIG.copy()
-        self.load()
+        self.persist = persist
+        self._transaction_depth = 0
+        self._dirty = False
+        self._written = None  # Identity of the file as we last wrote it
+        self._monitor = None
+        if persist:
+            self.load()
+
+    def detached(self, **overrides):
+        """An in-memory copy with overrides applied; never saved."""
+        copy = Config(persist=False)
+        copy._config = dict(self._config)
+        for key, value in overrides.items():
+            setattr(copy, key, value)
+        return copy
 
     def load(self):
         """Load config from file, or create default if doesn't exist."""
@@ -36,22 +83,104 @@ class Config:
             try:
                 with open(CONFIG_FILE, 'r') as f:
                     loaded = json.load(f)
-                    # Merge with defaults (in case new settings were added)
-                    self._config.update(loaded)
+                # Merge with defaults (in case new settings were added)
+                self._config = DEFAULT_CONFIG.copy()
+                self._config.update(loaded)
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Warning: Could not load config: {e}")
         else:
             self.save()  # Create default config file
 
     def save(self):
-        """Save current config to file."""
+        """Save current config to file.
+
+        Inside transaction() the write is deferred to the end of the
+        outermost transaction.
+        """
+        if not self.persist:
+            return
+        if self._transaction_depth:
+            self._dirty = True
+            return
         os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp_path = CONFIG_FILE + ".tmp"
         try:
-            with open(CONFIG_FILE, 'w') as f:
+            # Write a sibling file and rename it over the old one, so readers
+            # (and a crash mid-write) only ever see a complete file
+            with open(tmp_path, 'w') as f:
                 json.dump(self._config, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, CONFIG_FILE)
+            self._written = self._file_identity()
         except IOError as e:
             print(f"Warning: Could not save config: {e}")
 
+    @contextmanager
+    def transaction(self):
+        """Group several setters into a single write.
+
+            with config.transaction():
+                config.framerate = 60
+                config.quality_profile = "high"
+
+        If the block raises, every change made since the outermost
+        transaction began is undone and nothing is written.
+        """
+        if self._transaction_depth == 0:
+            snapshot = copy.deepcopy(self._config)
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._config = snapshot
+                self._dirty = False
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0 and self._dirty:
+            self._dirty = False
+            self.save()
+
+    def watch(self, on_change):
+        """Reload when settings.json is changed outside this instance.
+
+        on_change is called on the GLib main loop with the set of keys whose
+        values changed. Uses a GIO file monitor (inotify), so nothing polls.
+        """
+        from gi.repository import Gio
+
+        def changed(monitor, file, other_file, event_type):
+            if event_type not in (Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                                  Gio.FileMonitorEvent.CREATED,
+                                  Gio.FileMonitorEvent.RENAMED,
+                                  Gio.FileMonitorEvent.MOVED_IN):
+                return
+            identity = self._file_identity()
+            if identity is None or identity == self._written:
+                return  # Deleted, or our own write
+            self._written = identity
+            before = dict(self._config)
+            self.load()
+            keys = {key for key in set(before) | set(self._config)
+                    if before.get(key) != self._config.get(key)}
+            if keys:
+                print(f"Settings reloaded: {', '.join(sorted(keys))}")
+                on_change(keys)
+
+        self._monitor = Gio.File.new_for_path(CONFIG_FILE).monitor_file(
+            Gio.FileMonitorFlags.WATCH_MOVES, None)
+        self._monitor.connect('changed', changed)
+
+    @staticmethod
+    def _file_identity():
+        try:
+            st = os.stat(CONFIG_FILE)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
     @property
     def hotkey(self):
         return self._config["hotkey"]
@@ -70,6 +199,15 @@ class Config:
         self._config["hotkey_gif"] = value
         self.save()
 
+    @property
+    def hotkey_replay(self):
+        return self._config.get("hotkey_replay", "<cmd>+<shift>+r")
+
+    @hotkey_replay.setter
+    def hotkey_replay(self, value):
+        self._config["hotkey_replay"] = value
+        self.save()
+
     @property
     def gif_framerate(self):
         return self._config.get("gif_framerate", 15)
@@ -79,6 +217,15 @@ class Config:
         self._config["gif_framerate"] = int(value)
         self.save()
 
+    @property
+    def gif_streaming(self):
+        return self._config.get("gif_streaming", True)
+
+    @gif_streaming.setter
+    def gif_streaming(self, value):
+        self._config["gif_streaming"] = bool(value)
+        self.save()
+
     @property
     def output_dir(self):
         return os.path.expanduser(self._config["output_dir"])
@@ -115,6 +262,17 @@ class Config:
             return QUALITY_PROFILES[profile][0]
         return 23  # Default to medium
 
+    @property
+    def video_format(self):
+        value = self._config.get("video_format", "mp4")
+        return value if value in VIDEO_FORMATS else "mp4"
+
+    @video_format.setter
+    def video_format(self, value):
+        if value in VIDEO_FORMATS:
+            self._config["video_format"] = value
+            self.save()
+
     @property
     def audio_source(self):
         return self._config["audio_source"]
@@ -124,43 +282,175 @@ class Config:
         self._config["audio_source"] = value
         self.save()
 
+    @property
+    def hotkey_backend(self):
+        return self._config.get("hotkey_backend", "grab")
+
+    @hotkey_backend.setter
+    def hotkey_backend(self, value):
+        if value in ("grab", "listener"):
+            self._config["hotkey_backend"] = value
+            self.save()
+
+    @property
+    def capture_backend(self):
+        return self._config.get("capture_backend", "x11grab")
+
+    @capture_backend.setter
+    def capture_backend(self, value):
+        if value in ("x11grab", "shm"):
+            self._config["capture_backend"] = value
+            self.save()
+
+    @property
+    def capture_priority(self):
+        return self._config.get("capture_priority", "normal")
+
+    @capture_priority.setter
+    def capture_priority(self, value):
+        if value in ("normal", "high"):
+            self._config["capture_priority"] = value
+            self.save()
+
+    @property
+    def capture_cpus(self):
+        return self._config.get("capture_cpus", "")
+
+    @capture_cpus.setter
+    def capture_cpus(self, value):
+        self._config["capture_cpus"] = value.strip()
+        self.save()
+
+    @property
+    def background_low_priority(self):
+        return self._config.get("background_low_priority", True)
+
+    @background_low_priority.setter
+    def background_low_priority(self, value):
+        self._config["background_low_priority"] = bool(value)
+        self.save()
+
+    @property
+    def two_stage_capture(self):
+        return self._config.get("two_stage_capture", False)
+
+    @two_stage_capture.setter
+    def two_stage_capture(self, value):
+        self._config["two_stage_capture"] = bool(value)
+        self.save()
+
+    @property
+    def snap_to_windows(self):
+        return self._config.get("snap_to_windows", True)
+
+    @snap_to_windows.setter
+    def snap_to_windows(self, value):
+        self._config["snap_to_windows"] = bool(value)
+        self.save()
+
+    @property
+    def screencast_mode(self):
+        return self._config.get("screencast_mode", False)
+
+    @screencast_mode.setter
+    def screencast_mode(self, value):
+        self._config["screencast_mode"] = bool(value)
+        self.save()
+
+    @property
+    def fragmented_output(self):
+        return self._config.get("fragmented_output", False)
+
+    @fragmented_output.setter
+    def fragmented_output(self, value):
+        self._config["fragmented_output"] = bool(value)
+        self.save()
+
+    @property
+    def standby(self):
+        return self._config.get("standby", False)
+
+    @standby.setter
+    def standby(self, value):
+        self._config["standby"] = bool(value)
+        self.save()
+
+    @property
+    def replay_enabled(self):
+        return self._config.get("replay_enabled", False)
+
+    @replay_enabled.setter
+    def replay_enabled(self, value):
+        self._config["replay_enabled"] = bool(value)
+        self.save()
+
+    @property
+    def replay_seconds(self):
+        return self._config.get("replay_seconds", 30)
+
+    @replay_seconds.setter
+    def replay_seconds(self, value):
+        self._config["replay_seconds"] = int(value)
+        self.save()
+
+    @property
+    def replay_region(self):
+        return self._config.get("replay_region", "")
+
+    @replay_region.setter
+    def replay_region(self, value):
+        self._config["replay_region"] = value.strip()
+        self.save()
+
+    @property
+    def recompress_enabled(self):
+        return self._config.get("recompress_enabled", False)
+
+    @recompress_enabled.setter
+    def recompress_enabled(self, value):
+        self._config["recompress_enabled"] = bool(value)
+        self.save()
+
+    @property
+    def recompress_workers(self):
+        return self._config.get("recompress_workers", 1)
+
+    @recompress_workers.setter
+    def recompress_workers(self, value):
+        self._config["recompress_workers"] = int(value)
+        self.save()
+
+    @property
+    def recompress_preset(self):
+        return self._config.get("recompress_preset", "slow")
+
+    @recompress_preset.setter
+    def recompress_preset(self, value):
+        self._config["recompress_preset"] = value
+        self.save()
+
+    @property
+    def target_size_mb(self):
+        return self._config.get("target_size_mb", 0)
+
+    @target_size_mb.setter
+    def target_size_mb(self, value):
+        self._config["target_size_mb"] = max(0.0, float(value))
+        self.save()
+
+    @property
+    def extra_outputs(self):
+        return list(self._config.get("extra_outputs", []))
+
+    @extra_outputs.setter
+    def extra_outputs(self, value):
+        self._config["extra_outputs"] = list(value)
+        self.save()
+
     def get_audio_sources(self):
         """Get list of available audio monitor sources."""
-        sources = [("auto", "Auto-detect"), ("none", "No audio")]
-        try:
-            result = subprocess.run(
-                ['pactl', 'list', 'short', 'sources'],
-                capture_output=True, text=True, check=True
-            )
-            for line in result.stdout.strip().split('\n'):
-                if '.monitor' in line:
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        source_name = parts[1]
-                        # Create a compact friendly name
-                        friendly = source_name.replace('alsa_output.', '').replace('.monitor', '')
-                        friendly = friendly.replace('_', ' ').replace('-', ' ')
-                        # Capitalize first letter of each word
-                        friendly = friendly.title()
-                        sources.append((source_name, friendly))
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
-        return sources
+        return [("auto", "Auto-detect"), ("none", "No audio")] + audio.registry.monitor_sources()
 
     def get_resolved_audio_source(self):
         """Get the actual audio source to use (resolves 'auto')."""
-        if self.audio_source == "none":
-            return None
-        elif self.audio_source == "auto":
-            # Auto-detect default sink monitor
-            try:
-                result = subprocess.run(
-                    ['pactl', 'get-default-sink'],
-                    capture_output=True, text=True, check=True
-                )
-                default_sink = result.stdout.strip()
-                return f"{default_sink}.monitor"
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                return None
-        else:
-            return self.audio_source
+        return audio.registry.resolve(self.audio_source)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Control a running Quick WebM Recorder over a Unix socket.
+
+    python3 src/control.py toggle
+    python3 src/control.py start 0,0,1920,1080 --gif
+    python3 src/control.py status
+
+Commands:
+  start-selection [--gif]   Show the selection overlay
+  start X,Y,W,H [--gif]     Record a region right away
+  stop                      Stop recording (or cancel a selection)
+  toggle [--gif]            Same as pressing the hotkey
+  save-replay               Save the replay buffer
+  status                    Print the recorder's state
+
+Every command prints the recorder's state as JSON. The exit status is 0 on
+success, 1 if the command failed and 2 if the recorder isn't running.
+This module never imports GTK, so the client starts in milliseconds; the
+app serves the socket with ControlServer.
+"""
+import json
+import os
+import shlex
+import socket
+import sys
+
+SOCKET_NAME = "quick-webm-recorder.sock"
+MAX_REQUEST_BYTES = 4096
+CLIENT_TIMEOUT = 5
+
+COMMANDS = ("start-selection", "start", "stop", "toggle", "save-replay", "status")
+
+
+def socket_path():
+    """Where the running app listens; private to the user."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    flatpak_id = os.environ.get("FLATPAK_ID")
+    if runtime_dir and flatpak_id:
+        # Shared by every instance of the sandboxed app, unlike the top level
+        base_dir = os.path.join(runtime_dir, "app", flatpak_id)
+    elif runtime_dir:
+        base_dir = runtime_dir
+    else:
+        import tempfile
+        base_dir = os.path.join(tempfile.gettempdir(), f"quick-webm-recorder-{os.getuid()}")
+        os.makedirs(base_dir, mode=0o700, exist_ok=True)
+    return os.path.join(base_dir, SOCKET_NAME)
+
+
+def parse_region(text):
+    """(x, y, w, h) from "X,Y,W,H", with w and h rounded down to even."""
+    try:
+        x, y, w, h = (int(part) for part in text.split(","))
+    except ValueError:
+        raise ValueError(f"Region must be X,Y,W,H, got {text!r}")
+    w -= w % 2
+    h -= h % 2
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Region is empty: {text!r}")
+    return x, y, w, h
+
+
+class PendingReply:
+    """Returned by a control handler that answers later.
+
+    The handler keeps it and calls resolve() or fail() from the main loop
+    once it knows the outcome; the connection stays open until then.
+    """
+
+    def __init__(self):
+        self._send = None
+        self._reply = None
+
+    def resolve(self, reply):
+        self._finish({"ok": True, **reply})
+
+    def fail(self, error):
+        self._finish({"ok": False, "error": str(error)})
+
+    def _finish(self, reply):
+        if self._send:
+            self._send(reply)
+            self._send = None
+        else:
+            self._reply = reply
+
+    def _attach(self, send):
+        """Send the reply through send(reply), now if it is already known."""
+        if self._reply is not None:
+            send(self._reply)
+        else:
+            self._send = send
+
+
+class ControlServer:
+    """Serves control requests on the GLib main loop.
+
+    handler(command, args) is called on the main loop for each request and
+    returns a JSON-serializable dict, or a PendingReply to answer later;
+    raising ValueError reports an error to the client. One request per
+    connection: a single line of shell-style words, answered with one line
+    of JSON.
+    """
+
+    def __init__(self, handler, path=None):
+        self.handler = handler
+        self.path = path or socket_path()
+        self._socket = None
+        self._watch_id = None
+
+    def start(self):
+        from gi.repository import GLib
+
+        if self._socket:
+            return True
+        if self._instance_running():
+            print(f"Warning: Another instance is listening on {self.path}; control socket disabled")
+            return False
+        try:
+            os.unlink(self.path)  # Left over from a crash
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.path)
+            os.chmod(self.path, 0o600)
+            sock.listen(8)
+        except OSError as e:
+            sock.close()
+            print(f"Warning: Could not open control socket {self.path}: {e}")
+            return False
+        sock.setblocking(False)
+        self._socket = sock
+        self._watch_id = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT,
+                                           GLib.IO_IN, self._on_connection)
+        print(f"Control socket: {self.path}")
+        return True
+
+    def stop(self):
+        from gi.repository import GLib
+
+        if not self._socket:
+            return
+        GLib.source_remove(self._watch_id)
+        self._socket.close()
+        self._socket = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _instance_running(self):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+            return True
+        except OSError:
+            return False
+        finally:
+            probe.close()
+
+    def _on_connection(self, fd, condition):
+        from gi.repository import GLib
+
+        try:
+            conn, _ = self._socket.accept()
+        except OSError:
+            return True
+        conn.setblocking(False)
+        # Read without blocking the main loop on a slow or silent client
+        GLib.io_add_watch(conn.fileno(), GLib.PRIORITY_DEFAULT,
+                          GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                          self._on_readable, conn, bytearray())
+        return True
+
+    def _on_readable(self, fd, condition, conn, received):
+        try:
+            chunk = conn.recv(MAX_REQUEST_BYTES)
+        except BlockingIOError:
+            return True
+        except OSError:
+            conn.close()
+            return False
+        received += chunk
+        if chunk and b"\n" not in received and len(received) < MAX_REQUEST_BYTES:
+            return True
+        line = bytes(received).split(b"\n", 1)[0].decode(errors="replace")
+        reply = self._dispatch(line)
+        if isinstance(reply, PendingReply):
+            reply._attach(lambda result: self._send_reply(conn, result))
+        else:
+            self._send_reply(conn, reply)
+        return False
+
+    @staticmethod
+    def _send_reply(conn, reply):
+        try:
+            conn.setblocking(True)
+            conn.settimeout(1)
+            conn.sendall((json.dumps(reply) + "\n").encode())
+        except OSError:
+            pass
+        conn.close()
+
+    def _dispatch(self, line):
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        if not words:
+            return {"ok": False, "error": "Empty command"}
+        command, args = words[0], words[1:]
+        if command not in COMMANDS:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+        try:
+            reply = self.handler(command, args)
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            # Still answer, so the client isn't left waiting for a reply
+            print(f"Control command failed: {line}: {e}")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if isinstance(reply, PendingReply):
+            return reply
+        return {"ok": True, **reply}
+
+
+def request(words, path=None, timeout=CLIENT_TIMEOUT):
+    """Send one command to the running app and return its reply.
+
+    Raises OSError (e.g. FileNotFoundError, ConnectionRefusedError) when
+    the app isn't running.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or socket_path())
+        sock.sendall((shlex.join(words) + "\n").encode())
+        received = b""
+        while not received.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received += chunk
+    finally:
+        sock.close()
+    return json.loads(received or b'{"ok": false, "error": "No reply"}')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help") or argv[0] not in COMMANDS:
+        print(__doc__.strip())
+        return 0 if argv and argv[0] in ("-h", "--help") else 1
+    try:
+        reply = request(argv)
+    except (OSError, ValueError) as e:
+        print(f"Quick WebM Recorder is not running ({e})", file=sys.stderr)
+        return 2
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}", file=sys.stderr)
+        return 1
+    print(json.dumps(reply))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
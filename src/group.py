@@ -0,0 +1,152 @@
+"""Several regions recorded at once on a shared CPU budget.
+
+Each region gets its own Recorder and output file. Left alone, every
+encoder would start a thread per core and the captures would fight over
+the same CPUs, so all of them fall behind together. RecordingGroup
+splits the CPUs live capture may use between the regions in proportion
+to their size, pins each capture to its share and caps its encoder
+threads to match; the x264 preset is then picked from the calibration
+for that thread count, so each member keeps real time on its own slice.
+"""
+import os
+import time
+
+from jobs import JobCancelled
+from priority import parse_cpu_list
+from recorder import Recorder
+
+
+def split_cpus(regions, cpus):
+    """Share cpus between regions (x, y, w, h) in proportion to their area.
+
+    Returns one sorted CPU list per region. Every region gets at least one
+    CPU; with more regions than CPUs they share them round-robin.
+    """
+    cpus = sorted(cpus)
+    if len(regions) >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(len(regions))]
+    areas = [w * h for _, _, w, h in regions]
+    spare = len(cpus) - len(regions)
+    shares = [1 + spare * area / sum(areas) for area in areas]
+    counts = [int(share) for share in shares]
+    # CPUs left over after rounding down go to the largest remainders
+    by_remainder = sorted(range(len(regions)), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[:len(cpus) - sum(counts)]:
+        counts[i] += 1
+    slices = []
+    for count in counts:
+        slices.append(cpus[:count])
+        cpus = cpus[count:]
+    return slices
+
+
+def merge_stats(all_stats):
+    """One get_stats()-style summary for the group: the slowest member's
+    speed and fps, and totals for everything else."""
+    all_stats = [stats for stats in all_stats if stats]
+    if not all_stats:
+        return None
+
+    def lowest(key):
+        values = [stats[key] for stats in all_stats if stats[key] is not None]
+        return min(values) if values else None
+
+    def total(key):
+        values = [stats[key] for stats in all_stats if stats[key] is not None]
+        return sum(values) if values else None
+
+    return {
+        "frame": lowest("frame"),
+        "fps": lowest("fps"),
+        "speed": lowest("speed"),
+        "bitrate_kbps": total("bitrate_kbps"),
+        "size_bytes": total("size_bytes"),
+        "duration": lowest("duration"),
+        "dup_frames": total("dup_frames"),
+        "drop_frames": total("drop_frames"),
+        "ended": all(stats["ended"] for stats in all_stats),
+    }
+
+
+class RecordingGroup:
+    """Records several regions at once, each to its own file.
+
+    Audio goes with the first region only. Members use the app's settings
+    except for capture_cpus, which the group assigns.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.recorders = []  # Members of the current (or last) recording
+
+    def start(self, regions, gif_mode=False):
+        self.stop()
+        self.recorders = []
+        if self.config.capture_cpus:
+            try:
+                cpus = parse_cpu_list(self.config.capture_cpus)
+            except ValueError:
+                cpus = None
+        else:
+            cpus = None
+        cpus = cpus or os.sched_getaffinity(0)
+        slices = split_cpus(regions, cpus)
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        for i, (region, cpu_slice) in enumerate(zip(regions, slices)):
+            config = self.config.detached(capture_cpus=",".join(map(str, cpu_slice)))
+            if i > 0:
+                config.audio_source = "none"
+            recorder = Recorder(config)
+            recorder.name = f"recording_{stamp}_region{i + 1}"
+            recorder.max_threads = len(cpu_slice)
+            recorder.start(*region, gif_mode=gif_mode)
+            self.recorders.append(recorder)
+            x, y, w, h = region
+            print(f"Region {i + 1}: {w}x{h} on CPUs {config.capture_cpus}")
+
+    def is_recording(self):
+        return any(recorder.is_recording() for recorder in self.recorders)
+
+    def get_stats(self):
+        return merge_stats([recorder.get_stats() for recorder in self.recorders])
+
+    @property
+    def output_paths(self):
+        return [recorder.output_path for recorder in self.recorders]
+
+    @property
+    def extra_output_paths(self):
+        return [path for recorder in self.recorders for path in recorder.extra_output_paths]
+
+    def stop_async(self):
+        """Stop every member; returns finalize(job=None) -> [output paths].
+
+        All captures are signalled together, so the files end at the same
+        moment; finalize saves them one after another. Cancelling the job
+        only skips conversions: every capture is still waited on and saved,
+        and a member whose conversion was cancelled keeps its intermediate.
+        """
+        finalizers = [recorder.stop_async() for recorder in self.recorders
+                      if recorder.is_recording()]
+        finalizers = [finalize for finalize in finalizers if finalize]
+        if not finalizers:
+            return None
+
+        def finalize(job=None):
+            paths = []
+            for i, member_finalize in enumerate(finalizers):
+                if job:
+                    job.set_progress(i / len(finalizers))
+                try:
+                    paths.append(member_finalize(job))
+                except JobCancelled:
+                    pass  # The capture has been reaped; only its conversion was skipped
+            return [path for path in paths if path]
+
+        return finalize
+
+    def stop(self):
+        """Stop recording and block until every output file is complete."""
+        finalize = self.stop_async()
+        return finalize() if finalize else []
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Record screen regions without the GTK app.
+
+For scripted and CI captures, e.g. on Xvfb. record() drives the same
+Recorder as the app but with in-memory settings: settings.json is
+neither read nor written, nothing else is written to the config dir,
+and audio is off unless asked for.
+
+    python3 src/headless.py 0,0,1280,720 -t 10
+    python3 src/headless.py 0,0,640,480 640,0,640,480 -f webm-vp9 -t 5 -o out/
+    python3 src/headless.py 0,0,800,600 -f gif       # until Ctrl+C / SIGTERM
+
+Each region is recorded in parallel; one JSON result per line is printed
+as each finishes. Only the standard library is imported until a
+recording starts.
+"""
+import os
+import sys
+import threading
+import time
+
+FORMATS = ("mp4", "webm-vp9", "webm-av1", "gif")
+
+
+def unique_name():
+    """A recording file name that can't collide with parallel captures."""
+    return f"recording_{time.strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+
+
+def record(region, duration=None, video_format="mp4", output_dir=None,
+           stop_event=None, name=None, audio_source="none", settings=None):
+    """Record region (x, y, w, h) and return a result dict.
+
+    Recording stops after duration seconds or when stop_event (a
+    threading.Event) is set, whichever comes first; give at least one.
+    video_format is one of FORMATS. settings overrides other config keys
+    (see config.DEFAULT_CONFIG), e.g. {"framerate": 60}. Safe to call from
+    several threads at once. Raises ValueError for bad arguments and
+    RuntimeError if ffmpeg fails.
+
+    The result has path, format, region, duration (seconds of video),
+    frames, dropped_frames, duplicated_frames, size_bytes and
+    start_latency (seconds until capture was running, or None).
+    """
+    from config import DEFAULT_CONFIG, Config, VIDEO_FORMATS
+    from recorder import Recorder
+
+    if duration is None and stop_event is None:
+        raise ValueError("Give a duration or a stop_event")
+    if video_format not in FORMATS:
+        raise ValueError(f"Unknown format {video_format!r}; use one of {', '.join(FORMATS)}")
+    x, y, w, h = region
+    w -= w % 2
+    h -= h % 2
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Region is empty: {region}")
+
+    config = Config(persist=False)
+    overrides = {"audio_source": audio_source, **(settings or {})}
+    if video_format in VIDEO_FORMATS:
+        overrides["video_format"] = video_format
+    if output_dir:
+        overrides["output_dir"] = os.path.abspath(output_dir)
+    for key, value in overrides.items():
+        if key not in DEFAULT_CONFIG:
+            raise ValueError(f"Unknown setting: {key}")
+        setattr(config, key, value)
+
+    recorder = Recorder(config)
+    recorder.name = name or unique_name()
+    recorder.latency_log = None  # Nothing is written to the config dir
+    stop_event = stop_event or threading.Event()
+    deadline = time.monotonic() + duration if duration is not None else None
+
+    recorder.start(x, y, w, h, gif_mode=video_format == "gif")
+    started = time.monotonic()
+    process = recorder.process
+    while not stop_event.wait(0.1):
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        if process.poll() is not None:
+            break  # ffmpeg gave up; finalize reports it
+    elapsed = time.monotonic() - started
+    # Ctrl+C in a terminal also reaches ffmpeg, which then exits on its own
+    exited_early = process.poll() is not None and not stop_event.is_set()
+
+    stats = {}
+    finalize = recorder.stop_async(stats)
+    output_path = finalize() if finalize else None
+    if exited_early and process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with status {process.returncode}")
+    if not output_path or not os.path.exists(output_path):
+        raise RuntimeError("Recording produced no output")
+
+    return {
+        "path": output_path,
+        "format": video_format,
+        "region": [x, y, w, h],
+        "duration": round(stats.get("duration") or elapsed, 3),
+        "frames": stats.get("frame"),
+        "dropped_frames": stats.get("drop_frames", 0),
+        "duplicated_frames": stats.get("dup_frames", 0),
+        "size_bytes": os.path.getsize(output_path),
+        "start_latency": recorder.start_latency,
+    }
+
+
+def _setting_value(text):
+    """KEY=VALUE from the command line; VALUE is JSON where it parses."""
+    import json
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise ValueError(f"Expected KEY=VALUE, got {text!r}")
+    try:
+        return key, json.loads(value)
+    except json.JSONDecodeError:
+        return key, value
+
+
+def main(argv=None):
+    import argparse
+    import json
+    import signal
+
+    from control import parse_region
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('regions', nargs='+', metavar='X,Y,W,H')
+    parser.add_argument('-t', '--duration', type=float,
+                        help="seconds to record (default: until SIGINT/SIGTERM)")
+    parser.add_argument('-f', '--format', default="mp4", choices=FORMATS)
+    parser.add_argument('-o', '--output-dir', default=os.getcwd())
+    parser.add_argument('--name', help="file name without extension (single region only)")
+    parser.add_argument('--audio', default="none",
+                        help='"none" (default), "auto" or a PulseAudio source name')
+    parser.add_argument('--display', help="X display (default: $DISPLAY)")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="override a setting, e.g. --set framerate=60")
+    args = parser.parse_args(argv)
+
+    try:
+        regions = [parse_region(region) for region in args.regions]
+        settings = dict(_setting_value(item) for item in args.set)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.name and len(regions) > 1:
+        parser.error("--name needs a single region")
+    if args.display:
+        os.environ['DISPLAY'] = args.display
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    failures = []
+    print_lock = threading.Lock()
+
+    def run(region):
+        try:
+            result = record(region, args.duration, args.format, args.output_dir,
+                            stop_event, args.name, args.audio, settings)
+        except (ValueError, RuntimeError, OSError) as e:
+            failures.append(region)
+            result = {"error": str(e), "region": list(region)}
+        with print_lock:
+            # Recorder progress goes to stderr so stdout stays parseable
+            sys.__stdout__.write(json.dumps(result) + "\n")
+            sys.__stdout__.flush()
+
+    sys.stdout = sys.stderr
+    threads = [threading.Thread(target=run, args=(region,)) for region in regions]
+    for thread in threads:
+        thread.start()
+    # Joined with a timeout so signal handlers run promptly
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(0.2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
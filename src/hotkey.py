@@ -1,6 +1,73 @@
+import os
+import queue
+import select
+import threading
+
 from pynput import keyboard
 from gi.repository import GLib
 
+try:
+    from Xlib import X, XK, error
+    from Xlib.display import Display
+except ImportError:  # Not on X11; pynput pulls python-xlib in there
+    Display = None
+
+# pynput modifier names -> X modifier masks
+MODIFIER_MASKS = {
+    "cmd": 1 << 6, "super": 1 << 6,  # Mod4Mask
+    "ctrl": 1 << 2,  # ControlMask
+    "alt": 1 << 3,  # Mod1Mask
+    "shift": 1 << 0,  # ShiftMask
+}
+
+# Caps Lock and Num Lock (LockMask, Mod2Mask) must not stop a hotkey
+# matching, so every binding is grabbed once per combination of them
+LOCK_MASKS = (0, 1 << 1, 1 << 4, (1 << 1) | (1 << 4))
+IGNORED_MASK = (1 << 1) | (1 << 4)
+
+# pynput key names whose X keysym name isn't just the name capitalized
+KEYSYM_NAMES = {
+    "print_screen": "Print",
+    "page_up": "Prior",
+    "page_down": "Next",
+    "esc": "Escape",
+    "enter": "Return",
+    "backspace": "BackSpace",
+    "caps_lock": "Caps_Lock",
+    "num_lock": "Num_Lock",
+    "scroll_lock": "Scroll_Lock",
+}
+
+# A held key auto-repeats as release/press pairs stamped (almost) together
+AUTOREPEAT_MS = 20
+
+
+def parse_hotkey(hotkey_str):
+    """(modifier mask, keysym) for a pynput hotkey string, or None."""
+    modifiers = 0
+    keysym = None
+    for part in hotkey_str.split('+'):
+        if part.startswith('<') and part.endswith('>'):
+            name = part[1:-1].lower()
+            if name in MODIFIER_MASKS:
+                modifiers |= MODIFIER_MASKS[name]
+                continue
+            if keysym is not None:
+                return None
+            keysym = XK.string_to_keysym(KEYSYM_NAMES.get(name, name))
+            if not keysym:
+                keysym = XK.string_to_keysym(name.capitalize())
+        elif len(part) == 1 and keysym is None:
+            # Latin-1 keysyms are the character codes
+            keysym = ord(part.lower())
+            if keysym > 0xff:
+                return None
+        else:
+            return None
+    if not keysym:
+        return None
+    return modifiers, keysym
+
 
 class HotkeyListener:
     def __init__(self, callback, hotkey_str='<cmd>+<shift>+c'):
@@ -31,3 +98,166 @@ class HotkeyListener:
 
     def stop(self):
         self.listener.stop()
+
+
+class ListenerHotkeys:
+    """Named bindings backed by one HotkeyListener each.
+
+    Every listener sees every key press on the system; used where passive
+    grabs aren't available.
+    """
+
+    def __init__(self):
+        self._listeners = {}
+        self._started = False
+
+    def bind(self, name, hotkey_str, callback):
+        """Bind (or rebind) name to hotkey_str."""
+        old = self._listeners.pop(name, None)
+        if old:
+            old.stop()
+        listener = HotkeyListener(callback, hotkey_str)
+        self._listeners[name] = listener
+        if self._started:
+            listener.start()
+
+    def start(self):
+        self._started = True
+        for listener in self._listeners.values():
+            listener.start()
+
+    def stop(self):
+        self._started = False
+        for listener in self._listeners.values():
+            listener.stop()
+
+
+class KeyGrabber:
+    """Named bindings as passive key grabs on a single X connection.
+
+    The X server only sends us the bound chords, so unlike HotkeyListener
+    the process doesn't wake up for ordinary typing. All X requests are
+    made on the grabber's own thread; bind() can be called at any time and
+    takes effect in place. Callbacks run on the GTK main loop.
+    """
+
+    def __init__(self, display_name=None):
+        self._display = Display(display_name)
+        self._root = self._display.screen().root
+        self._bindings = {}  # name -> (hotkey string, callback)
+        self._grabs = {}  # name -> (keycode, modifiers)
+        self._released = {}  # keycode -> time of its last release
+        self._requests = queue.SimpleQueue()
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = None
+        self.wakeups = 0  # Times the grab thread woke up
+
+    def bind(self, name, hotkey_str, callback):
+        """Bind (or rebind) name to hotkey_str."""
+        self._request(("bind", name, hotkey_str, callback))
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._request(None)
+        self._thread.join()
+        self._thread = None
+
+    def _request(self, request):
+        self._requests.put(request)
+        os.write(self._wake_write, b'\0')
+
+    def _run(self):
+        connection = self._display.fileno()
+        while self._handle_requests():
+            for _ in range(self._display.pending_events()):
+                self._handle_event(self._display.next_event())
+            readable, _, _ = select.select([connection, self._wake_read], [], [])
+            self.wakeups += 1
+            if self._wake_read in readable:
+                os.read(self._wake_read, 4096)
+        for name in list(self._grabs):
+            self._ungrab(name)
+        self._display.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    def _handle_requests(self):
+        """Apply queued bind()/stop() calls; False once stopped."""
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                return True
+            if request is None:
+                return False
+            _, name, hotkey_str, callback = request
+            previous = self._bindings.get(name)
+            self._bindings[name] = (hotkey_str, callback)
+            if previous and previous[0] == hotkey_str and name in self._grabs:
+                continue  # Same chord; only the callback changed
+            self._ungrab(name)
+            self._grab(name, hotkey_str)
+
+    def _grab(self, name, hotkey_str):
+        parsed = parse_hotkey(hotkey_str)
+        keycode = parsed and self._display.keysym_to_keycode(parsed[1])
+        if not keycode:
+            print(f"Warning: Can't bind hotkey {hotkey_str}")
+            return
+        grab = (keycode, parsed[0])
+        if grab not in self._grabs.values():
+            catch = error.CatchError(error.BadAccess)
+            for locks in LOCK_MASKS:
+                self._root.grab_key(keycode, grab[1] | locks, True,
+                                    X.GrabModeAsync, X.GrabModeAsync, onerror=catch)
+            self._display.sync()
+            if catch.get_error():
+                for locks in LOCK_MASKS:
+                    self._root.ungrab_key(keycode, grab[1] | locks)
+                self._display.sync()
+                print(f"Warning: Hotkey {hotkey_str} is taken by another application")
+                return
+        self._grabs[name] = grab
+        print(f"Hotkey registered: {hotkey_str}")
+
+    def _ungrab(self, name):
+        grab = self._grabs.pop(name, None)
+        if grab is None or grab in self._grabs.values():
+            return  # Not grabbed, or still used by another binding
+        for locks in LOCK_MASKS:
+            self._root.ungrab_key(grab[0], grab[1] | locks)
+        self._display.sync()
+
+    def _handle_event(self, event):
+        if event.type == X.KeyRelease:
+            self._released[event.detail] = event.time
+            return
+        if event.type != X.KeyPress:
+            return
+        released = self._released.get(event.detail)
+        if released is not None and event.time - released <= AUTOREPEAT_MS:
+            return  # Key held down
+        grab = (event.detail, event.state & 0xff & ~IGNORED_MASK)
+        for name, bound in self._grabs.items():
+            if bound == grab:
+                GLib.idle_add(self._bindings[name][1])
+
+
+def create_hotkeys(backend="grab"):
+    """A KeyGrabber where X allows it, otherwise ListenerHotkeys.
+
+    backend is the hotkey_backend setting, "grab" or "listener".
+    """
+    if backend != "listener" and Display is not None:
+        try:
+            return KeyGrabber()
+        except error.DisplayError as e:
+            print(f"Key grabs unavailable ({e}); listening to the keyboard instead")
+    return ListenerHotkeys()
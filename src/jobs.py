@@ -0,0 +1,171 @@
+import queue
+import subprocess
+import threading
+
+from progress import PROGRESS_ARGS, iter_progress
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """A unit of background work with progress and cancellation."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, name, func, on_done=None, always_run=False):
+        self.name = name
+        self.func = func  # Called as func(job) on the worker thread
+        self.on_done = on_done  # Called as on_done(job) via the queue's dispatcher
+        # Run even if cancelled while queued; func then only skips the
+        # work it guards with check_cancelled()
+        self.always_run = always_run
+        self.status = self.QUEUED
+        self.progress = None  # 0.0-1.0 when known
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._process = None
+        self._queue = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Request cancellation; a running ffmpeg is terminated right away."""
+        self._cancel.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def set_progress(self, fraction):
+        self.progress = max(0.0, min(1.0, fraction))
+        if self._queue:
+            self._queue._notify_update()
+
+    def run_ffmpeg(self, cmd, duration=None, wrapper=()):
+        """Run an ffmpeg command, reporting progress against duration (seconds).
+
+        wrapper is put in front of the command (see priority.py). Returns
+        ffmpeg's exit code. Raises JobCancelled if the job is cancelled
+        while ffmpeg runs.
+        """
+        self.check_cancelled()
+        cmd = list(wrapper) + [cmd[0]] + PROGRESS_ARGS + list(cmd[1:])
+        self._process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        try:
+            for block in iter_progress(self._process.stdout):
+                out_time_us = block.get('out_time_us', '')
+                if duration and out_time_us.isdigit():
+                    self.set_progress(int(out_time_us) / 1e6 / duration)
+            returncode = self._process.wait()
+        finally:
+            self._process = None
+        self.check_cancelled()
+        return returncode
+
+
+def run_ffmpeg(cmd, job=None, duration=None, wrapper=()):
+    """Run ffmpeg inside a job if there is one, otherwise just block on it."""
+    if job:
+        return job.run_ffmpeg(cmd, duration, wrapper)
+    return subprocess.run(list(wrapper) + list(cmd), stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode
+
+
+class JobQueue:
+    """Runs jobs one at a time on a background worker thread.
+
+    Completion and progress callbacks are handed to `dispatch`, which the
+    GTK app sets to GLib.idle_add so they run on the main loop.
+    """
+
+    def __init__(self, dispatch=None, on_update=None):
+        self._dispatch = dispatch
+        self.on_update = on_update  # Called with no arguments when any job changes
+        self._queue = queue.Queue()
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, name, func, on_done=None, always_run=False):
+        """Queue func(job). Jobs with always_run set, such as finalizing a
+        recording, still run when cancelled, so the capture process is
+        always reaped and its file saved."""
+        job = Job(name, func, on_done, always_run)
+        job._queue = self
+        with self._lock:
+            self._jobs.append(job)
+        self._queue.put(job)
+        self._notify_update()
+        return job
+
+    def jobs(self):
+        """Jobs that are queued or running."""
+        with self._lock:
+            return list(self._jobs)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def shutdown(self, wait=True):
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled and not job.always_run:
+                job.status = Job.CANCELLED
+            else:
+                job.status = Job.RUNNING
+                self._notify_update()
+                try:
+                    job.result = job.func(job)
+                    job.status = Job.DONE
+                except JobCancelled:
+                    job.status = Job.CANCELLED
+                except Exception as e:
+                    job.error = e
+                    job.status = Job.FAILED
+                    print(f"Job failed: {job.name}: {e}")
+            with self._lock:
+                self._jobs.remove(job)
+            if job.on_done:
+                self._call(job.on_done, job)
+            self._notify_update()
+
+    def _notify_update(self):
+        if self.on_update:
+            self._call(self.on_update)
+
+    def _call(self, func, *args):
+        if self._dispatch:
+            self._dispatch(_call_once, func, args)
+        else:
+            func(*args)
+
+
+def _call_once(func, args):
+    func(*args)
+    return False  # Don't repeat when dispatched through GLib.idle_add
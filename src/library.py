@@ -0,0 +1,247 @@
+"""Index of saved recordings with a size-bounded thumbnail cache.
+
+Metadata (duration, resolution, codec, size) is probed once per file and
+kept in SQLite, so listing the library never touches the recordings
+themselves. New recordings are added as they are saved; rescan() picks
+up files that changed behind our back and only probes those.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+
+from config import CONFIG_DIR
+
+LIBRARY_DB = os.path.join(CONFIG_DIR, "library.sqlite3")
+THUMBNAIL_DIR = os.path.expanduser("~/.cache/quick-webm-recorder/thumbnails")
+
+# Total size of cached thumbnails; least recently used are evicted past it
+THUMBNAIL_CACHE_BYTES = 64 * 1024 * 1024
+THUMBNAIL_WIDTH = 160
+
+# Files in the output folder that count as recordings
+RECORDING_PREFIXES = ("recording_", "replay_")
+RECORDING_EXTENSIONS = (".mp4", ".webm", ".gif", ".mkv")
+# Intermediates a recording leaves while it is being finalized
+INTERMEDIATE_SUFFIXES = ("_temp.mp4", "_capture.mkv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    created REAL NOT NULL
+);
+-- Matches page()'s ORDER BY in both columns, so pages are read straight off
+-- the index; replaces recordings_created, which sorted path the other way
+DROP INDEX IF EXISTS recordings_created;
+CREATE INDEX IF NOT EXISTS recordings_newest ON recordings (created DESC, path DESC);
+CREATE TABLE IF NOT EXISTS thumbnails (
+    key TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnails_used ON thumbnails (used);
+"""
+
+
+def is_recording_file(name):
+    return (name.startswith(RECORDING_PREFIXES) and name.endswith(RECORDING_EXTENSIONS)
+            and not name.endswith(INTERMEDIATE_SUFFIXES))
+
+
+def probe(path):
+    """Return (duration, width, height, codec) from ffprobe; None for unknowns."""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'format=duration:stream=codec_name,width,height',
+         '-of', 'json', path],
+        capture_output=True, text=True
+    )
+    try:
+        info = json.loads(result.stdout or "{}")
+    except json.JSONDecodeError:
+        info = {}
+    stream = (info.get("streams") or [{}])[0]
+    try:
+        duration = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    return duration, stream.get("width"), stream.get("height"), stream.get("codec_name")
+
+
+class Library:
+    """Recordings index, safe to use from the main loop and job threads."""
+
+    def __init__(self, db_path=LIBRARY_DB, thumbnail_dir=THUMBNAIL_DIR,
+                 cache_bytes=THUMBNAIL_CACHE_BYTES):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.thumbnail_dir = thumbnail_dir
+        self.cache_bytes = cache_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def add(self, path):
+        """Index (or re-index) one file. Returns False if it doesn't exist."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return False
+        duration, width, height, codec = probe(path)
+        created = self._created_time(path, st)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, st.st_mtime, st.st_size, duration, width, height, codec, created))
+        return True
+
+    def remove(self, path):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM recordings WHERE path = ?", (path,))
+
+    def rescan(self, directory, job=None):
+        """Bring the index in line with directory.
+
+        Only new or changed files (by mtime and size) are probed; entries for
+        files that are gone are dropped. Returns the number of files probed.
+        """
+        directory = os.path.normpath(directory)
+        with self._lock:
+            known = {row["path"]: (row["mtime"], row["size"]) for row in self._db.execute(
+                "SELECT path, mtime, size FROM recordings WHERE path LIKE ? ESCAPE '\\'",
+                (self._like_prefix(directory),))}
+
+        changed = []
+        present = set()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not entry.is_file() or not is_recording_file(entry.name):
+                continue
+            present.add(entry.path)
+            st = entry.stat()
+            if known.get(entry.path) != (st.st_mtime, st.st_size):
+                changed.append(entry.path)
+
+        gone = [path for path in known
+                if path not in present and os.path.normpath(os.path.dirname(path)) == directory]
+        if gone:
+            with self._lock, self._db:
+                self._db.executemany("DELETE FROM recordings WHERE path = ?",
+                                     [(path,) for path in gone])
+
+        for i, path in enumerate(changed):
+            if job:
+                job.check_cancelled()
+                job.set_progress(i / len(changed))
+            self.add(path)
+        print(f"Library rescan: {len(changed)} probed, {len(gone)} removed")
+        return len(changed)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+    def page(self, limit=50, after=None):
+        """Newest-first recordings as dicts, starting after the (created, path)
+        of the last row of the previous page.
+
+        Keyset pagination on the created index, so every page costs the same
+        however deep into the library it is.
+        """
+        query = "SELECT * FROM recordings"
+        params = []
+        if after:
+            query += " WHERE (created, path) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY created DESC, path DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, params)]
+
+    def thumbnail(self, entry):
+        """Path of a cached JPEG thumbnail for a page() entry, or None.
+
+        Generated on first use; the cache is keyed by path and mtime, so an
+        edited file gets a fresh thumbnail and the stale one ages out.
+        """
+        key = hashlib.sha1(f"{entry['path']}:{entry['mtime']}".encode()).hexdigest()
+        thumb_path = os.path.join(self.thumbnail_dir, f"{key}.jpg")
+        if os.path.exists(thumb_path):
+            with self._lock, self._db:
+                self._db.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?)",
+                                 (key, os.path.getsize(thumb_path), time.time()))
+            return thumb_path
+
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        # Skip fade-ins and the blank first frame of short clips
+        seek = min((entry["duration"] or 0) / 2, 1.0)
+        tmp_path = thumb_path + ".tmp.jpg"
+        result = subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-ss', f'{seek:.2f}', '-i', entry["path"],
+             '-frames:v', '1', '-vf', f'scale={THUMBNAIL_WIDTH}:-2', tmp_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        if result.returncode != 0 or not os.path.exists(tmp_path):
+            return None
+        os.replace(tmp_path, thumb_path)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?)",
+                             (key, os.path.getsize(thumb_path), time.time()))
+        self._evict_thumbnails()
+        return thumb_path
+
+    def _evict_thumbnails(self):
+        """Delete least recently used thumbnails until the cache fits."""
+        with self._lock, self._db:
+            total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnails").fetchone()[0]
+            if total <= self.cache_bytes:
+                return
+            evicted = []
+            for row in self._db.execute("SELECT key, bytes FROM thumbnails ORDER BY used"):
+                if total <= self.cache_bytes:
+                    break
+                evicted.append(row["key"])
+                total -= row["bytes"]
+            self._db.executemany("DELETE FROM thumbnails WHERE key = ?",
+                                 [(key,) for key in evicted])
+        for key in evicted:
+            try:
+                os.remove(os.path.join(self.thumbnail_dir, f"{key}.jpg"))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _created_time(path, st):
+        """Recording time from the file name, falling back to mtime."""
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for prefix in RECORDING_PREFIXES:
+            if stem.startswith(prefix):
+                try:
+                    return time.mktime(time.strptime(stem[len(prefix):][:15], "%Y%m%d_%H%M%S"))
+                except ValueError:
+                    break
+        return st.st_mtime
+
+    @staticmethod
+    def _like_prefix(directory):
+        escaped = directory.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return os.path.join(escaped, '%')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
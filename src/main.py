@@ -1,13 +1,32 @@
 #!/usr/bin/env python3
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib, GdkPixbuf
+import os
+import queue
 import subprocess
+import threading
+import time
+from datetime import datetime
 
+from audio import registry as audio_sources
+from calibrate import run_calibration
 from config import Config
-from hotkey import HotkeyListener
+from control import ControlServer, PendingReply, parse_region
+from group import RecordingGroup
+from hotkey import create_hotkeys
+from jobs import JobQueue
+from library import Library, is_recording_file
 from recorder import Recorder
-from overlay import SelectionManager
+from overlay import SelectionManager, get_screen_bounds
+from progress import format_stats
+from recompress import Recompressor
+from replay import ReplayBuffer
+from spatial import clip_rect
+
+# How long a control "start" waits for ffmpeg to open its output; a capture
+# still starting up after this counts as started
+CONTROL_START_TIMEOUT = 2
 
 
 class App:
@@ -15,6 +34,7 @@ class App:
     SELECTING = 1
     READY = 2
     RECORDING = 3
+    STATE_NAMES = {IDLE: "idle", SELECTING: "selecting", READY: "ready", RECORDING: "recording"}
 
     def __init__(self):
         self.state = self.IDLE
@@ -23,20 +43,39 @@ class App:
 
         self.config = Config()
         self.recorder = Recorder(self.config)
+        # Used instead of recorder when several regions are selected
+        self.group = RecordingGroup(self.config)
+        self.replay = ReplayBuffer(self.config)
+        # Finalizing and converting recordings happens off the main loop
+        self.jobs = JobQueue(dispatch=GLib.idle_add, on_update=self._on_jobs_updated)
+        # Calibration takes minutes, so it gets a worker of its own rather
+        # than holding up saves
+        self.calibration_jobs = JobQueue(dispatch=GLib.idle_add,
+                                         on_update=self._on_jobs_updated)
+        # Likewise library rescans, which "Cancel Conversions" leaves alone
+        self.library_jobs = JobQueue(dispatch=GLib.idle_add, on_update=self._on_jobs_updated)
         self.overlay = SelectionManager()
+        self.library = Library()
+        self.recompressor = Recompressor(
+            self.config, self.library, busy_paths=self._busy_paths,
+            on_update=lambda: GLib.idle_add(self._on_recompress_updated))
 
-        # Hotkey for MP4 recording
-        self.hotkey = HotkeyListener(self.on_hotkey, self.config.hotkey)
-        # Hotkey for GIF recording
-        self.hotkey_gif = HotkeyListener(self.on_hotkey_gif, self.config.hotkey_gif)
+        # MP4 and GIF recording and saving the replay buffer
+        self.hotkeys = create_hotkeys(self.config.hotkey_backend)
+        self._bind_hotkeys()
 
         self.overlay.on_selection_complete = self.on_selection_complete
         self.overlay.on_cancel = self.on_cancel
         self.overlay.on_start_recording = self.start_recording
         self.overlay.on_stop_recording = self.stop_recording
+        self.overlay.on_add_region = self.on_add_region
+
+        # Commands from scripts and window manager keybindings
+        self.control = ControlServer(self._on_control)
 
-        # Settings window (created on demand)
+        # Settings and library windows (created on demand)
         self._settings_window = None
+        self._library_window = None
 
         # Tray icon
         self.tray = TrayIcon(self)
@@ -47,6 +86,34 @@ class App:
         self._settings_window.show_all()
         self._settings_window.present()
 
+    def show_library(self):
+        if self._library_window is None:
+            self._library_window = LibraryWindow(self)
+        self._library_window.refresh()
+        self._library_window.show_all()
+        self._library_window.present()
+        # Pick up files added or deleted outside the app; only those get probed
+        if self.library_jobs.jobs():
+            return  # A scan is already queued or running
+        self.library_jobs.submit("Scanning recordings",
+                                 lambda job: self.library.rescan(self.config.output_dir, job),
+                                 on_done=lambda job: self._library_window.refresh())
+
+    def _indexed(self, func, extra_paths=()):
+        """Wrap a job function so the file (or list of files) it returns is
+        added to the library.
+
+        An intermediate kept after a failed or cancelled conversion is left
+        out, as rescan() would drop it again."""
+        def run(job):
+            result = func(job)
+            paths = result if isinstance(result, list) else [result]
+            for saved in paths + list(extra_paths):
+                if saved and is_recording_file(os.path.basename(saved)):
+                    self.library.add(saved)
+            return result
+        return run
+
     def show_about(self):
         about = Gtk.AboutDialog()
         about.set_program_name("Quick WebM Recorder")
@@ -59,16 +126,75 @@ class App:
         about.run()
         about.destroy()
 
+    def _bind_hotkeys(self):
+        self.hotkeys.bind("mp4", self.config.hotkey, self.on_hotkey)
+        self.hotkeys.bind("gif", self.config.hotkey_gif, self.on_hotkey_gif)
+        self.hotkeys.bind("replay", self.config.hotkey_replay, self.on_hotkey_replay)
+
     def _on_settings_closed(self, hotkeys_changed):
         if hotkeys_changed:
-            # Restart hotkey listeners with new hotkeys
-            self.hotkey.stop()
-            self.hotkey_gif.stop()
-            self.hotkey = HotkeyListener(self.on_hotkey, self.config.hotkey)
-            self.hotkey_gif = HotkeyListener(self.on_hotkey_gif, self.config.hotkey_gif)
-            self.hotkey.start()
-            self.hotkey_gif.start()
-            print(f"Hotkeys updated - MP4: {self.config.hotkey}, GIF: {self.config.hotkey_gif}")
+            # Rebound in place; unchanged bindings keep their grabs
+            self._bind_hotkeys()
+            print(f"Hotkeys updated - MP4: {self.config.hotkey}, GIF: {self.config.hotkey_gif}, "
+                  f"Replay: {self.config.hotkey_replay}")
+        self._sync_replay()
+        self._sync_recompress()
+
+    def _on_config_reloaded(self, keys):
+        """Apply settings.json edits made outside this instance."""
+        if self._settings_window is not None and not self._settings_window.get_visible():
+            # Rebuilt with the new values next time it opens
+            self._settings_window.destroy()
+            self._settings_window = None
+        hotkeys_changed = bool(keys & {"hotkey", "hotkey_gif", "hotkey_replay"})
+        self._on_settings_closed(hotkeys_changed)
+
+    def _sync_recompress(self):
+        """Start, stop or resize idle-time recompression to match the config."""
+        if self.recompressor.is_running() and (
+                not self.config.recompress_enabled or
+                self.recompressor.workers != self.config.recompress_workers):
+            self.recompressor.stop()
+        if self.config.recompress_enabled:
+            self.recompressor.start()
+
+    def _busy_paths(self):
+        """Files recompression must leave alone: the recording in progress
+        and anything a pending job is still finalizing."""
+        if not self.recorder.is_recording() and not self.group.is_recording() \
+                and not self.jobs.jobs():
+            return set()
+        return {self.recorder.output_path, *self.recorder.extra_output_paths,
+                *self.group.output_paths, *self.group.extra_output_paths}
+
+    def _on_recompress_updated(self):
+        if self._library_window is not None and self._library_window.get_visible():
+            self._library_window.refresh()
+        return False
+
+    def _sync_replay(self):
+        """Start, stop or restart the replay buffer to match the config."""
+        if not self.config.replay_enabled:
+            self.replay.stop()
+            return
+        region = self._replay_region()
+        if not self.replay.is_current(*region):
+            self.replay.start(*region)
+
+    def _replay_region(self):
+        """replay_region clipped to the screen, or the whole screen."""
+        bounds = get_screen_bounds()
+        if not self.config.replay_region:
+            return bounds
+        try:
+            region = clip_rect(parse_region(self.config.replay_region), bounds)
+        except ValueError as e:
+            print(f"Warning: {e}")
+            region = None
+        if region is None or region[2] < 2 or region[3] < 2:
+            print("Warning: Replay region is not on screen, buffering the whole screen")
+            return bounds
+        return region
 
     def on_hotkey(self):
         """Handle MP4 recording hotkey."""
@@ -90,37 +216,245 @@ class App:
         elif self.state == self.RECORDING:
             self.stop_recording()
 
+    def on_hotkey_replay(self):
+        """Save the last replay_seconds of the replay buffer."""
+        if not self.replay.is_running():
+            print("Replay buffer is not running")
+            return
+        # Taken now: a save queued behind other jobs still gets this moment
+        snapshot = self.replay.snapshot()
+        if not snapshot:
+            print("Replay buffer is empty")
+            return
+
+        def on_done(job):
+            self.replay.discard(snapshot)  # In case the job never ran
+            self._on_output_ready(job)
+
+        self.jobs.submit("Saving replay", self._indexed(lambda job: self.replay.save(snapshot)),
+                         on_done=on_done)
+
+    def _on_control(self, command, args):
+        """Handle a control socket command; returns the status reply."""
+        gif_mode = "--gif" in args
+        args = [arg for arg in args if arg != "--gif"]
+        if command == "toggle":
+            if gif_mode:
+                self.on_hotkey_gif()
+            else:
+                self.on_hotkey()
+        elif command == "start-selection":
+            if self.state != self.IDLE:
+                raise ValueError(f"Can't start a selection while {self.STATE_NAMES[self.state]}")
+            self._gif_mode = gif_mode
+            self.start_selection()
+        elif command == "start":
+            if self.state == self.RECORDING:
+                raise ValueError("Already recording")
+            if len(args) != 1:
+                raise ValueError("Usage: start X,Y,W,H [--gif]")
+            rect = clip_rect(parse_region(args[0]), get_screen_bounds())
+            if rect is None:
+                raise ValueError(f"Region is off screen: {args[0]}")
+            x, y, w, h = rect
+            rect = x, y, w - w % 2, h - h % 2
+            if rect[2] < 2 or rect[3] < 2:
+                raise ValueError(f"Region is too small on screen: {args[0]}")
+            if self.state != self.IDLE:
+                self.overlay.cancel()
+            self._gif_mode = gif_mode
+            self.selection = self.overlay.selection = rect
+            # Same border and toolbar as a drawn selection, so it can be stopped
+            self.overlay.border_window.update_from_selection(*rect)
+            self.overlay.toolbar.position_below(rect)
+            self.start_recording()
+            return self._reply_when_started()
+        elif command == "stop":
+            if self.state == self.RECORDING:
+                self.stop_recording()
+            elif self.state != self.IDLE:
+                self.overlay.cancel()
+            else:
+                raise ValueError("Not recording")
+        elif command == "save-replay":
+            if not self.replay.is_running():
+                raise ValueError("Replay buffer is not running")
+            self.on_hotkey_replay()
+        return self._status()
+
+    def _reply_when_started(self):
+        """Answer a control "start" once ffmpeg is capturing.
+
+        Polled from the main loop rather than waited on, so the overlay and
+        the rest of the UI keep running while ffmpeg starts up.
+        """
+        pending = PendingReply()
+        deadline = time.monotonic() + CONTROL_START_TIMEOUT
+
+        def check():
+            if self.state != self.RECORDING:
+                pending.resolve(self._status())  # Stopped in the meantime
+                return False
+            started = self.recorder.poll_started()
+            if started is None and time.monotonic() < deadline:
+                return True
+            if started is False:
+                self._abort_recording()
+                pending.fail("ffmpeg exited before recording started")
+            else:
+                pending.resolve(self._status())
+            return False
+
+        GLib.timeout_add(20, check)
+        return pending
+
+    def _status(self):
+        recording = self.state == self.RECORDING
+        return {
+            "state": self.STATE_NAMES[self.state],
+            "format": "gif" if self._gif_mode else self.config.video_format,
+            "selection": list(self.selection) if self.selection else None,
+            "output": ((self.group.output_paths if self.group.is_recording()
+                        else self.recorder.output_path) if recording else None),
+            "replay": self.replay.is_running(),
+            "jobs": [{"name": job.name, "status": job.status, "progress": job.progress}
+                     for job in self._all_jobs()],
+        }
+
     def start_selection(self):
         self.state = self.SELECTING
+        self.overlay.snap_to_windows = self.config.snap_to_windows
         self.overlay.show_for_selection()
 
+    def on_add_region(self):
+        """Keep the current selection and select another to record with it."""
+        if self.state != self.READY:
+            return
+        self.recorder.disarm()
+        self.overlay.pin_selection()
+        self.selection = None
+        self.start_selection()
+
     def on_selection_complete(self, rect):
         self.state = self.READY
         self.selection = rect
         print(f"Selection ready: {rect}")
+        if self.config.standby and not self.overlay.pinned_selections:
+            # Get ffmpeg ready while the user reaches for "Start Recording"
+            x, y, w, h = rect
+            self.recorder.arm(x, y, w, h, gif_mode=self._gif_mode)
 
     def on_cancel(self):
         self.state = self.IDLE
         self.selection = None
+        self.recorder.disarm()
         print("Selection cancelled")
 
     def start_recording(self):
         self.state = self.RECORDING
         self.overlay.set_recording(True)  # Updates border color and button text
-        x, y, w, h = self.selection
-        self.recorder.start(x, y, w, h, gif_mode=self._gif_mode)
-        mode = "GIF" if self._gif_mode else "MP4"
-        print(f"Recording {mode}: {w}x{h}")
+        mode = "GIF" if self._gif_mode else self.config.video_format
+        regions = self.overlay.pinned_selections + [self.selection]
+        if len(regions) > 1:
+            self.group.start(regions, gif_mode=self._gif_mode)
+            print(f"Recording {mode}: {len(regions)} regions")
+        else:
+            x, y, w, h = self.selection
+            self.recorder.start(x, y, w, h, gif_mode=self._gif_mode)
+            print(f"Recording {mode}: {w}x{h}")
+        self._last_stats = None
+        GLib.timeout_add(500, self._update_stats)
+
+    def _update_stats(self):
+        """Show live capture stats in the toolbar while recording."""
+        if self.state != self.RECORDING:
+            return False
+        stats = self._capture().get_stats()
+        if stats:
+            last = self._last_stats
+            # Below real time, or new dropped/duplicated frames since last tick
+            falling_behind = (
+                (stats["speed"] is not None and stats["speed"] < 0.95) or
+                (last is not None and (stats["drop_frames"] > last["drop_frames"] or
+                                       stats["dup_frames"] > last["dup_frames"]))
+            )
+            self.overlay.toolbar.set_stats(format_stats(stats), falling_behind)
+            self._last_stats = stats
+        return True
 
-    def stop_recording(self):
-        output_path = self.recorder.stop()
+    def _capture(self):
+        """The Recorder or RecordingGroup in use for the current recording."""
+        return self.group if self.group.is_recording() else self.recorder
+
+    def _leave_recording(self):
         self.overlay.set_recording(False)  # Reset toolbar button text
         self.overlay.border_window.hide()
         self.overlay.toolbar.hide()
         self.state = self.IDLE
         self.selection = None
 
-        # Copy path to clipboard
+    def _abort_recording(self):
+        """Clean up after a capture that failed to start; nothing is saved."""
+        finalize = self.recorder.stop_async()
+        self._leave_recording()
+        if finalize:
+            finalize()  # ffmpeg has already exited, so this only reaps it
+
+    def stop_recording(self):
+        if self.group.is_recording():
+            self._stop_group()
+            return
+        finalize = self.recorder.stop_async()
+        self._leave_recording()
+        if not finalize:
+            return
+        finalize = self._indexed(finalize, self.recorder.extra_output_paths)
+        if self.recorder.output_playable:
+            # Already valid up to the last fragment; finalize in the background
+            self._copy_to_clipboard(self.recorder.output_path)
+            self.jobs.submit("Saving recording", finalize, always_run=True)
+        else:
+            if self._gif_mode:
+                name = "Converting GIF"
+            elif self.config.target_size_mb:
+                name = f"Fitting under {self.config.target_size_mb:g} MB"
+            elif self.config.two_stage_capture:
+                name = "Transcoding recording"
+            else:
+                name = "Saving recording"
+            self.jobs.submit(name, finalize, on_done=self._on_output_ready, always_run=True)
+
+    def _stop_group(self):
+        count = len(self.group.recorders)
+        extra_paths = self.group.extra_output_paths
+        finalize = self.group.stop_async()
+        self._leave_recording()
+        self.overlay.clear_pinned()
+        if finalize:
+            self.jobs.submit(f"Saving {count} recordings", self._indexed(finalize, extra_paths),
+                             on_done=self._on_output_ready, always_run=True)
+
+    def calibrate_encoder(self):
+        if self.calibration_jobs.jobs():
+            print("Calibration is already running")
+            return
+        self.calibration_jobs.submit("Calibrating encoder", run_calibration)
+
+    def _on_output_ready(self, job):
+        if job.status == job.DONE and job.result:
+            if isinstance(job.result, list):
+                # One path per line for a group recording
+                self._copy_to_clipboard("\n".join(job.result))
+            else:
+                self._copy_to_clipboard(job.result)
+
+    def _all_jobs(self):
+        return self.jobs.jobs() + self.calibration_jobs.jobs() + self.library_jobs.jobs()
+
+    def _on_jobs_updated(self):
+        self.tray.show_jobs(self._all_jobs())
+
+    def _copy_to_clipboard(self, output_path):
         try:
             subprocess.run(
                 ['xclip', '-selection', 'clipboard'],
@@ -135,22 +469,42 @@ class App:
         print("Quick WebM Recorder started")
         print(f"MP4 Hotkey: {self.config.hotkey}")
         print(f"GIF Hotkey: {self.config.hotkey_gif}")
-        self.hotkey.start()
-        self.hotkey_gif.start()
+        self.hotkeys.start()
+        self.control.start()
+        # Resolve audio once up front so recording start never runs pactl
+        audio_sources.watch()
+        self.config.watch(self._on_config_reloaded)
+        self._sync_replay()
+        self._sync_recompress()
         try:
             Gtk.main()
         except KeyboardInterrupt:
             pass
         finally:
-            self.hotkey.stop()
-            self.hotkey_gif.stop()
+            self.hotkeys.stop()
+            self.control.stop()
             if self.recorder.is_recording():
                 self.recorder.stop()
+            self.group.stop()
+            self.recorder.disarm()
+            self.replay.stop()
+            self.recompressor.stop()
+            audio_sources.stop()
+            self.calibration_jobs.cancel_all()
+            self.calibration_jobs.shutdown()
+            self.library_jobs.cancel_all()
+            self.library_jobs.shutdown()
+            # Let pending saves and conversions finish
+            self.jobs.shutdown()
+            self.library.close()
             print("Exiting...")
 
     def quit(self):
         if self.recorder.is_recording():
             self.recorder.stop()
+        self.group.stop()
+        self.recorder.disarm()
+        self.replay.stop()
         Gtk.main_quit()
 
 
@@ -161,14 +515,15 @@ class SettingsWindow(Gtk.Window):
         self.on_close_callback = on_close_callback
         self.original_hotkey = config.hotkey
         self.original_hotkey_gif = config.hotkey_gif
+        self.original_hotkey_replay = config.hotkey_replay
 
         # Hotkey capture state
         self._listening = False
-        self._listening_target = None  # 'mp4' or 'gif'
+        self._listening_target = None  # 'mp4', 'gif' or 'replay'
         self._hotkey_listener = None
         self._captured_keys = set()
 
-        self.set_default_size(450, 380)
+        self.set_default_size(450, 640)
         self.set_border_width(12)
         self.set_position(Gtk.WindowPosition.CENTER)
         self.connect('delete-event', self._on_delete)
@@ -209,6 +564,22 @@ class SettingsWindow(Gtk.Window):
         hotkey_gif_box.pack_start(self.listen_gif_btn, False, False, 0)
         vbox.pack_start(hotkey_gif_box, False, False, 0)
 
+        # Replay Hotkey setting with Listen button
+        hotkey_replay_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        hotkey_replay_label = Gtk.Label(label="Replay Hotkey:")
+        hotkey_replay_label.set_xalign(0)
+        hotkey_replay_label.set_size_request(100, -1)
+        self.hotkey_replay_entry = Gtk.Entry()
+        self.hotkey_replay_entry.set_text(config.hotkey_replay)
+        self.hotkey_replay_entry.set_editable(False)
+        self.listen_replay_btn = Gtk.Button(label="Listen...")
+        self.listen_replay_btn.connect('clicked', lambda b: self._on_listen_clicked('replay'))
+        self.listen_replay_btn.set_tooltip_text("Click then press your desired hotkey combination")
+        hotkey_replay_box.pack_start(hotkey_replay_label, False, False, 0)
+        hotkey_replay_box.pack_start(self.hotkey_replay_entry, True, True, 0)
+        hotkey_replay_box.pack_start(self.listen_replay_btn, False, False, 0)
+        vbox.pack_start(hotkey_replay_box, False, False, 0)
+
         # Output directory
         output_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
         output_label = Gtk.Label(label="Output folder:")
@@ -252,6 +623,68 @@ class SettingsWindow(Gtk.Window):
         quality_box.pack_start(self.quality_combo, True, True, 0)
         vbox.pack_start(quality_box, False, False, 0)
 
+        # Size budget
+        size_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        size_label = Gtk.Label(label="Max size:")
+        size_label.set_xalign(0)
+        size_label.set_size_request(100, -1)
+        self.size_spin = Gtk.SpinButton.new_with_range(0, 4000, 1)
+        self.size_spin.set_digits(1)
+        self.size_spin.set_value(config.target_size_mb)
+        self.size_spin.set_tooltip_text(
+            "Encode recordings to fit under this many MB after recording stops. "
+            "0 records at the chosen quality instead")
+        size_box.pack_start(size_label, False, False, 0)
+        size_box.pack_start(self.size_spin, False, False, 0)
+        size_box.pack_start(Gtk.Label(label="MB (0 = no limit)"), False, False, 0)
+        vbox.pack_start(size_box, False, False, 0)
+
+        # Output format
+        from config import VIDEO_FORMATS
+        format_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        format_label = Gtk.Label(label="Format:")
+        format_label.set_xalign(0)
+        format_label.set_size_request(100, -1)
+        self.format_combo = Gtk.ComboBoxText()
+        for format_id, (extension, description) in VIDEO_FORMATS.items():
+            self.format_combo.append(format_id, description)
+        self.format_combo.set_active_id(config.video_format)
+        format_box.pack_start(format_label, False, False, 0)
+        format_box.pack_start(self.format_combo, True, True, 0)
+        vbox.pack_start(format_box, False, False, 0)
+
+        # Capture backend
+        capture_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        capture_label = Gtk.Label(label="Capture:")
+        capture_label.set_xalign(0)
+        capture_label.set_size_request(100, -1)
+        self.capture_combo = Gtk.ComboBoxText()
+        self.capture_combo.append("x11grab", "x11grab (in ffmpeg)")
+        self.capture_combo.append("shm", "Shared memory (in-process, no cursor)")
+        self.capture_combo.set_active_id(config.capture_backend)
+        capture_box.pack_start(capture_label, False, False, 0)
+        capture_box.pack_start(self.capture_combo, True, True, 0)
+        vbox.pack_start(capture_box, False, False, 0)
+
+        # Capture scheduling
+        priority_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        priority_label = Gtk.Label(label="Priority:")
+        priority_label.set_xalign(0)
+        priority_label.set_size_request(100, -1)
+        self.priority_combo = Gtk.ComboBoxText()
+        self.priority_combo.append("normal", "Normal")
+        self.priority_combo.append("high", "High (needs permission to raise priority)")
+        self.priority_combo.set_active_id(config.capture_priority)
+        self.cpus_entry = Gtk.Entry()
+        self.cpus_entry.set_text(config.capture_cpus)
+        self.cpus_entry.set_placeholder_text("All CPUs")
+        self.cpus_entry.set_width_chars(8)
+        self.cpus_entry.set_tooltip_text("Pin capture to these CPUs, e.g. 2,3 or 4-7")
+        priority_box.pack_start(priority_label, False, False, 0)
+        priority_box.pack_start(self.priority_combo, True, True, 0)
+        priority_box.pack_start(self.cpus_entry, False, False, 0)
+        vbox.pack_start(priority_box, False, False, 0)
+
         # Audio source
         audio_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
         audio_label = Gtk.Label(label="Audio source:")
@@ -270,6 +703,94 @@ class SettingsWindow(Gtk.Window):
         audio_box.pack_start(self.audio_combo, True, True, 0)
         vbox.pack_start(audio_box, False, False, 0)
 
+        # Snap to windows
+        self.snap_check = Gtk.CheckButton(label="Click to select a window")
+        self.snap_check.set_active(config.snap_to_windows)
+        self.snap_check.set_tooltip_text(
+            "Highlight the window under the pointer while selecting; a click "
+            "selects it and dragging still selects freely")
+        vbox.pack_start(self.snap_check, False, False, 0)
+
+        # Warm standby
+        self.standby_check = Gtk.CheckButton(label="Warm standby (start recording faster)")
+        self.standby_check.set_active(config.standby)
+        self.standby_check.set_tooltip_text(
+            "Start the capture engine as soon as a region is selected")
+        vbox.pack_start(self.standby_check, False, False, 0)
+
+        # Two-stage capture
+        self.two_stage_check = Gtk.CheckButton(label="Two-stage capture (encode after recording)")
+        self.two_stage_check.set_active(config.two_stage_capture)
+        self.two_stage_check.set_tooltip_text(
+            "Record to a lossless intermediate that is cheap to encode, then "
+            "convert to MP4 in the background. Avoids dropped frames on busy machines")
+        vbox.pack_start(self.two_stage_check, False, False, 0)
+
+        # Screencast mode
+        self.screencast_check = Gtk.CheckButton(label="Screencast mode (skip unchanged frames)")
+        self.screencast_check.set_active(config.screencast_mode)
+        self.screencast_check.set_tooltip_text(
+            "Only encode frames that change. Much smaller files and lower "
+            "CPU use for terminals, editors and other mostly static content")
+        vbox.pack_start(self.screencast_check, False, False, 0)
+
+        # Fragmented MP4
+        self.fragmented_check = Gtk.CheckButton(label="Crash-safe MP4 (fragmented)")
+        self.fragmented_check.set_active(config.fragmented_output)
+        self.fragmented_check.set_tooltip_text(
+            "Files stay playable even if recording is interrupted, and "
+            "stream in browsers without post-processing")
+        vbox.pack_start(self.fragmented_check, False, False, 0)
+
+        # GIF pipeline
+        self.gif_streaming_check = Gtk.CheckButton(label="Encode GIFs while recording")
+        self.gif_streaming_check.set_active(config.gif_streaming)
+        self.gif_streaming_check.set_tooltip_text(
+            "GIFs are ready as soon as recording stops. Turn off to convert "
+            "afterwards with a single shared palette (slower, smaller files)")
+        vbox.pack_start(self.gif_streaming_check, False, False, 0)
+
+        # Post-processing scheduling
+        self.background_check = Gtk.CheckButton(label="Low-priority conversions")
+        self.background_check.set_active(config.background_low_priority)
+        self.background_check.set_tooltip_text(
+            "Run GIF conversion and transcoding at the lowest CPU and disk "
+            "priority so they don't slow the desktop down")
+        vbox.pack_start(self.background_check, False, False, 0)
+
+        # Idle-time recompression
+        recompress_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.recompress_check = Gtk.CheckButton(label="Recompress recordings when idle, workers")
+        self.recompress_check.set_active(config.recompress_enabled)
+        self.recompress_check.set_tooltip_text(
+            "Re-encode finished MP4s with a slower preset while the computer is "
+            "idle. A file is only replaced if the result is smaller")
+        self.recompress_spin = Gtk.SpinButton.new_with_range(1, 8, 1)
+        self.recompress_spin.set_value(config.recompress_workers)
+        recompress_box.pack_start(self.recompress_check, False, False, 0)
+        recompress_box.pack_start(self.recompress_spin, False, False, 0)
+        vbox.pack_start(recompress_box, False, False, 0)
+
+        # Replay buffer
+        replay_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.replay_check = Gtk.CheckButton(label="Replay buffer, keep last")
+        self.replay_check.set_active(config.replay_enabled)
+        self.replay_check.set_tooltip_text(
+            "Continuously record the screen; the replay hotkey saves the last seconds")
+        self.replay_spin = Gtk.SpinButton.new_with_range(5, 600, 5)
+        self.replay_spin.set_value(config.replay_seconds)
+        replay_box.pack_start(self.replay_check, False, False, 0)
+        replay_box.pack_start(self.replay_spin, False, False, 0)
+        replay_box.pack_start(Gtk.Label(label="seconds"), False, False, 0)
+        self.replay_region_entry = Gtk.Entry()
+        self.replay_region_entry.set_text(config.replay_region)
+        self.replay_region_entry.set_placeholder_text("Full screen")
+        self.replay_region_entry.set_width_chars(14)
+        self.replay_region_entry.set_tooltip_text(
+            "Buffer only this region, as X,Y,W,H, e.g. 0,0,1920,1080")
+        replay_box.pack_start(self.replay_region_entry, False, False, 0)
+        vbox.pack_start(replay_box, False, False, 0)
+
         # Buttons
         button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
         button_box.set_halign(Gtk.Align.END)
@@ -295,12 +816,9 @@ class SettingsWindow(Gtk.Window):
         self._listening_target = target
         self._captured_keys = set()
 
-        if target == 'mp4':
-            self.listen_btn.set_label("Press keys...")
-            self.hotkey_entry.set_text("Press hotkey combination...")
-        else:
-            self.listen_gif_btn.set_label("Press keys...")
-            self.hotkey_gif_entry.set_text("Press hotkey combination...")
+        entry, button = self._listen_widgets(target)
+        button.set_label("Press keys...")
+        entry.set_text("Press hotkey combination...")
 
         def on_press(key):
             self._captured_keys.add(key)
@@ -323,6 +841,15 @@ class SettingsWindow(Gtk.Window):
             self._hotkey_listener = None
         self.listen_btn.set_label("Listen...")
         self.listen_gif_btn.set_label("Listen...")
+        self.listen_replay_btn.set_label("Listen...")
+
+    def _listen_widgets(self, target):
+        """Return the (entry, button) pair for a hotkey capture target."""
+        if target == 'mp4':
+            return self.hotkey_entry, self.listen_btn
+        if target == 'gif':
+            return self.hotkey_gif_entry, self.listen_gif_btn
+        return self.hotkey_replay_entry, self.listen_replay_btn
 
     def _finish_capture(self):
         from pynput import keyboard
@@ -353,10 +880,8 @@ class SettingsWindow(Gtk.Window):
 
         if parts:
             hotkey_str = "+".join(parts)
-            if self._listening_target == 'mp4':
-                self.hotkey_entry.set_text(hotkey_str)
-            else:
-                self.hotkey_gif_entry.set_text(hotkey_str)
+            entry, _ = self._listen_widgets(self._listening_target)
+            entry.set_text(hotkey_str)
 
         self._stop_listening()
 
@@ -376,15 +901,36 @@ class SettingsWindow(Gtk.Window):
 
     def _on_save(self, button):
         self._stop_listening()  # Stop listening if active
-        self.config.hotkey = self.hotkey_entry.get_text()
-        self.config.hotkey_gif = self.hotkey_gif_entry.get_text()
-        self.config.output_dir = self.output_entry.get_text()
-        self.config.framerate = int(self.fps_spin.get_value())
-        self.config.quality_profile = self.quality_combo.get_active_id()
-        self.config.audio_source = self.audio_combo.get_active_id()
+        # One write for the whole form
+        with self.config.transaction():
+            self.config.hotkey = self.hotkey_entry.get_text()
+            self.config.hotkey_gif = self.hotkey_gif_entry.get_text()
+            self.config.hotkey_replay = self.hotkey_replay_entry.get_text()
+            self.config.output_dir = self.output_entry.get_text()
+            self.config.framerate = int(self.fps_spin.get_value())
+            self.config.quality_profile = self.quality_combo.get_active_id()
+            self.config.video_format = self.format_combo.get_active_id()
+            self.config.target_size_mb = self.size_spin.get_value()
+            self.config.audio_source = self.audio_combo.get_active_id()
+            self.config.capture_backend = self.capture_combo.get_active_id()
+            self.config.capture_priority = self.priority_combo.get_active_id()
+            self.config.capture_cpus = self.cpus_entry.get_text()
+            self.config.background_low_priority = self.background_check.get_active()
+            self.config.snap_to_windows = self.snap_check.get_active()
+            self.config.standby = self.standby_check.get_active()
+            self.config.fragmented_output = self.fragmented_check.get_active()
+            self.config.screencast_mode = self.screencast_check.get_active()
+            self.config.two_stage_capture = self.two_stage_check.get_active()
+            self.config.gif_streaming = self.gif_streaming_check.get_active()
+            self.config.replay_enabled = self.replay_check.get_active()
+            self.config.recompress_enabled = self.recompress_check.get_active()
+            self.config.recompress_workers = int(self.recompress_spin.get_value())
+            self.config.replay_seconds = int(self.replay_spin.get_value())
+            self.config.replay_region = self.replay_region_entry.get_text()
 
         hotkeys_changed = (self.config.hotkey != self.original_hotkey or
-                          self.config.hotkey_gif != self.original_hotkey_gif)
+                          self.config.hotkey_gif != self.original_hotkey_gif or
+                          self.config.hotkey_replay != self.original_hotkey_replay)
         self.hide()
         if self.on_close_callback:
             self.on_close_callback(hotkeys_changed)
@@ -399,6 +945,138 @@ class SettingsWindow(Gtk.Window):
         return True  # Prevent destruction
 
 
+def format_recompress_status(entry):
+    """Short description of a Recompressor.statuses() entry."""
+    status = entry["status"]
+    if status == "done":
+        return f"recompressed from {entry['original_size'] / 1e6:.1f} MB"
+    if status == "kept":
+        return "already compact"
+    return status
+
+
+class LibraryWindow(Gtk.Window):
+    """Browses the recordings library newest first, a page at a time.
+
+    Rows come from the index, never from the files, and more are loaded
+    as the list scrolls to the bottom, so opening costs the same with ten
+    recordings or ten thousand. Thumbnails are filled in by a background
+    thread.
+    """
+
+    PAGE_SIZE = 50
+
+    def __init__(self, app):
+        super().__init__(title="Recordings")
+        self.app = app
+        self.library = app.library
+        self._after = None  # (created, path) of the last loaded row
+        self._exhausted = False
+        self._generation = 0  # Bumped on refresh so stale thumbnails are dropped
+        self._thumbnails = queue.Queue()
+        threading.Thread(target=self._thumbnail_worker, daemon=True).start()
+
+        self.set_default_size(560, 600)
+        self.set_border_width(12)
+        self.set_position(Gtk.WindowPosition.CENTER)
+        self.connect('delete-event', lambda w, e: w.hide() or True)
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        self.add(vbox)
+
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        self.count_label = Gtk.Label()
+        self.count_label.set_xalign(0)
+        rescan_btn = Gtk.Button(label="Rescan")
+        rescan_btn.connect('clicked', lambda b: self.app.show_library())
+        header.pack_start(self.count_label, True, True, 0)
+        header.pack_start(rescan_btn, False, False, 0)
+        vbox.pack_start(header, False, False, 0)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.connect('edge-reached', self._on_edge_reached)
+        self.listbox = Gtk.ListBox()
+        self.listbox.connect('row-activated', self._on_row_activated)
+        scrolled.add(self.listbox)
+        vbox.pack_start(scrolled, True, True, 0)
+
+    def refresh(self):
+        """Reload from the first page."""
+        self._generation += 1
+        for row in self.listbox.get_children():
+            self.listbox.remove(row)
+        self._after = None
+        self._exhausted = False
+        self.count_label.set_text(f"{self.library.count()} recordings")
+        self._load_page()
+
+    def _load_page(self):
+        entries = self.library.page(self.PAGE_SIZE, self._after)
+        self._exhausted = len(entries) < self.PAGE_SIZE
+        statuses = self.app.recompressor.statuses()
+        for entry in entries:
+            self.listbox.add(self._make_row(entry, statuses))
+        if entries:
+            self._after = (entries[-1]["created"], entries[-1]["path"])
+        self.listbox.show_all()
+
+    def _make_row(self, entry, statuses):
+        row = Gtk.ListBoxRow()
+        row.path = entry["path"]
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        image = Gtk.Image.new_from_icon_name("video-x-generic", Gtk.IconSize.DIALOG)
+        image.set_size_request(160, 90)
+        self._thumbnails.put((self._generation, entry, image))
+
+        details = []
+        if entry["width"] and entry["height"]:
+            details.append(f"{entry['width']}x{entry['height']}")
+        if entry["codec"]:
+            details.append(entry["codec"])
+        if entry["duration"] is not None:
+            details.append(f"{entry['duration']:.1f} s")
+        details.append(f"{entry['size'] / 1e6:.1f} MB")
+        recompressed = statuses.get(entry["path"])
+        if recompressed:
+            details.append(format_recompress_status(recompressed))
+        created = datetime.fromtimestamp(entry["created"]).strftime("%Y-%m-%d %H:%M")
+        label = Gtk.Label()
+        label.set_xalign(0)
+        label.set_markup(
+            f"<b>{GLib.markup_escape_text(os.path.basename(entry['path']))}</b>\n"
+            f"{GLib.markup_escape_text(' · '.join(details))}\n{created}")
+
+        hbox.pack_start(image, False, False, 0)
+        hbox.pack_start(label, True, True, 0)
+        row.add(hbox)
+        return row
+
+    def _thumbnail_worker(self):
+        while True:
+            generation, entry, image = self._thumbnails.get()
+            if generation != self._generation:
+                continue  # The row was removed by a refresh
+            path = self.library.thumbnail(entry)
+            if path:
+                GLib.idle_add(self._set_thumbnail, generation, image, path)
+
+    def _set_thumbnail(self, generation, image, path):
+        if generation == self._generation:
+            try:
+                image.set_from_pixbuf(GdkPixbuf.Pixbuf.new_from_file(path))
+            except GLib.Error:
+                pass
+        return False
+
+    def _on_edge_reached(self, scrolled, position):
+        if position == Gtk.PositionType.BOTTOM and not self._exhausted:
+            self._load_page()
+
+    def _on_row_activated(self, listbox, row):
+        subprocess.Popen(['xdg-open', row.path])
+
+
 class TrayIcon:
     def __init__(self, app):
         self.app = app
@@ -411,6 +1089,16 @@ class TrayIcon:
         self.icon.connect('activate', self._on_activate)
         self.icon.set_visible(True)
 
+    def show_jobs(self, jobs):
+        """Show background job progress in the tooltip."""
+        lines = ["Quick WebM Recorder"]
+        for job in jobs:
+            if job.progress is not None:
+                lines.append(f"{job.name}... {job.progress * 100:.0f}%")
+            else:
+                lines.append(f"{job.name}...")
+        self.icon.set_tooltip_text("\n".join(lines))
+
     def _on_activate(self, icon):
         # Left click - start recording
         if self.app.state == self.app.IDLE:
@@ -432,6 +1120,33 @@ class TrayIcon:
         settings_item.connect('activate', lambda x: self.app.show_settings())
         menu.append(settings_item)
 
+        # Library item
+        library_item = Gtk.MenuItem(label="Recordings")
+        library_item.connect('activate', lambda x: self.app.show_library())
+        menu.append(library_item)
+
+        # Calibrate item
+        calibrate_item = Gtk.MenuItem(label="Calibrate Encoder")
+        calibrate_item.connect('activate', lambda x: self.app.calibrate_encoder())
+        calibrate_item.set_tooltip_text("Benchmark encoder settings on this machine (takes a few minutes)")
+        menu.append(calibrate_item)
+
+        # Pause or resume idle-time recompression
+        if self.app.recompressor.is_running():
+            paused = self.app.recompressor.paused
+            recompress_item = Gtk.MenuItem(
+                label="Resume Recompression" if paused else "Pause Recompression")
+            recompress_item.connect(
+                'activate', lambda x: (self.app.recompressor.resume() if paused
+                                       else self.app.recompressor.pause()))
+            menu.append(recompress_item)
+
+        # Cancel background work (conversions keep their source recording)
+        cancel_jobs_item = Gtk.MenuItem(label="Cancel Conversions")
+        cancel_jobs_item.connect('activate', lambda x: self.app.jobs.cancel_all())
+        cancel_jobs_item.set_sensitive(bool(self.app.jobs.jobs()))
+        menu.append(cancel_jobs_item)
+
         # About item
         about_item = Gtk.MenuItem(label="About")
         about_item.connect('activate', lambda x: self.app.show_about())
@@ -3,11 +3,149 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib
 import cairo
 
+from spatial import RectIndex, clip_rect
+
+
+def get_screen_bounds():
+    """Return (x, y, w, h) spanning all monitors."""
+    display = Gdk.Display.get_default()
+    min_x = min_y = 0
+    max_x = max_y = 0
+    for i in range(display.get_n_monitors()):
+        geom = display.get_monitor(i).get_geometry()
+        min_x = min(min_x, geom.x)
+        min_y = min(min_y, geom.y)
+        max_x = max(max_x, geom.x + geom.width)
+        max_y = max(max_y, geom.y + geom.height)
+    return min_x, min_y, max_x - min_x, max_y - min_y
+
+
+def monitor_rects():
+    """Geometry (x, y, w, h) of every monitor."""
+    display = Gdk.Display.get_default()
+    rects = []
+    for i in range(display.get_n_monitors()):
+        geom = display.get_monitor(i).get_geometry()
+        rects.append((geom.x, geom.y, geom.width, geom.height))
+    return rects
+
+
+def _cardinals(window, name):
+    prop = window.get_full_property(window.display.intern_atom(name), 0)
+    return list(prop.value) if prop else None
+
+
+def window_rects():
+    """Frames (x, y, w, h) of visible top-level windows, bottom first.
+
+    Read from the window manager's stacking list, with title bars and
+    borders included and client-side shadows left out. Empty without
+    python-xlib or an EWMH window manager.
+    """
+    try:
+        from Xlib import X, error
+        from Xlib.display import Display
+    except ImportError:
+        return []
+    try:
+        display = Display()
+    except error.DisplayError:
+        return []
+    try:
+        root = display.screen().root
+        stacking = _cardinals(root, '_NET_CLIENT_LIST_STACKING') or []
+        current_desktop = (_cardinals(root, '_NET_CURRENT_DESKTOP') or [None])[0]
+        hidden = display.intern_atom('_NET_WM_STATE_HIDDEN')
+        rects = []
+        for window_id in stacking:
+            window = display.create_resource_object('window', window_id)
+            try:
+                if window.get_attributes().map_state != X.IsViewable:
+                    continue
+                desktop = (_cardinals(window, '_NET_WM_DESKTOP') or [None])[0]
+                if desktop not in (None, current_desktop, 0xFFFFFFFF):
+                    continue
+                if hidden in (_cardinals(window, '_NET_WM_STATE') or []):
+                    continue
+                geometry = window.get_geometry()
+                origin = root.translate_coords(window, 0, 0)
+                left, right, top, bottom = _cardinals(window, '_NET_FRAME_EXTENTS') or (0, 0, 0, 0)
+                shadow_left, shadow_right, shadow_top, shadow_bottom = (
+                    _cardinals(window, '_GTK_FRAME_EXTENTS') or (0, 0, 0, 0))
+            except error.XError:
+                continue  # Closed while we were looking
+            rects.append((origin.x - left + shadow_left,
+                          origin.y - top + shadow_top,
+                          geometry.width + left + right - shadow_left - shadow_right,
+                          geometry.height + top + bottom - shadow_top - shadow_bottom))
+        return rects
+    finally:
+        display.close()
+
+
+# The selection border is stroked 2px wide on the rectangle's edge;
+# damage must reach past it to cover the stroke and its antialiasing
+SELECTION_LINE_WIDTH = 2
+DAMAGE_MARGIN = SELECTION_LINE_WIDTH
+
+
+def _grown(rect, amount):
+    x, y, w, h = rect
+    return cairo.RectangleInt(x - amount, y - amount,
+                              max(0, w + 2 * amount), max(0, h + 2 * amount))
+
+
+def selection_damage(old, new):
+    """Region that changes when the selection cutout moves from old to new.
+
+    Rects are (x, y, w, h) in overlay coordinates, None for no cutout.
+    Inside both cutouts stays clear and outside both stays dark, so only
+    the band between them (plus the border stroke) needs repainting.
+    """
+    damage = cairo.Region()
+    interior = None
+    for rect in (old, new):
+        if rect is None:
+            continue
+        damage.union(_grown(rect, DAMAGE_MARGIN))
+        inner = cairo.Region(_grown(rect, -DAMAGE_MARGIN))
+        if interior is None:
+            interior = inner
+        else:
+            interior.intersect(inner)
+    if old is not None and new is not None:
+        damage.subtract(interior)
+    return damage
+
+
+def paint_overlay(cr, rect, opacity):
+    """Dim everything, leaving rect (x, y, w, h) clear with a white border."""
+    # Fill with semi-transparent dark overlay
+    cr.set_source_rgba(0, 0, 0, opacity)
+    cr.set_operator(cairo.OPERATOR_SOURCE)
+    cr.paint()
+    if rect is None:
+        return
+
+    # Clear the selection area (make it fully transparent)
+    x, y, w, h = rect
+    cr.set_source_rgba(0, 0, 0, 0)
+    cr.rectangle(x, y, w, h)
+    cr.fill()
+
+    # Draw a white border around the selection
+    cr.set_operator(cairo.OPERATOR_OVER)
+    cr.set_source_rgb(1, 1, 1)
+    cr.set_line_width(SELECTION_LINE_WIDTH)
+    cr.rectangle(x, y, w, h)
+    cr.stroke()
+
 
 class SelectionManager:
     """Manages region selection using a semi-transparent fullscreen overlay."""
 
     OVERLAY_OPACITY = 0.3  # Darkness of the overlay (0-1)
+    MIN_SIZE = 10  # Smaller drags are clicks
 
     def __init__(self):
         # Selection state
@@ -16,6 +154,23 @@ class SelectionManager:
         self.is_dragging = False
         self.selection = None  # (x, y, w, h) when complete
 
+        # Earlier regions kept with "Add Region", recorded together with
+        # the current selection (see group.py)
+        self.pinned_selections = []
+        self._pinned_borders = []
+
+        # Snap mode: a click selects the window (or monitor) under the
+        # pointer. Window rects are read once per selection into
+        # _snap_index so motion never waits on the X server.
+        self.snap_to_windows = True
+        self._snap_index = None
+        self._snap_rect = None  # Highlighted target, root coordinates
+
+        # Cutout as last queued for drawing (overlay coordinates), and the
+        # frame clock callback that applies pending pointer motion
+        self._drawn_rect = None
+        self._tick_id = None
+
         # Screen geometry for coordinate translation
         self._screen_x = 0
         self._screen_y = 0
@@ -31,6 +186,7 @@ class SelectionManager:
         self.on_cancel = None
         self.on_start_recording = None
         self.on_stop_recording = None
+        self.on_add_region = None
 
         # Fullscreen overlay for capturing mouse events
         self._overlay = Gtk.Window(type=Gtk.WindowType.POPUP)
@@ -62,6 +218,7 @@ class SelectionManager:
         self.toolbar.on_start = self._toolbar_start
         self.toolbar.on_stop = self._toolbar_stop
         self.toolbar.on_abort = self._toolbar_abort
+        self.toolbar.on_add = self._toolbar_add
         self.toolbar.on_drag = self._on_drag
         self.border_window.on_drag = self._on_drag
 
@@ -76,6 +233,25 @@ class SelectionManager:
     def _toolbar_abort(self):
         self.cancel()
 
+    def _toolbar_add(self):
+        if self.on_add_region:
+            self.on_add_region()
+
+    def pin_selection(self):
+        """Keep the current selection on screen while another is drawn."""
+        if not self.selection:
+            return
+        border = BorderWindow()
+        border.update_from_selection(*self.selection)
+        self._pinned_borders.append(border)
+        self.pinned_selections.append(self.selection)
+
+    def clear_pinned(self):
+        for border in self._pinned_borders:
+            border.destroy()
+        self._pinned_borders = []
+        self.pinned_selections = []
+
     def _on_drag(self, dx, dy):
         """Handle drag to reposition selection."""
         if self.selection:
@@ -87,33 +263,70 @@ class SelectionManager:
             self.toolbar.position_below(self.selection)
 
     def _on_draw(self, widget, cr):
-        alloc = widget.get_allocation()
+        # GTK clips cr to the invalidated region, so during a drag this only
+        # touches the strip between the previous and current cutout
+        paint_overlay(cr, self._drawn_rect, self.OVERLAY_OPACITY)
+
+    def _drag_rect(self):
+        """Dragged rectangle as (x, y, w, h) in root coordinates, or None."""
+        if not self.is_dragging:
+            return None
+        x = min(self.start_x, self.end_x)
+        y = min(self.start_y, self.end_y)
+        return x, y, abs(self.end_x - self.start_x), abs(self.end_y - self.start_y)
+
+    def _selection_rect(self):
+        """Current cutout as (x, y, w, h) in overlay coordinates, or None."""
+        rect = self._drag_rect()
+        if self._snap_rect and (rect is None or
+                                (rect[2] <= self.MIN_SIZE and rect[3] <= self.MIN_SIZE)):
+            rect = self._snap_rect  # Not dragging yet; show the click target
+        if rect is None:
+            return None
+        x, y, w, h = rect
+        return x - self._screen_x, y - self._screen_y, w, h
+
+    def _build_snap_index(self, bounds):
+        """Index monitors, then windows on top, clipped to the screen."""
+        index = RectIndex([])
+        for rect in monitor_rects() + window_rects():
+            rect = clip_rect(rect, bounds)
+            if rect:
+                index.add(rect)
+        return index
+
+    def _update_snap(self, x, y):
+        """Highlight the window under (x, y); True if the target changed."""
+        if self._snap_index is None:
+            return False
+        rect = self._snap_index.hit(x, y)
+        changed = rect != self._snap_rect
+        self._snap_rect = rect
+        return changed
+
+    def _schedule_draw(self):
+        # Redrawn once per frame however fast the pointer reports
+        if self._tick_id is None:
+            self._tick_id = self._overlay.add_tick_callback(self._on_tick)
+
+    def _queue_selection_draw(self):
+        """Invalidate only what changed since the cutout was last queued."""
+        rect = self._selection_rect()
+        if rect == self._drawn_rect:
+            return
+        self._overlay.queue_draw_region(selection_damage(self._drawn_rect, rect))
+        self._drawn_rect = rect
 
-        # Fill with semi-transparent dark overlay
-        cr.set_source_rgba(0, 0, 0, self.OVERLAY_OPACITY)
-        cr.set_operator(cairo.OPERATOR_SOURCE)
-        cr.paint()
+    def _on_tick(self, widget, frame_clock):
+        # Any number of motion events since the last frame become one update
+        self._tick_id = None
+        self._queue_selection_draw()
+        return GLib.SOURCE_REMOVE
 
-        # If dragging, cut out the selection area to show it clearly
-        if self.is_dragging:
-            # Calculate selection rectangle in window coordinates
-            x1 = min(self.start_x, self.end_x) - self._screen_x
-            y1 = min(self.start_y, self.end_y) - self._screen_y
-            x2 = max(self.start_x, self.end_x) - self._screen_x
-            y2 = max(self.start_y, self.end_y) - self._screen_y
-
-            # Clear the selection area (make it fully transparent)
-            cr.set_operator(cairo.OPERATOR_SOURCE)
-            cr.set_source_rgba(0, 0, 0, 0)
-            cr.rectangle(x1, y1, x2 - x1, y2 - y1)
-            cr.fill()
-
-            # Draw a white border around the selection
-            cr.set_operator(cairo.OPERATOR_OVER)
-            cr.set_source_rgb(1, 1, 1)
-            cr.set_line_width(2)
-            cr.rectangle(x1, y1, x2 - x1, y2 - y1)
-            cr.stroke()
+    def _cancel_tick(self):
+        if self._tick_id is not None:
+            self._overlay.remove_tick_callback(self._tick_id)
+            self._tick_id = None
 
     def show_for_selection(self):
         self.selection = None
@@ -121,30 +334,27 @@ class SelectionManager:
         self.border_window.hide()
         self.toolbar.hide()
         self.is_dragging = False
+        self._cancel_tick()
+        self._drawn_rect = None
+        self._snap_rect = None
 
         # Cover the entire screen
         display = Gdk.Display.get_default()
-        monitor = display.get_primary_monitor() or display.get_monitor(0)
-        geometry = monitor.get_geometry()
-
-        # For multi-monitor, get full screen bounds
-        n_monitors = display.get_n_monitors()
-        min_x = min_y = 0
-        max_x = max_y = 0
-        for i in range(n_monitors):
-            mon = display.get_monitor(i)
-            geom = mon.get_geometry()
-            min_x = min(min_x, geom.x)
-            min_y = min(min_y, geom.y)
-            max_x = max(max_x, geom.x + geom.width)
-            max_y = max(max_y, geom.y + geom.height)
+        min_x, min_y, width, height = get_screen_bounds()
 
         # Store screen offset for coordinate translation
         self._screen_x = min_x
         self._screen_y = min_y
 
+        self._snap_index = None
+        if self.snap_to_windows:
+            self._snap_index = self._build_snap_index((min_x, min_y, width, height))
+            _, pointer_x, pointer_y = display.get_default_seat().get_pointer().get_position()
+            self._update_snap(pointer_x, pointer_y)
+            self._drawn_rect = self._selection_rect()
+
         self._overlay.move(min_x, min_y)
-        self._overlay.resize(max_x - min_x, max_y - min_y)
+        self._overlay.resize(width, height)
         self._overlay.show_all()
         self._overlay.present()
 
@@ -157,8 +367,8 @@ class SelectionManager:
 
     def on_button_press(self, widget, event):
         if event.button == 1:  # Left click
-            self.start_x = int(event.x_root)
-            self.start_y = int(event.y_root)
+            self.start_x = self.end_x = int(event.x_root)
+            self.start_y = self.end_y = int(event.y_root)
             self.is_dragging = True
         elif event.button == 3:  # Right click to cancel
             self.cancel()
@@ -167,8 +377,9 @@ class SelectionManager:
         if self.is_dragging:
             self.end_x = int(event.x_root)
             self.end_y = int(event.y_root)
-            # Redraw overlay to show selection cutout
-            self._overlay.queue_draw()
+            self._schedule_draw()
+        elif self._update_snap(int(event.x_root), int(event.y_root)):
+            self._schedule_draw()
 
     def on_button_release(self, widget, event):
         if self.is_dragging and event.button == 1:
@@ -176,6 +387,7 @@ class SelectionManager:
             self.end_x = int(event.x_root)
             self.end_y = int(event.y_root)
 
+            self._cancel_tick()
             self._overlay.hide()
 
             # Calculate normalized rectangle
@@ -183,8 +395,11 @@ class SelectionManager:
             y = min(self.start_y, self.end_y)
             w = abs(self.end_x - self.start_x)
             h = abs(self.end_y - self.start_y)
+            if self._snap_rect and w <= self.MIN_SIZE and h <= self.MIN_SIZE:
+                # A click selects the highlighted window
+                x, y, w, h = self._snap_rect
 
-            if w > 10 and h > 10:  # Minimum size
+            if w > self.MIN_SIZE and h > self.MIN_SIZE:  # Minimum size
                 # Snap to even dimensions for H.264 compatibility
                 # Round down to avoid extending into the border
                 w = w - (w % 2)
@@ -199,10 +414,8 @@ class SelectionManager:
                 if self.on_selection_complete:
                     self.on_selection_complete(self.selection)
             else:
-                # Selection too small, cancel
-                self.border_window.hide()
-                if self.on_cancel:
-                    self.on_cancel()
+                # Selection too small; cancel, dropping any pinned regions too
+                self.cancel()
 
     def on_key_press(self, widget, event):
         if event.keyval == Gdk.KEY_Escape:
@@ -210,14 +423,18 @@ class SelectionManager:
 
     def cancel(self):
         self.is_dragging = False
+        self._cancel_tick()
         self._overlay.hide()
         self.border_window.hide()
         self.toolbar.hide()
+        self.clear_pinned()
         if self.on_cancel:
             self.on_cancel()
 
     def set_recording(self, recording):
         self.border_window.set_recording(recording)
+        for border in self._pinned_borders:
+            border.set_recording(recording)
         self.toolbar.set_recording(recording)
 
 
@@ -233,6 +450,7 @@ class ToolbarWindow(Gtk.Window):
         self.on_start = None
         self.on_stop = None
         self.on_abort = None
+        self.on_add = None
         self.on_drag = None  # Called with (dx, dy) delta
 
         self._recording = False
@@ -267,9 +485,25 @@ class ToolbarWindow(Gtk.Window):
         self.abort_btn = Gtk.Button(label="Cancel")
         self.abort_btn.connect('clicked', self._on_abort_clicked)
 
+        # Select another region to record at the same time
+        self.add_btn = Gtk.Button(label="Add Region")
+        self.add_btn.connect('clicked', self._on_add_clicked)
+        self.add_btn.set_no_show_all(True)
+        self.add_btn.show()
+
         box.pack_start(self.start_btn, True, True, 0)
+        box.pack_start(self.add_btn, True, True, 0)
         box.pack_start(self.abort_btn, True, True, 0)
-        self.event_box.add(box)
+
+        # Live capture stats, shown only while recording
+        self.stats_label = Gtk.Label()
+        self.stats_label.set_margin_bottom(6)
+        self.stats_label.set_no_show_all(True)
+
+        outer = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        outer.pack_start(box, False, False, 0)
+        outer.pack_start(self.stats_label, False, False, 0)
+        self.event_box.add(outer)
         self.add(self.event_box)
 
     def set_recording(self, recording):
@@ -278,9 +512,20 @@ class ToolbarWindow(Gtk.Window):
         if recording:
             self.start_btn.set_label("Finish and Save")
             self.abort_btn.set_sensitive(False)
+            self.add_btn.hide()
         else:
             self.start_btn.set_label("Start Recording")
             self.abort_btn.set_sensitive(True)
+            self.add_btn.show()
+            self.stats_label.hide()
+
+    def set_stats(self, text, falling_behind=False):
+        """Show a line of capture stats; red when capture can't keep up."""
+        text = GLib.markup_escape_text(text)
+        if falling_behind:
+            text = f'<span foreground="red">{text}</span>'
+        self.stats_label.set_markup(f'<small>{text}</small>')
+        self.stats_label.show()
 
     def _on_start_clicked(self, button):
         if self._recording:
@@ -294,6 +539,10 @@ class ToolbarWindow(Gtk.Window):
         if self.on_abort:
             self.on_abort()
 
+    def _on_add_clicked(self, button):
+        if self.on_add:
+            self.on_add()
+
     def _on_drag_start(self, widget, event):
         if event.button == 1:
             self._dragging = True
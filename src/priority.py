@@ -0,0 +1,100 @@
+"""Scheduling policy for ffmpeg child processes.
+
+Live capture can run at a raised priority and be pinned to chosen cores
+so other load doesn't make it drop frames. Post-processing (GIF
+conversion, two-stage transcode) can run at the lowest CPU priority and
+in the idle IO class so it never slows the desktop down.
+
+The policies are applied by prefixing the ffmpeg command with nice,
+ionice and taskset, which set them and exec ffmpeg, so every ffmpeg
+thread inherits them. (A preexec_fn isn't safe here: the app runs job,
+recompression and progress reader threads.)
+"""
+import os
+import resource
+import shutil
+
+CAPTURE_HIGH_NICE = -10
+BACKGROUND_NICE = 19
+IOPRIO_CLASS_IDLE = 3
+
+_missing_tools = set()
+
+
+def parse_cpu_list(text):
+    """Parse a CPU list like "2,3" or "4-7" into a set of CPU numbers.
+
+    CPUs this process isn't allowed to use are left out. Raises ValueError
+    for malformed input.
+    """
+    cpus = set()
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if sep:
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(first))
+    return cpus & os.sched_getaffinity(0)
+
+
+def lowest_allowed_nice():
+    """The most favourable nice value this user may set (RLIMIT_NICE)."""
+    if os.geteuid() == 0:
+        return -20
+    soft, _ = resource.getrlimit(resource.RLIMIT_NICE)
+    if soft == resource.RLIM_INFINITY:
+        return -20
+    # The limit is stored as 20 - nice
+    return max(-20, 20 - soft)
+
+
+def _tool(name):
+    """True if the command-line tool is installed; warns once if not."""
+    if shutil.which(name):
+        return True
+    if name not in _missing_tools:
+        _missing_tools.add(name)
+        print(f"Warning: {name} not found; its scheduling policy is not applied")
+    return False
+
+
+def capture_wrapper(config):
+    """Words to put in front of a live capture command; empty at default
+    priority."""
+    nice = None
+    current = os.getpriority(os.PRIO_PROCESS, 0)
+    if config.capture_priority == "high":
+        nice = max(CAPTURE_HIGH_NICE, lowest_allowed_nice())
+        if nice >= current:
+            print("Capture priority: not allowed to raise priority (see RLIMIT_NICE)")
+            nice = None
+    cpus = None
+    if config.capture_cpus:
+        try:
+            cpus = parse_cpu_list(config.capture_cpus) or None
+        except ValueError:
+            print(f"Ignoring invalid capture CPU list: {config.capture_cpus}")
+
+    wrapper = []
+    if nice is not None and _tool("nice"):
+        # nice takes an adjustment, not an absolute value
+        wrapper += ['nice', '-n', str(nice - current)]
+    if cpus is not None and _tool("taskset"):
+        wrapper += ['taskset', '-c', ",".join(map(str, sorted(cpus)))]
+    return wrapper
+
+
+def background_wrapper(config):
+    """Words to put in front of a post-processing command; empty at default
+    priority."""
+    if not config.background_low_priority:
+        return []
+    wrapper = []
+    if _tool("nice"):
+        wrapper += ['nice', '-n', str(BACKGROUND_NICE)]  # Clamped at 19
+    if _tool("ionice"):
+        # -t: run the command anyway if the IO class can't be set
+        wrapper += ['ionice', '-c', str(IOPRIO_CLASS_IDLE), '-t']
+    return wrapper
@@ -0,0 +1,65 @@
+"""Parsing for ffmpeg's machine-readable -progress output."""
+
+# Arguments that make ffmpeg write progress blocks to stdout
+PROGRESS_ARGS = ['-progress', 'pipe:1', '-nostats']
+
+
+def iter_progress(stream):
+    """Yield a dict of raw key/value strings for every progress block.
+
+    ffmpeg writes one key=value per line and ends each block with a
+    progress=continue (or progress=end) line.
+    """
+    block = {}
+    for line in stream:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        block[key] = value
+        if key == 'progress':
+            yield block
+            block = {}
+
+
+def _number(value, suffix='', cast=float):
+    if value is None:
+        return None
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return cast(value)
+    except ValueError:
+        return None  # ffmpeg reports N/A before the first frame
+
+
+def parse_stats(block):
+    """Convert a raw progress block into typed capture statistics."""
+    out_time_us = _number(block.get('out_time_us'), cast=int)
+    return {
+        "frame": _number(block.get('frame'), cast=int),
+        "fps": _number(block.get('fps')),
+        "speed": _number(block.get('speed'), 'x'),
+        "bitrate_kbps": _number(block.get('bitrate'), 'kbits/s'),
+        "size_bytes": _number(block.get('total_size'), cast=int),
+        "duration": out_time_us / 1e6 if out_time_us is not None else None,
+        "dup_frames": _number(block.get('dup_frames'), cast=int) or 0,
+        "drop_frames": _number(block.get('drop_frames'), cast=int) or 0,
+        "ended": block.get('progress') == 'end',
+    }
+
+
+def format_stats(stats):
+    """One-line human summary of parse_stats() output."""
+    parts = []
+    if stats["fps"] is not None:
+        parts.append(f"{stats['fps']:.0f} fps")
+    if stats["speed"] is not None:
+        parts.append(f"{stats['speed']:.2f}x")
+    parts.append(f"drop {stats['drop_frames']}")
+    parts.append(f"dup {stats['dup_frames']}")
+    if stats["bitrate_kbps"] is not None:
+        parts.append(f"{stats['bitrate_kbps'] / 1000:.1f} Mbit/s")
+    if stats["size_bytes"] is not None:
+        parts.append(f"{stats['size_bytes'] / 1e6:.1f} MB")
+    return " · ".join(parts)
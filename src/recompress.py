@@ -0,0 +1,357 @@
+"""Idle-time recompression of finished recordings.
+
+Recordings are captured with fast x264 presets to keep up in real time,
+which leaves them several times larger than they need to be. When the
+machine is idle, Recompressor re-encodes finished MP4s in the output
+folder with a slower preset on a small pool of low-priority workers and
+swaps a result in only if it is smaller. The CRF a file was recorded
+with is read back from the file, so only the preset changes.
+"""
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+from config import CONFIG_DIR
+from library import is_recording_file, probe
+from priority import background_wrapper
+
+STATE_FILE = os.path.join(CONFIG_DIR, "recompress_state.json")
+
+# Only recordings untouched for this long are considered finished
+MIN_AGE_SECONDS = 5 * 60
+
+# The machine counts as idle when this share of CPU time was idle over the
+# last sample interval
+IDLE_CPU_FRACTION = 0.75
+CHECK_INTERVAL = 30
+
+# How long stop() waits for workers to wind down; it may run on the GTK
+# main loop, and workers clean up after themselves once they see the flag
+STOP_TIMEOUT = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"  # Replaced with a smaller file
+KEPT = "kept"  # Re-encode wasn't smaller; original kept
+SKIPPED = "skipped"  # Not an H.264 MP4 recorded at a constant quality
+FAILED = "failed"
+
+# x264 stores its settings as text in the first keyframe ("x264 - core 164
+# ... rc=crf ... crf=23.0 ..."); how far into a file to look for them
+X264_INFO_MARKER = b"x264 - core"
+X264_INFO_SCAN_BYTES = 16 * 1024 * 1024
+X264_INFO_MAX_BYTES = 4096
+
+
+def cpu_times():
+    """(idle, total) jiffies from /proc/stat.
+
+    Niced time counts as idle: it includes our own nice 19 encodes, which
+    shouldn't stop the machine from counting as idle.
+    """
+    with open("/proc/stat") as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[1] + fields[3] + (fields[4] if len(fields) > 4 else 0)  # nice, idle, iowait
+    return idle, sum(fields)
+
+
+def x264_crf(path):
+    """The CRF path's H.264 stream was encoded with, or None.
+
+    None if x264's settings can't be found or it wasn't encoded at a
+    constant quality (e.g. a target-size recording). A lossless encode
+    (rc=cqp with qp=0) counts as CRF 0.
+    """
+    data = b""
+    start = -1
+    try:
+        with open(path, 'rb') as f:
+            while start == -1 and f.tell() < X264_INFO_SCAN_BYTES:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    return None
+                # Keep a tail so a marker split across reads is still found
+                data = data[-len(X264_INFO_MARKER):] + chunk
+                start = data.find(X264_INFO_MARKER)
+            if start == -1:
+                return None
+            info = data[start:] + f.read(X264_INFO_MAX_BYTES)
+    except OSError:
+        return None
+    info = info[:X264_INFO_MAX_BYTES].split(b"\0", 1)[0]
+    options = dict(re.findall(rb"(\w+)=(\S+)", info))
+    try:
+        if options.get(b"rc") == b"crf":
+            return float(options[b"crf"])
+        if options.get(b"rc") == b"cqp" and float(options[b"qp"]) == 0:
+            return 0.0
+    except (KeyError, ValueError):
+        pass
+    return None
+
+
+class Recompressor:
+    """Background service that shrinks finished recordings when idle.
+
+    busy_paths is called to get files that must not be touched (the
+    recording in progress and anything still being finalized); on_update
+    is called with no arguments whenever a file's status changes.
+    """
+
+    def __init__(self, config, library=None, busy_paths=None, on_update=None):
+        self.config = config
+        self.library = library
+        self.busy_paths = busy_paths or (lambda: set())
+        self.on_update = on_update
+        self._state = self._load_state()
+        self._lock = threading.Lock()
+        self._paused = threading.Event()
+        self._stop = threading.Event()
+        self._processes = {}  # path -> running ffmpeg
+        self._claimed = set()  # Paths a worker is handling, from claim to finish
+        self._pending = []
+        self._threads = []
+        self._last_cpu = None
+        self.workers = 0  # Size of the running pool
+
+    def start(self):
+        if self._threads:
+            return
+        # Each pool gets its own flag, so workers of a stopped pool that are
+        # still winding down aren't revived by a restart
+        stop = self._stop = threading.Event()
+        workers = self.workers = max(1, self.config.recompress_workers)
+        self._threads = [threading.Thread(target=self._worker, args=(stop,), daemon=True)
+                         for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+        print(f"Recompression enabled ({workers} worker{'s' if workers > 1 else ''})")
+
+    def stop(self):
+        self._stop.set()
+        self._kill_running()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def is_running(self):
+        return bool(self._threads)
+
+    def pause(self):
+        """Stop running encodes right away; they are retried on resume."""
+        self._paused.set()
+        self._kill_running()
+        print("Recompression paused")
+
+    def resume(self):
+        self._paused.clear()
+        print("Recompression resumed")
+
+    @property
+    def paused(self):
+        return self._paused.is_set()
+
+    def statuses(self):
+        """path -> {"status", "original_size", "new_size"} for every file seen."""
+        with self._lock:
+            return {path: dict(entry) for path, entry in self._state.items()}
+
+    def _worker(self, stop):
+        while not stop.is_set():
+            if self._paused.is_set() or not self._is_idle():
+                stop.wait(CHECK_INTERVAL)
+                continue
+            path = self._next_candidate()
+            if path is None:
+                stop.wait(CHECK_INTERVAL)
+                continue
+            try:
+                self._recompress(path, stop)
+            finally:
+                with self._lock:
+                    self._claimed.discard(path)
+
+    def _is_idle(self):
+        """True if the CPU was mostly idle since the previous check."""
+        try:
+            now = cpu_times()
+        except OSError:
+            return False
+        with self._lock:
+            last, self._last_cpu = self._last_cpu, now
+        if last is None:
+            return False
+        idle = now[0] - last[0]
+        total = now[1] - last[1]
+        return total > 0 and idle / total >= IDLE_CPU_FRACTION
+
+    def _next_candidate(self):
+        """Claim the next finished recording that hasn't been handled yet.
+
+        The claim is released by the worker once it is done with the file.
+        """
+        with self._lock:
+            if not self._pending:
+                self._pending = self._find_candidates()
+            busy = self.busy_paths()
+            while self._pending:
+                path = self._pending.pop(0)
+                if path in busy or path in self._claimed:
+                    continue
+                entry = self._state.get(path)
+                if entry and entry["status"] not in (QUEUED, RUNNING):
+                    continue
+                self._state[path] = {"status": RUNNING, "original_size": None,
+                                     "new_size": None}
+                self._claimed.add(path)
+                return path
+        return None
+
+    def _find_candidates(self):
+        directory = self.config.output_dir
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return []
+        # Forget files that have been deleted
+        present = {entry.path for entry in entries}
+        for path in [p for p in self._state if p not in present]:
+            del self._state[path]
+
+        now = time.time()
+        candidates = []
+        for entry in entries:
+            if entry.path in self._claimed:
+                continue
+            if not entry.is_file() or not is_recording_file(entry.name):
+                continue
+            if not entry.name.endswith(".mp4"):
+                continue
+            if now - entry.stat().st_mtime < MIN_AGE_SECONDS:
+                continue  # May still be recording or finalizing
+            state = self._state.get(entry.path)
+            if state and state["status"] not in (QUEUED, RUNNING):
+                continue
+            candidates.append(entry.path)
+        return sorted(candidates)
+
+    def _recompress(self, path, stop):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._set_status(path, FAILED)
+            return
+        _, _, _, codec = probe(path)
+        crf = x264_crf(path) if codec == "h264" else None
+        if crf is None:
+            self._set_status(path, SKIPPED, st.st_size)
+            return
+
+        directory, name = os.path.split(path)
+        # Hidden, so neither the library nor another scan picks it up
+        tmp_path = os.path.join(directory, f".{name}.recompress.mp4")
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-i', path,
+            '-map', '0',
+            '-c:v', 'libx264',
+            '-preset', self.config.recompress_preset,
+            '-crf', f'{crf:g}',  # The recording's own quality; only the preset changes
+            '-pix_fmt', 'yuv420p',
+            '-c:a', 'copy',
+            '-movflags', '+faststart',
+            tmp_path,
+        ]
+        self._set_status(path, RUNNING, st.st_size)
+        process = subprocess.Popen(background_wrapper(self.config) + cmd,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with self._lock:
+            self._processes[path] = process
+        # Paused or stopped between the checks above and the spawn, after
+        # _kill_running() had already looked
+        if self._paused.is_set() or stop.is_set():
+            process.terminate()
+        returncode = process.wait()
+        with self._lock:
+            self._processes.pop(path, None)
+
+        if self._paused.is_set() or stop.is_set():
+            self._remove(tmp_path)
+            self._set_status(path, QUEUED, st.st_size)  # Retried after resume
+            return
+        if returncode != 0 or not os.path.exists(tmp_path):
+            self._remove(tmp_path)
+            self._set_status(path, FAILED, st.st_size)
+            return
+
+        new_size = os.path.getsize(tmp_path)
+        try:
+            current = os.stat(path)
+        except OSError:
+            current = None
+        if current is None or (current.st_mtime, current.st_size) != (st.st_mtime, st.st_size):
+            # Changed or deleted while we were encoding; leave it alone
+            self._remove(tmp_path)
+            self._set_status(path, FAILED, st.st_size)
+            return
+        if new_size >= st.st_size:
+            self._remove(tmp_path)
+            self._set_status(path, KEPT, st.st_size, new_size)
+            return
+
+        # Keep the original timestamps so the file still sorts where it did
+        os.utime(tmp_path, (st.st_atime, st.st_mtime))
+        os.replace(tmp_path, path)
+        print(f"Recompressed {name}: {st.st_size / 1e6:.1f} MB -> {new_size / 1e6:.1f} MB")
+        self._set_status(path, DONE, st.st_size, new_size)
+        if self.library:
+            self.library.add(path)
+
+    def _set_status(self, path, status, original_size=None, new_size=None):
+        with self._lock:
+            self._state[path] = {"status": status, "original_size": original_size,
+                                 "new_size": new_size}
+            self._save_state()
+        if self.on_update:
+            self.on_update()
+
+    def _kill_running(self):
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+
+    @staticmethod
+    def _load_state():
+        try:
+            with open(STATE_FILE, 'r') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        # Anything interrupted mid-encode is retried
+        for entry in state.values():
+            if entry.get("status") == RUNNING:
+                entry["status"] = QUEUED
+        return state
+
+    def _save_state(self):
+        try:
+            os.makedirs(CONFIG_DIR, exist_ok=True)
+            tmp_path = STATE_FILE + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_path, STATE_FILE)
+        except OSError as e:
+            print(f"Warning: Could not save recompression state: {e}")
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,8 +1,227 @@
 import subprocess
 import signal
 import os
+import json
+import shutil
+import tempfile
+import threading
+import time
 from datetime import datetime
 
+import audio
+from calibrate import choose_encoder_settings
+from config import CONFIG_DIR, QUALITY_PROFILES, VIDEO_FORMATS
+from jobs import JobCancelled, run_ffmpeg
+from library import probe
+from priority import background_wrapper, capture_wrapper
+from progress import PROGRESS_ARGS, iter_progress, parse_stats
+from shmcapture import ShmCapture
+
+# Per-session start latency measurements (one JSON object per line)
+LATENCY_LOG = os.path.join(CONFIG_DIR, "start_latency.jsonl")
+
+# Header written to the standby gate to let an armed ffmpeg continue
+STANDBY_GATE_DATA = b";FFMETADATA1\n"
+
+
+def gif_stream_filter(tag=''):
+    """Streaming GIF graph: a palette per frame, so frames go straight from
+    capture to the GIF muxer without buffering the whole recording.
+
+    Pad labels are prefixed with tag so several copies can share one
+    filtergraph.
+    """
+    return (f'split[{tag}a][{tag}b];[{tag}a]palettegen=stats_mode=single[{tag}p];'
+            f'[{tag}b][{tag}p]paletteuse=new=1:dither=bayer:bayer_scale=5:diff_mode=rectangle')
+
+
+GIF_STREAM_FILTER = gif_stream_filter()
+
+# Two-stage capture intermediate: lossless, intra-only and very cheap to
+# encode, so capture keeps its CPU headroom; transcoded after stop
+INTERMEDIATE_VIDEO_ARGS = ['-c:v', 'utvideo', '-pix_fmt', 'yuv420p']
+INTERMEDIATE_AUDIO_ARGS = ['-c:a', 'pcm_s16le']
+
+# Two-pass quality GIF: one global palette built from the whole clip
+GIF_PALETTE_FILTER = 'palettegen=stats_mode=diff'
+GIF_PALETTEUSE_FILTER = 'paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle'
+
+# Target-size mode: share of the size budget given to the streams, the
+# rest is left for container overhead
+SIZE_BUDGET_SHARE = 0.96
+# Audio bitrates (kbit/s), best first; a tight budget gives audio at most
+# AUDIO_BUDGET_SHARE of the total
+AUDIO_BITRATES = [128, 96, 64, 48, 32]
+AUDIO_BUDGET_SHARE = 0.15
+# GIF (fps, scale) steps tried, in order, while a GIF is over its target
+GIF_SIZE_LADDER = [(15, 1.0), (10, 1.0), (10, 0.75), (8, 0.5), (5, 0.5), (5, 0.33)]
+
+# VP9 and AV1 CRF run 0-63 where x264 runs 0-51; scaling the quality
+# profiles' x264 values keeps them roughly comparable across codecs
+WEBM_CRF_SCALE = 1.36
+
+# Realtime encoder speed by pixel rate (width * height * fps): the first
+# tier whose limit covers the region wins, anything larger gets the fastest.
+# libvpx realtime cpu-used runs 5-8 and SVT-AV1 presets 0-13.
+VP9_SPEED_TIERS = [(1280 * 720 * 30, 5), (1920 * 1080 * 30, 6), (1920 * 1080 * 60, 7)]
+VP9_FASTEST = 8
+AV1_PRESET_TIERS = [(1280 * 720 * 30, 10), (1920 * 1080 * 30, 11), (2560 * 1440 * 30, 12)]
+AV1_FASTEST = 13
+
+
+def realtime_speed(tiers, fastest, w, h, framerate):
+    """Pick an encoder speed from tiers so encoding keeps up with capture."""
+    pixel_rate = w * h * framerate
+    for limit, speed in tiers:
+        if pixel_rate <= limit:
+            return speed
+    return fastest
+
+
+def vp9_tile_columns(w):
+    """log2 of the tile column count; VP9 tiles must be at least 256 px wide."""
+    return min(6, max(0, (w // 256).bit_length() - 1))
+
+
+def audio_args(video_format, kbps=128):
+    """Audio encoding options matching a VIDEO_FORMATS container."""
+    if VIDEO_FORMATS[video_format][0] == "webm":
+        return ['-c:a', 'libopus', '-b:a', f'{kbps}k']
+    return ['-c:a', 'aac', '-b:a', f'{kbps}k']
+
+
+def audio_bitrate_for(total_kbps):
+    """Best audio bitrate that stays a small share of a total bitrate."""
+    for kbps in AUDIO_BITRATES:
+        if kbps <= total_kbps * AUDIO_BUDGET_SHARE:
+            return kbps
+    return AUDIO_BITRATES[-1]
+
+
+def with_bitrate(video_args, kbps):
+    """Swap constant-quality rate control in video_args for an average
+    bitrate with a capped peak, so the size follows from the duration.
+
+    SVT-AV1 gets no peak cap: it reads -maxrate equal to -b:v as CBR,
+    which its default random-access mode rejects.
+    """
+    args = []
+    skip = False
+    for arg in video_args:
+        if skip:
+            skip = False
+            continue
+        if arg in ('-crf', '-b:v', '-lossless'):
+            skip = True
+            continue
+        args.append(arg)
+    kbps = int(kbps)
+    if 'libsvtav1' in args:
+        return args + ['-b:v', f'{kbps}k']
+    return args + ['-b:v', f'{kbps}k', '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k']
+
+
+def gif_convert_commands(video_path, output_path, palette_path, filters=()):
+    """The two ffmpeg passes that turn video_path into a GIF.
+
+    The palette only exists once the whole clip has been seen, so it goes
+    through palette_path: building it in the same graph as paletteuse
+    would hold every decoded frame in memory until the end of the clip.
+    filters (e.g. fps, scale) are applied in both passes.
+    """
+    filters = list(filters)
+    if filters:
+        use_graph = f"[0:v]{','.join(filters)}[v];[v][1:v]{GIF_PALETTEUSE_FILTER}"
+    else:
+        use_graph = GIF_PALETTEUSE_FILTER
+    return [
+        ['ffmpeg', '-y', '-i', video_path,
+         '-vf', ','.join(filters + [GIF_PALETTE_FILTER]), palette_path],
+        ['ffmpeg', '-y', '-i', video_path, '-i', palette_path,
+         '-lavfi', use_graph, output_path],
+    ]
+
+
+def split_graph(common_filters, branches):
+    """A -filter_complex graph that runs common_filters once on the capture
+    and splits the result into one chain per output, labelled out0, out1...
+    """
+    labels = ''.join(f'[s{i}]' for i in range(len(branches)))
+    chains = [f"[0:v]{','.join(common_filters + [f'split={len(branches)}'])}{labels}"]
+    for i, filters in enumerate(branches):
+        chains.append(f"[s{i}]{','.join(filters) or 'null'}[out{i}]")
+    return ';'.join(chains)
+
+
+def inset_region(x, y, w, h):
+    """Shrink a selection so the border's anti-aliasing is never captured."""
+    # Note: dimensions should already be even (snapped during selection)
+    x += 1
+    y += 1
+    w -= 2
+    h -= 2
+
+    # Ensure dimensions stay even after inset
+    w = max(w - (w % 2), 2)
+    h = max(h - (h % 2), 2)
+    return x, y, w, h
+
+
+def x11grab_input(x, y, w, h, framerate, single_probe=False):
+    """ffmpeg arguments for capturing a screen region with x11grab."""
+    args = [
+        '-f', 'x11grab',
+        '-thread_queue_size', '1024',  # Larger buffer to prevent frame drops
+    ]
+    if single_probe:
+        args.extend(['-probesize', '32', '-analyzeduration', '0'])
+    else:
+        args.extend(['-probesize', '10M'])
+    args.extend([
+        '-framerate', str(framerate),
+        '-draw_mouse', '1',
+        '-video_size', f'{w}x{h}',
+        '-i', f"{os.environ.get('DISPLAY', ':0')}+{x},{y}",
+    ])
+    return args
+
+
+def rawvideo_pipe_input(w, h, framerate, pix_fmt):
+    """ffmpeg arguments for raw frames written to stdin by ShmCapture."""
+    return [
+        '-f', 'rawvideo',
+        '-pix_fmt', pix_fmt,
+        '-video_size', f'{w}x{h}',
+        '-framerate', str(framerate),
+        # Timestamp frames on arrival so frames dropped upstream keep A/V sync
+        '-use_wallclock_as_timestamps', '1',
+        '-thread_queue_size', '64',
+        '-i', 'pipe:0',
+    ]
+
+
+def pulse_input(audio_source):
+    """ffmpeg arguments for capturing a PulseAudio/PipeWire source."""
+    return [
+        '-f', 'pulse',
+        '-thread_queue_size', '512',
+        '-i', audio_source,
+    ]
+
+
+def fragmented_mp4_args(framerate):
+    """Muxer options for an MP4 that is playable up to its last fragment.
+
+    The moov atom is written up front and media follows in ~1 s fragments,
+    so a killed ffmpeg still leaves a valid file, and browsers can play it
+    progressively without a faststart rewrite.
+    """
+    return [
+        '-g', str(framerate * 2),  # Keyframe every 2 s for seeking
+        '-movflags', '+frag_keyframe+empty_moov+default_base_moof',
+        '-frag_duration', '1000000',
+    ]
+
 
 class Recorder:
     def __init__(self, config):
@@ -12,70 +231,221 @@ class Recorder:
         self._temp_video = None  # For GIF conversion
         self._is_gif = False
 
+        # Warm standby state (see arm())
+        self._standby_key = None  # (x, y, w, h, gif_mode) the armed process captures
+        self._standby_dir = None  # Temp dir holding the gate FIFO
+        self.start_latency = None  # Seconds from start() until ffmpeg was ready to write
+        self._started_at = None
+        self.output_playable = False  # True if output_path is valid without finalizing
+        self._stats = None  # Latest parsed ffmpeg progress block
+        self._transcode_args = []  # Final encoder args for the two-stage transcode
+        self._shm = None  # ShmCapture feeding ffmpeg when capture_backend is "shm"
+        self._audio_input = False  # True if the capture process also records audio
+        self.extra_output_paths = []  # Files written alongside output_path (see extra_outputs)
+        self._target = None  # Size-budget encode settings when target_size_mb is set
+        self._audio_resolve_seconds = None  # Time spent looking up the audio source
+        self.name = None  # Output file name without extension; timestamped when None
+        self.max_threads = None  # Encoder thread cap (see group.py); None uses every core
+        self.latency_log = LATENCY_LOG  # Where start latencies are appended; None to skip
+        self._capture_stats = {}  # Final progress block of the current process
+        self._progress_reader = None
+
+    def arm(self, x, y, w, h, gif_mode=False):
+        """Pre-start ffmpeg for a region so start() only has to open a gate.
+
+        ffmpeg opens its inputs in order before opening the output, so the
+        x11grab input is connected and probed up front and the process then
+        blocks opening a FIFO input. start() unblocks it by writing to the
+        FIFO; the audio input is opened only after that, so it holds no
+        stale samples.
+        """
+        self.disarm()
+        if self.config.capture_backend == "shm":
+            # Frames come from Python, so there is no x11grab probe to get ahead of
+            print("Standby is not used with SHM capture")
+            return
+        self._standby_dir = tempfile.mkdtemp(prefix="quick-webm-recorder-")
+        gate = os.path.join(self._standby_dir, "gate")
+        os.mkfifo(gate)
+        self._spawn(x, y, w, h, gif_mode, gate=gate)
+        self._standby_key = (x, y, w, h, gif_mode)
+        print(f"Standby armed: {w}x{h}")
+
+    def disarm(self):
+        """Kill an armed (not yet started) standby process."""
+        if self._standby_key is not None and self.process:
+            # Blocked opening the gate, so there is no output to finalize
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        self._standby_key = None
+        if self._standby_dir:
+            shutil.rmtree(self._standby_dir, ignore_errors=True)
+            self._standby_dir = None
+
+    def is_armed(self):
+        return self._standby_key is not None
+
     def start(self, x, y, w, h, gif_mode=False):
+        requested = time.monotonic()
+        standby = (self._standby_key == (x, y, w, h, gif_mode)
+                   and self._release_standby())
+        if not standby:
+            self.disarm()
+            self._spawn(x, y, w, h, gif_mode)
+        self._standby_key = None
+        self._started_at = time.monotonic()
+        self._watch_start_latency(requested, standby)
+
+    def _release_standby(self):
+        """Open the gate of the armed process. Returns False if it isn't ready."""
+        gate = os.path.join(self._standby_dir, "gate")
+        deadline = time.monotonic() + 2
+        while self.process.poll() is None and time.monotonic() < deadline:
+            try:
+                # Non-blocking open fails with ENXIO until ffmpeg is waiting on the gate
+                fd = os.open(gate, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError:
+                time.sleep(0.005)
+                continue
+            try:
+                os.write(fd, STANDBY_GATE_DATA)
+            finally:
+                os.close(fd)
+            return True
+        print("Standby process not ready, starting cold")
+        return False
+
+    def _spawn(self, x, y, w, h, gif_mode, gate=None):
         self._is_gif = gif_mode
         output_dir = self.config.output_dir
         os.makedirs(output_dir, exist_ok=True)
 
+        filename = self.name or datetime.now().strftime("recording_%Y%m%d_%H%M%S")
+        video_format = self.config.video_format
+        # The size budget can only be met once the duration is known, so
+        # target-size recordings always go through a temp file
+        target_bytes = int(self.config.target_size_mb * 1e6)
         if gif_mode:
-            # For GIF, we record to a temp MP4 then convert
-            filename = datetime.now().strftime("recording_%Y%m%d_%H%M%S")
-            self._temp_video = os.path.join(output_dir, f"{filename}_temp.mp4")
             self.output_path = os.path.join(output_dir, f"{filename}.gif")
+            if self.config.gif_streaming and not target_bytes:
+                # Encode the GIF directly from capture
+                self._temp_video = None
+            else:
+                # Record to a temp MP4 then convert with a global palette
+                self._temp_video = os.path.join(output_dir, f"{filename}_temp.mp4")
             framerate = self.config.gif_framerate
         else:
-            filename = datetime.now().strftime("recording_%Y%m%d_%H%M%S.mp4")
-            self.output_path = os.path.join(output_dir, filename)
-            self._temp_video = None
+            extension = VIDEO_FORMATS[video_format][0]
+            self.output_path = os.path.join(output_dir, f"{filename}.{extension}")
+            if self.config.two_stage_capture or target_bytes:
+                # Capture to a cheap intermediate, encode the MP4 after stop
+                self._temp_video = os.path.join(output_dir, f"{filename}_capture.mkv")
+            else:
+                self._temp_video = None
             framerate = self.config.framerate
 
-        quality = self.config.video_quality
-
-        # Note: dimensions should already be even (snapped during selection)
-        # Small inset to ensure border anti-aliasing is never captured
-        x += 1
-        y += 1
-        w -= 2
-        h -= 2
+        x, y, w, h = inset_region(x, y, w, h)
 
-        # Ensure dimensions stay even after inset
-        w = max(w - (w % 2), 2)
-        h = max(h - (h % 2), 2)
+        self._shm = None
+        if self.config.capture_backend == "shm" and not gate:
+            try:
+                self._shm = ShmCapture(x, y, w, h, framerate)
+            except (OSError, RuntimeError) as e:
+                print(f"SHM capture unavailable ({e}), using x11grab")
 
         # Build ffmpeg command - using H.264 for speed and compatibility
-        cmd = [
-            'ffmpeg', '-y',
-            # Video input with x11grab
-            '-f', 'x11grab',
-            '-thread_queue_size', '1024',  # Larger buffer to prevent frame drops
-            '-probesize', '10M',
-            '-framerate', str(framerate),
-            '-draw_mouse', '1',
-            '-video_size', f'{w}x{h}',
-            '-i', f':0.0+{x},{y}',
-        ]
+        cmd = ['ffmpeg', '-y'] + PROGRESS_ARGS
+        if self._shm:
+            cmd.extend(rawvideo_pipe_input(w, h, framerate, ShmCapture.PIX_FMT))
+        else:
+            # Probe a single frame when gated; it is stale by the time the gate opens
+            cmd.extend(x11grab_input(x, y, w, h, framerate, single_probe=bool(gate)))
+
+        if gate:
+            # ffmpeg blocks here until start() writes to the FIFO
+            cmd.extend(['-f', 'ffmetadata', '-i', gate])
 
-        # Add audio capture if configured
-        audio_source = self.config.get_resolved_audio_source()
+        # Add audio capture if configured (GIFs have no audio track)
+        resolve_started = time.perf_counter()
+        audio_source = None if gif_mode else self.config.get_resolved_audio_source()
+        self._audio_resolve_seconds = time.perf_counter() - resolve_started
+        self._audio_input = bool(audio_source)
         if audio_source:
-            cmd.extend([
-                '-f', 'pulse',
-                '-thread_queue_size', '512',
-                '-i', audio_source,
-            ])
-
-        # Video encoding options
-        cmd.extend([
-            '-c:v', 'libx264',
-            '-preset', 'ultrafast',
-            '-crf', str(quality),
-            '-pix_fmt', 'yuv420p',
-            '-vsync', 'cfr',  # Constant frame rate to prevent timing glitches
-        ])
+            cmd.extend(pulse_input(audio_source))
+
+        video_filters = []
+        audio_map = []
+        if audio_source:
+            # The gate FIFO takes the input slot between video and audio
+            audio_map = ['-map', f'{2 if gate else 1}:a']
+        if gate:
+            # Drop the probed frame and restart both streams at zero
+            video_filters.append('select=gte(n\\,1),setpts=PTS-STARTPTS')
+            if audio_source:
+                audio_map.extend(['-af', 'asetpts=PTS-STARTPTS'])
+
+        if self.config.screencast_mode:
+            # Drop near-identical frames, keeping at least one per second,
+            # and write variable frame rate so the remaining frames keep
+            # their capture timestamps (and stay in sync with audio)
+            video_filters.append(f'mpdecimate=max={framerate}')
+            vsync = 'vfr'
+        else:
+            vsync = 'cfr'  # Constant frame rate to prevent timing glitches
+
+        # Final encoder settings, used either live or by the transcode after stop
+        # (a non-streaming GIF's temp recording is always an MP4)
+        if gif_mode:
+            video_format = "mp4"
+        self._transcode_args = self._video_args(video_format, w, h, framerate, vsync)
+        if audio_source:
+            self._transcode_args.extend(audio_args(video_format))
+        self._target = None
+        if target_bytes:
+            self._target = {
+                "bytes": target_bytes,
+                "format": video_format,
+                "video_args": self._video_args(video_format, w, h, framerate, vsync),
+                "audio": bool(audio_source),
+            }
 
-        # Audio encoding if we have audio (not for GIF)
-        if audio_source and not gif_mode:
-            cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
+        output_filters = []
+        if gif_mode and not self._temp_video:
+            output_filters.append(GIF_STREAM_FILTER)
+            output_args = ['-vsync', vsync]
+        elif self._temp_video and not gif_mode:
+            output_args = INTERMEDIATE_VIDEO_ARGS + ['-vsync', vsync]
+            if audio_source:
+                output_args = output_args + INTERMEDIATE_AUDIO_ARGS
+        else:
+            output_args = self._transcode_args
+
+        extras = self._extra_outputs(os.path.join(output_dir, filename), w, h, framerate,
+                                     vsync, audio_source)
+        self.extra_output_paths = [path for _, _, path in extras]
+        if extras:
+            # One capture and one pass through the shared filters feed every
+            # encoder; each output then gets its own fps/scale chain
+            branches = [output_filters] + [filters for filters, _, _ in extras]
+            cmd.extend(['-filter_complex', split_graph(video_filters, branches)])
+            cmd.extend(['-map', '[out0]'] + audio_map + output_args)
+            cmd.append(self._temp_video or self.output_path)
+            for i, (_, args, path) in enumerate(extras, start=1):
+                with_audio = '-c:a' in args
+                cmd.extend(['-map', f'[out{i}]'] + (audio_map if with_audio else []) + args)
+                cmd.append(path)
+        else:
+            if gate:
+                cmd.extend(['-map', '0:v'] + audio_map)
+            video_filters.extend(output_filters)
+            if video_filters:
+                cmd.extend(['-vf', ','.join(video_filters)])
+            cmd.extend(output_args)
+            # Output to temp file for two-pass GIF, or the final file
+            cmd.append(self._temp_video or self.output_path)
+
+        if audio_source:
             print(f"Recording with audio from: {audio_source}")
         else:
             if gif_mode:
@@ -83,63 +453,455 @@ class Recorder:
             else:
                 print("Recording video only (no audio)")
 
-        # Output to temp file for GIF, or final file for MP4
-        cmd.append(self._temp_video if gif_mode else self.output_path)
+        # A fragmented MP4 is complete the moment ffmpeg stops writing
+        self.output_playable = (not gif_mode and not self._temp_video and
+                                video_format == "mp4" and self.config.fragmented_output)
+
         self.process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+            capture_wrapper(self.config) + cmd,
+            stdin=subprocess.PIPE if self._shm else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
         )
+        if self._shm:
+            self._shm.start(self.process.stdin.fileno())
+        self._stats = None
+        self._capture_stats = {}
+        self._progress_reader = threading.Thread(
+            target=self._read_progress, args=(self.process, self._capture_stats), daemon=True)
+        self._progress_reader.start()
+
+    def _extra_outputs(self, base_path, w, h, framerate, vsync, audio_source):
+        """(filters, output args, path) for each entry in config.extra_outputs.
+
+        Entries are dicts with "format" ("gif", "webm" or a VIDEO_FORMATS
+        key) and optional "suffix", "framerate", "scale", "quality" and
+        "audio" keys.
+        """
+        outputs = []
+        for i, extra in enumerate(self.config.extra_outputs, start=1):
+            fmt = extra.get("format", "mp4")
+            if fmt == "webm":
+                fmt = "webm-vp9"
+            if fmt != "gif" and fmt not in VIDEO_FORMATS:
+                print(f"Skipping extra output with unknown format: {fmt}")
+                continue
+            extension = "gif" if fmt == "gif" else VIDEO_FORMATS[fmt][0]
+            suffix = extra.get("suffix") or f"{extension}{i}"
+            scale = float(extra.get("scale", 1.0))
+            out_w = max(int(w * scale) // 2 * 2, 2)
+            out_h = max(int(h * scale) // 2 * 2, 2)
+            out_fps = int(extra.get("framerate") or framerate)
+
+            filters = []
+            if out_fps < framerate:
+                filters.append(f'fps={out_fps}')
+            if (out_w, out_h) != (w, h):
+                filters.append(f'scale={out_w}:{out_h}')
+            if fmt == "gif":
+                filters.append(gif_stream_filter(f'x{i}'))
+                args = ['-vsync', vsync]
+            else:
+                quality = extra.get("quality", self.config.quality_profile)
+                crf = QUALITY_PROFILES.get(quality, (self.config.video_quality,))[0]
+                args = self._video_args(fmt, out_w, out_h, min(out_fps, framerate), vsync, crf)
+                if audio_source and extra.get("audio", True):
+                    args.extend(audio_args(fmt))
+            outputs.append((filters, args, f"{base_path}_{suffix}.{extension}"))
+        return outputs
+
+    def _video_args(self, video_format, w, h, framerate, vsync, crf=None):
+        """Video encoding options for a VIDEO_FORMATS key.
+
+        crf is on x264's scale (see QUALITY_PROFILES) for every format.
+        """
+        if crf is None:
+            crf = self.config.video_quality
+        if video_format == "webm-vp9":
+            return self._vp9_args(w, h, framerate, vsync, crf)
+        if video_format == "webm-av1":
+            return self._av1_args(w, h, framerate, vsync, crf)
+        return self._x264_args(w, h, framerate, vsync, crf)
+
+    def _vp9_args(self, w, h, framerate, vsync, crf):
+        """VP9 in realtime mode, spread over cores with tiles and row-mt."""
+        tile_columns = vp9_tile_columns(w)
+        args = [
+            '-c:v', 'libvpx-vp9',
+            '-deadline', 'realtime',
+            '-cpu-used', str(realtime_speed(VP9_SPEED_TIERS, VP9_FASTEST, w, h, framerate)),
+            # Tile columns encode in parallel, row-mt adds threads within a tile
+            '-tile-columns', str(tile_columns),
+            '-row-mt', '1',
+            '-frame-parallel', '0',
+            '-threads', str(min(self.max_threads or os.cpu_count() or 1, 16)),
+        ]
+        if crf == 0:
+            args.extend(['-lossless', '1'])
+        else:
+            args.extend(['-crf', str(min(63, round(crf * WEBM_CRF_SCALE))), '-b:v', '0'])
+        args.extend([
+            '-g', str(framerate * 2),
+            '-pix_fmt', 'yuv420p',
+            '-vsync', vsync,
+        ])
+        return args
+
+    def _av1_args(self, w, h, framerate, vsync, crf):
+        """AV1 through SVT-AV1 at a preset fast enough for the region."""
+        args = [
+            '-c:v', 'libsvtav1',
+            '-preset', str(realtime_speed(AV1_PRESET_TIERS, AV1_FASTEST, w, h, framerate)),
+            # SVT-AV1's CRF starts at 1; lossless maps to its best quality
+            '-crf', str(max(1, min(63, round(crf * WEBM_CRF_SCALE)))),
+            '-g', str(framerate * 2),
+            '-pix_fmt', 'yuv420p',
+            '-vsync', vsync,
+        ]
+        if self.max_threads:
+            args.extend(['-svtav1-params', f'lp={self.max_threads}'])
+        return args
+
+    def _x264_args(self, w, h, framerate, vsync, crf=None):
+        """H.264 video encoding options, tuned to this machine if calibrated."""
+        preset, threads = choose_encoder_settings(w, h, framerate, self.max_threads)
+        if crf is None:
+            crf = self.config.video_quality
+        args = [
+            '-c:v', 'libx264',
+            '-preset', preset,
+            '-threads', str(threads),
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p',
+            '-vsync', vsync,
+        ]
+        if self.config.fragmented_output:
+            args.extend(fragmented_mp4_args(framerate))
+        return args
+
+    def _read_progress(self, process, capture_stats):
+        """Keep the latest stats from ffmpeg's progress stream.
+
+        Also drains the pipe so ffmpeg never blocks writing to it. The last
+        block, written as ffmpeg exits, is kept in capture_stats["stats"].
+        """
+        for block in iter_progress(process.stdout):
+            stats = parse_stats(block)
+            capture_stats["stats"] = stats
+            if process is self.process:
+                self._stats = stats
+
+    def get_stats(self):
+        """Latest capture stats (see progress.parse_stats), or None.
+
+        Updated about twice a second while recording: fps, speed, dup/drop
+        counts, bitrate and output size.
+        """
+        if not self.is_recording() or self._stats is None:
+            return None
+        stats = self._stats
+        if self._shm:
+            # Frames the SHM capture skipped never reached ffmpeg
+            stats = dict(stats, drop_frames=stats["drop_frames"] + self._shm.dropped)
+        return stats
+
+    def _watch_start_latency(self, requested, standby):
+        """Measure how long ffmpeg takes to open its output after start().
+
+        ffmpeg creates the output file right after all inputs are open, so
+        its appearance marks the point where captured frames start flowing.
+        """
+        self.start_latency = None
+        process = self.process
+        target = self._temp_video or self.output_path
+
+        def watch():
+            while process.poll() is None and time.monotonic() - requested < 10:
+                if os.path.exists(target):
+                    latency = time.monotonic() - requested
+                    if process is self.process:
+                        self.start_latency = latency
+                    self._log_start_latency(latency, standby)
+                    return
+                time.sleep(0.002)
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def poll_started(self):
+        """Whether ffmpeg has opened its output after start(), without blocking.
+
+        True once it has, False if it exited first (e.g. the region is off
+        screen), None while it is still starting up.
+        """
+        process = self.process
+        if process is None or process.poll() is not None:
+            return False
+        return True if self.start_latency is not None else None
+
+    def _log_start_latency(self, latency, standby):
+        mode = "standby" if standby else "cold"
+        print(f"Start latency ({mode}): {latency * 1000:.0f} ms")
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "standby": standby,
+            "latency_ms": round(latency * 1000, 1),
+        }
+        if self._audio_resolve_seconds is not None:
+            entry["audio_resolve_ms"] = round(self._audio_resolve_seconds * 1000, 3)
+        if audio.registry.refresh_seconds is not None:
+            # What the lookup costs when it has to ask pactl: the time saved
+            entry["audio_lookup_ms"] = round(audio.registry.refresh_seconds * 1000, 1)
+        if not self.latency_log:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.latency_log), exist_ok=True)
+            with open(self.latency_log, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        except IOError as e:
+            print(f"Warning: Could not write latency log: {e}")
 
     def stop(self):
-        if self.process:
-            self.process.send_signal(signal.SIGINT)
+        """Stop recording and block until the output file is complete."""
+        finalize = self.stop_async()
+        return finalize() if finalize else None
+
+    def stop_async(self, stats=None):
+        """Signal ffmpeg to stop and return a finalize(job=None) callable.
+
+        The recorder is free for a new start() as soon as this returns.
+        finalize waits for ffmpeg, runs any GIF conversion or two-stage
+        transcode and returns the output path; it is meant to run as a
+        background job, and cancelling the job keeps the intermediate file.
+        If stats is a dict, finalize fills it with the capture's final
+        stats (as get_stats()) once ffmpeg has exited.
+        """
+        if self._standby_key is not None:
+            # Armed but never started - nothing was recorded
+            self.disarm()
+            return None
+        if self.process is None:
+            return None  # Never started, or already stopped
+
+        process = self.process
+        output_path = self.output_path
+        temp_video = self._temp_video
+        is_gif = self._is_gif
+        transcode_args = self._transcode_args
+        target = self._target
+        duration = time.monotonic() - self._started_at
+        shm = self._shm
+        audio_input = self._audio_input
+        extra_output_paths = self.extra_output_paths
+        capture_stats = self._capture_stats
+        progress_reader = self._progress_reader
+        self.process = None
+        self._shm = None
+
+        end_input = None
+        if shm:
+            shm.request_stop()
+
+            def end_shm_input():
+                # ffmpeg ends a pipe input only at EOF; a signal would leave
+                # its reader blocked in read() until the kill timeout
+                shm.stop()
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+                if audio_input:
+                    # The PulseAudio input only ends on a signal
+                    process.send_signal(signal.SIGINT)
+
+            # Flushing the queued frames can take a few frame times
+            end_input = threading.Thread(target=end_shm_input, daemon=True)
+            end_input.start()
+        else:
+            process.send_signal(signal.SIGINT)
+
+        def finalize(job=None):
+            if end_input:
+                end_input.join()
             try:
-                self.process.wait(timeout=5)
+                process.wait(timeout=5)
             except subprocess.TimeoutExpired:
-                self.process.kill()
-            self.process = None
+                if shm and not audio_input:
+                    # EOF wasn't enough; fall back to the signal
+                    process.send_signal(signal.SIGINT)
+                    try:
+                        process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        pass
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            if stats is not None:
+                # The final block is written just before ffmpeg exits
+                progress_reader.join(timeout=1)
+                stats.update(capture_stats.get("stats") or {})
+                if shm and stats:
+                    stats["drop_frames"] += shm.dropped
+
+            for path in extra_output_paths:
+                if os.path.exists(path):
+                    print(f"Saved: {path}")
 
-        # Convert to GIF if needed
-        if self._is_gif and self._temp_video and os.path.exists(self._temp_video):
-            self._convert_to_gif()
+            if not temp_video or not os.path.exists(temp_video):
+                return output_path
+            if target and is_gif:
+                return self._gif_to_size(temp_video, output_path, target, duration, job)
+            if target:
+                return self._encode_to_size(temp_video, output_path, target, duration, job)
+            if is_gif:
+                return self._convert_to_gif(temp_video, output_path, duration, job)
+            print("Transcoding recording...")
+            cmd = ['ffmpeg', '-y', '-i', temp_video] + transcode_args + [output_path]
+            return self._postprocess(cmd, temp_video, output_path, duration, job)
 
-        return self.output_path
+        return finalize
 
-    def _convert_to_gif(self):
+    def _convert_to_gif(self, temp_video, output_path, duration, job=None):
         """Convert temp video to GIF using ffmpeg with palette for quality."""
         print("Converting to GIF...")
+        palette_path = temp_video + ".palette.png"
+        try:
+            commands = gif_convert_commands(temp_video, output_path, palette_path)
+            return self._postprocess(iter(commands), temp_video, output_path, duration, job)
+        finally:
+            self._remove(palette_path)
 
-        # Generate palette for better GIF quality
-        palette_path = self._temp_video + ".palette.png"
+    def _encode_to_size(self, temp_video, output_path, target, duration, job=None):
+        """Encode temp_video at the bitrate that fits target["bytes"].
 
-        # Pass 1: Generate palette
-        palette_cmd = [
-            'ffmpeg', '-y',
-            '-i', self._temp_video,
-            '-vf', 'palettegen=stats_mode=diff',
-            palette_path
-        ]
-        subprocess.run(palette_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        # Pass 2: Create GIF with palette
-        gif_cmd = [
-            'ffmpeg', '-y',
-            '-i', self._temp_video,
-            '-i', palette_path,
-            '-lavfi', 'paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle',
-            self.output_path
-        ]
-        subprocess.run(gif_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        The bitrate comes from the recording's real duration. If the
+        encoder overshoots, it runs once more at a proportionally lower
+        bitrate.
+        """
+        duration = probe(temp_video)[0] or duration
+        total_kbps = target["bytes"] * 8 * SIZE_BUDGET_SHARE / duration / 1000
+        audio_kbps = audio_bitrate_for(total_kbps) if target["audio"] else 0
+        state = {"video_kbps": max(total_kbps - audio_kbps, 16)}
+        print(f"Encoding to fit {target['bytes'] / 1e6:.1f} MB: video "
+              f"{state['video_kbps']:.0f} kbit/s, audio {audio_kbps} kbit/s")
+
+        def attempts():
+            for attempt in range(2):
+                args = with_bitrate(target["video_args"], state["video_kbps"])
+                if audio_kbps:
+                    args.extend(audio_args(target["format"], audio_kbps))
+                yield ['ffmpeg', '-y', '-i', temp_video] + args + [output_path]
+                size = os.path.getsize(output_path)
+                if size <= target["bytes"]:
+                    return
+                if attempt == 1:
+                    print(f"Output is {size / 1e6:.1f} MB, over target after two passes")
+                    return
+                state["video_kbps"] *= target["bytes"] / size * SIZE_BUDGET_SHARE
+                print(f"Output {size / 1e6:.1f} MB is over target, "
+                      f"retrying at {state['video_kbps']:.0f} kbit/s")
 
-        # Clean up temp files
+        return self._size_fit_result(
+            self._postprocess(attempts(), temp_video, output_path, duration, job), output_path,
+            target["bytes"])
+
+    def _gif_to_size(self, temp_video, output_path, target, duration, job=None):
+        """Convert temp_video to a GIF, lowering fps and scale until it fits."""
+        budget = target["bytes"]
+        framerate = self.config.gif_framerate
+        palette_path = temp_video + ".palette.png"
+
+        def attempts():
+            fps, scale = framerate, 1.0
+            for attempt in range(3):
+                filters = [f'fps={fps}']
+                if scale < 1.0:
+                    filters.append(f'scale=iw*{scale}:-1:flags=lanczos')
+                yield from gif_convert_commands(temp_video, output_path, palette_path, filters)
+                size = os.path.getsize(output_path)
+                if size <= budget:
+                    return
+                if attempt == 2:
+                    print(f"GIF is {size / 1e6:.1f} MB, over target after three passes")
+                    return
+                # GIF size scales roughly with frame count and pixel area
+                smaller = [(f, s) for f, s in GIF_SIZE_LADDER
+                           if f <= framerate and f * s * s < fps * scale * scale]
+                if not smaller:
+                    print(f"GIF is {size / 1e6:.1f} MB, can't shrink further")
+                    return
+                predicted = {rung: size * (rung[0] / fps) * (rung[1] / scale) ** 2
+                             for rung in smaller}
+                fps, scale = next((rung for rung in smaller if predicted[rung] <= budget),
+                                  smaller[-1])
+                print(f"GIF is {size / 1e6:.1f} MB, retrying at {fps} fps, {scale:.0%} scale")
+
+        print("Converting to GIF...")
         try:
-            os.remove(self._temp_video)
-            os.remove(palette_path)
+            return self._size_fit_result(
+                self._postprocess(attempts(), temp_video, output_path, duration, job),
+                output_path, budget)
+        finally:
+            self._remove(palette_path)
+
+    @staticmethod
+    def _size_fit_result(result, output_path, budget):
+        """A failed size fit has no output: the kept intermediate is no
+        substitute for a file that had to fit a budget.
+
+        An output still over budget after the last pass is a failed fit
+        too. It is left on disk, as it is the only copy of the recording,
+        but isn't handed on as if it fit.
+        """
+        if result != output_path:
+            print(f"Could not fit the target size, nothing saved as {output_path}")
+            return None
+        try:
+            size = os.path.getsize(output_path)
         except OSError:
-            pass
+            return None
+        if size > budget:
+            print(f"Could not fit the target size: {output_path} is {size / 1e6:.1f} MB, "
+                  f"over the {budget / 1e6:.1f} MB limit")
+            return None
+        return result
 
-        print(f"GIF saved: {self.output_path}")
+    def _postprocess(self, cmd, temp_video, output_path, duration, job=None):
+        """Run a conversion of temp_video into output_path.
+
+        The temp file is removed only on success. If the conversion fails or
+        is cancelled, the partial output is deleted and the temp file is kept
+        (and returned on failure) so the recording is never lost.
+
+        cmd may also be an iterator of commands, each run after the
+        previous one succeeded; target-size encodes use this to retry.
+        """
+        commands = [cmd] if isinstance(cmd, list) else cmd
+        try:
+            for command in commands:
+                returncode = run_ffmpeg(command, job, duration, background_wrapper(self.config))
+                if returncode != 0:
+                    break
+        except JobCancelled:
+            self._remove(output_path)
+            print(f"Conversion cancelled, recording kept: {temp_video}")
+            raise
+        if returncode != 0:
+            self._remove(output_path)
+            print(f"Conversion failed, recording kept: {temp_video}")
+            return temp_video
+
+        # Clean up temp file
+        self._remove(temp_video)
+        print(f"Saved: {output_path}")
+        return output_path
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
     def is_recording(self):
-        return self.process is not None
+        return self.process is not None and self._standby_key is None
@@ -0,0 +1,231 @@
+import glob
+import math
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from priority import capture_wrapper
+from recorder import x11grab_input, pulse_input
+
+
+class ReplayBuffer:
+    """Continuously records a region into a fixed ring of short segments.
+
+    ffmpeg's HLS muxer deletes each segment once it falls out of the
+    playlist, so disk (or RAM, when the runtime dir is a tmpfs) usage stays
+    constant however long the buffer runs. Segments are deleted rather than
+    overwritten, so snapshot() can pin the newest ones with hard links, and
+    save() stream-copies a snapshot into a regular MP4 without re-encoding.
+    """
+
+    SEGMENT_SECONDS = 2
+
+    def __init__(self, config):
+        self.config = config
+        self.process = None
+        self._segment_dir = None
+        self._has_audio = False
+        self.seconds = None  # Buffer length the running process was started with
+        self._started_with = None  # _settings() the running process was started with
+
+    def _settings(self, region):
+        """Everything the running process depends on."""
+        config = self.config
+        return (tuple(region), config.replay_seconds, config.framerate, config.video_quality,
+                config.audio_source)
+
+    def is_current(self, x, y, w, h):
+        """True if running on this region with the current settings."""
+        return self.is_running() and self._started_with == self._settings((x, y, w, h))
+
+    def start(self, x, y, w, h):
+        self.stop()
+        self._started_with = self._settings((x, y, w, h))
+        seconds = self.seconds = self.config.replay_seconds
+
+        # Prefer the per-user runtime dir, which is usually RAM-backed
+        base_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        self._segment_dir = tempfile.mkdtemp(prefix="quick-webm-replay-", dir=base_dir)
+
+        # x11grab needs even dimensions for yuv420p
+        w -= w % 2
+        h -= h % 2
+
+        cmd = ['ffmpeg', '-y']
+        cmd.extend(x11grab_input(x, y, w, h, self.config.framerate))
+
+        audio_source = self.config.get_resolved_audio_source()
+        self._has_audio = bool(audio_source)
+        if audio_source:
+            cmd.extend(pulse_input(audio_source))
+
+        cmd.extend([
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-crf', str(self.config.video_quality),
+            '-pix_fmt', 'yuv420p',
+            '-vsync', 'cfr',
+            # A keyframe at every segment boundary so segments cut cleanly
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.SEGMENT_SECONDS})',
+        ])
+        if audio_source:
+            cmd.extend(['-c:a', 'aac', '-b:a', '128k'])
+
+        cmd.extend([
+            '-f', 'hls',
+            '-hls_time', str(self.SEGMENT_SECONDS),
+            # Enough segments to cover the window; older ones are deleted
+            '-hls_list_size', str(self._segment_count()),
+            '-hls_flags', 'delete_segments',
+            # MPEG-TS stays readable while being written and concatenates cleanly
+            '-hls_segment_type', 'mpegts',
+            '-hls_segment_filename', os.path.join(self._segment_dir, 'segment%06d.ts'),
+            os.path.join(self._segment_dir, 'replay.m3u8'),
+        ])
+        self.process = subprocess.Popen(
+            capture_wrapper(self.config) + cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        print(f"Replay buffer started: {w}x{h}, last {seconds}s")
+
+    def _segment_count(self):
+        """Segments that cover the window, counting the one being written."""
+        return math.ceil(self.seconds / self.SEGMENT_SECONDS) + 1
+
+    def _newest_segments(self, now):
+        """The fewest newest segments that hold at least `seconds`.
+
+        The segment being written has been growing since the one before it
+        was closed; every other segment is SEGMENT_SECONDS long. Saves are
+        stream copies, which can only start on a keyframe, so the window is
+        rounded up to a segment boundary and may run up to SEGMENT_SECONDS
+        longer than asked.
+        """
+        segments = []
+        for path in glob.glob(os.path.join(self._segment_dir, 'segment*.ts')):
+            try:
+                segments.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                pass  # Deleted by the muxer since the listing
+        segments.sort()
+        if len(segments) < 2:
+            return [path for _, path in segments]
+        covered = max(0.0, now - segments[-2][0])  # The segment being written
+        count = 1
+        while covered < self.seconds and count < len(segments):
+            covered += self.SEGMENT_SECONDS
+            count += 1
+        return [path for _, path in segments[-count:]]
+
+    def snapshot(self):
+        """Pin the last `seconds` of the buffer for save().
+
+        Cheap enough to call from the hotkey handler, so a save waiting in
+        the job queue still gets the moment the hotkey was pressed: the
+        newest segments are hard-linked into a directory of their own, and
+        the size of the segment still being written marks the cutoff.
+        Returns None if there is nothing to save.
+        """
+        if not self.is_running():
+            return None
+        segments = self._newest_segments(time.time())
+        if not segments:
+            return None
+
+        snapshot_dir = tempfile.mkdtemp(prefix="quick-webm-replay-save-",
+                                        dir=os.path.dirname(self._segment_dir))
+        pinned = []
+        for segment in segments:
+            path = os.path.join(snapshot_dir, os.path.basename(segment))
+            try:
+                os.link(segment, path)
+            except FileNotFoundError:
+                continue  # Deleted by the muxer since the listing
+            except OSError:
+                shutil.copyfile(segment, path)
+            pinned.append(path)
+        if not pinned:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            return None
+        return {
+            "dir": snapshot_dir,
+            "segments": pinned,
+            # The newest segment keeps growing through the link
+            "last_size": os.path.getsize(pinned[-1]),
+            "time": datetime.now(),
+            "audio": self._has_audio,
+        }
+
+    def save(self, snapshot):
+        """Write a snapshot() to a new file and release it."""
+        try:
+            return self._save(snapshot)
+        finally:
+            self.discard(snapshot)
+
+    @staticmethod
+    def discard(snapshot):
+        """Release a snapshot that won't be saved."""
+        shutil.rmtree(snapshot["dir"], ignore_errors=True)
+
+    def _save(self, snapshot):
+        segments = list(snapshot["segments"])
+        # Cut the segment that was still being written where it stood;
+        # MPEG-TS is readable up to the last complete packet
+        last = os.path.join(snapshot["dir"], 'last.ts')
+        with open(segments[-1], 'rb') as src, open(last, 'wb') as dst:
+            remaining = snapshot["last_size"]
+            while remaining > 0:
+                chunk = src.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        segments[-1] = last
+
+        output_dir = self.config.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        filename = snapshot["time"].strftime("replay_%Y%m%d_%H%M%S.mp4")
+        output_path = os.path.join(output_dir, filename)
+
+        list_path = os.path.join(snapshot["dir"], 'concat.txt')
+        with open(list_path, 'w') as f:
+            for segment in segments:
+                f.write(f"file '{segment}'\n")
+
+        cmd = [
+            'ffmpeg', '-y',
+            '-f', 'concat', '-safe', '0',
+            '-i', list_path,
+            '-c', 'copy',
+        ]
+        if snapshot["audio"]:
+            cmd.extend(['-bsf:a', 'aac_adtstoasc'])
+        cmd.extend(['-movflags', '+faststart', output_path])
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            print("Replay save failed")
+            return None
+
+        print(f"Replay saved: {output_path}")
+        return output_path
+
+    def stop(self):
+        if self.process:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self._segment_dir:
+            shutil.rmtree(self._segment_dir, ignore_errors=True)
+            self._segment_dir = None
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
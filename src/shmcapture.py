@@ -0,0 +1,247 @@
+"""In-process screen capture through the X MIT-SHM extension.
+
+The X server copies the region straight into shared memory segments that
+Python also maps, and each frame is written from that mapping to the
+encoder's stdin without an intermediate copy. A fixed ring of segments
+doubles as the frame queue: when the encoder falls behind and no segment
+is free, the frame is dropped instead of queueing without bound.
+
+Uses libX11/libXext through ctypes, so no extra Python packages are
+needed.
+"""
+import ctypes
+import ctypes.util
+import os
+import queue
+import threading
+import time
+
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+Z_PIXMAP = 2
+ALL_PLANES = ctypes.c_ulong(-1).value
+SHMAT_FAILED = ctypes.c_void_p(-1).value
+
+
+class XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; the rest is never accessed
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+def _load_libraries():
+    x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+    xext = ctypes.CDLL(ctypes.util.find_library("Xext") or "libXext.so.6")
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+        ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint,
+    ]
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+        ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+    ]
+
+    libc.shmget.restype = ctypes.c_int
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    libc.free.argtypes = [ctypes.c_void_p]
+    return x11, xext, libc
+
+
+class ShmCapture:
+    """Captures a region at a fixed rate and writes raw bgr0 frames to a pipe.
+
+    The encoder should read them with:
+        -f rawvideo -pix_fmt bgr0 -video_size WxH -use_wallclock_as_timestamps 1
+    so frames dropped here still leave correct timestamps.
+    """
+
+    PIX_FMT = "bgr0"
+
+    def __init__(self, x, y, w, h, framerate, buffers=4):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.framerate = framerate
+        self.frames = 0  # Frames handed to the encoder
+        self.dropped = 0  # Frames skipped because capture or encoder fell behind
+
+        self._x11, self._xext, self._libc = _load_libraries()
+        self._display = None
+        self._images = []  # (XImage pointer, XShmSegmentInfo, memoryview)
+        self._free = queue.Queue()  # Buffer indexes ready to capture into
+        self._filled = queue.Queue()  # Buffer indexes waiting to be written
+        self._stop = threading.Event()
+        self._threads = []
+        self._open(buffers)
+
+    def _open(self, buffers):
+        x11, xext, libc = self._x11, self._xext, self._libc
+        self._display = x11.XOpenDisplay(None)  # Uses $DISPLAY
+        if not self._display:
+            raise RuntimeError("Cannot open X display")
+        if not xext.XShmQueryExtension(self._display):
+            self.close()
+            raise RuntimeError("X server does not support MIT-SHM")
+
+        screen = x11.XDefaultScreen(self._display)
+        self._root = x11.XRootWindow(self._display, screen)
+        visual = x11.XDefaultVisual(self._display, screen)
+        depth = x11.XDefaultDepth(self._display, screen)
+
+        try:
+            for i in range(buffers):
+                shminfo = XShmSegmentInfo()
+                image = xext.XShmCreateImage(self._display, visual, depth, Z_PIXMAP,
+                                             None, ctypes.byref(shminfo), self.w, self.h)
+                if not image:
+                    raise RuntimeError("XShmCreateImage failed")
+                if image.contents.bits_per_pixel != 32 or \
+                        image.contents.bytes_per_line != self.w * 4:
+                    libc.free(image)
+                    raise RuntimeError("Unsupported X visual for SHM capture")
+
+                size = image.contents.bytes_per_line * self.h
+                shminfo.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+                if shminfo.shmid < 0:
+                    libc.free(image)
+                    raise OSError(ctypes.get_errno(), "shmget failed")
+                shminfo.shmaddr = libc.shmat(shminfo.shmid, None, 0)
+                if shminfo.shmaddr in (None, SHMAT_FAILED):
+                    libc.shmctl(shminfo.shmid, IPC_RMID, None)
+                    libc.free(image)
+                    raise OSError(ctypes.get_errno(), "shmat failed")
+                image.contents.data = shminfo.shmaddr
+                shminfo.readOnly = 0
+                xext.XShmAttach(self._display, ctypes.byref(shminfo))
+                x11.XSync(self._display, 0)
+                # Both sides are attached; the segment goes away with the last detach
+                libc.shmctl(shminfo.shmid, IPC_RMID, None)
+
+                view = memoryview((ctypes.c_char * size).from_address(shminfo.shmaddr)).cast('B')
+                self._images.append((image, shminfo, view))
+                self._free.put(i)
+        except Exception:
+            self.close()
+            raise
+
+    def start(self, fd):
+        """Start capturing into the pipe file descriptor `fd`."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._write_loop, args=(fd,), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def request_stop(self):
+        """Stop capturing new frames without waiting."""
+        self._stop.set()
+
+    def stop(self):
+        """Stop capturing, flush queued frames and release X resources.
+
+        Blocks until queued frames are written, so the encoder must still be
+        reading or already have exited.
+        """
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.close()
+
+    def _capture_loop(self):
+        interval = 1.0 / self.framerate
+        next_time = time.monotonic()
+        image_ptrs = [image for image, _, _ in self._images]
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now < next_time:
+                self._stop.wait(next_time - now)
+                continue
+            # Skip ticks we already missed rather than bursting to catch up
+            missed = int((now - next_time) / interval)
+            if missed:
+                self.dropped += missed
+                next_time += missed * interval
+            next_time += interval
+
+            try:
+                index = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1  # Encoder is behind; every buffer is queued
+                continue
+            self._xext.XShmGetImage(self._display, self._root, image_ptrs[index],
+                                    self.x, self.y, ALL_PLANES)
+            self._filled.put(index)
+            self.frames += 1
+        self._filled.put(None)
+
+    def _write_loop(self, fd):
+        while True:
+            index = self._filled.get()
+            if index is None:
+                return
+            view = self._images[index][2]
+            try:
+                written = 0
+                while written < len(view):
+                    written += os.write(fd, view[written:])
+            except (BrokenPipeError, OSError):
+                self._stop.set()  # Encoder exited
+                return
+            self._free.put(index)
+
+    def close(self):
+        if not self._display:
+            return
+        for image, shminfo, view in self._images:
+            view.release()
+            self._xext.XShmDetach(self._display, ctypes.byref(shminfo))
+            self._libc.shmdt(shminfo.shmaddr)
+            # Data lives in the detached segment; only the struct is Xlib's
+            self._libc.free(image)
+        self._images = []
+        self._x11.XCloseDisplay(self._display)
+        self._display = None
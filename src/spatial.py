@@ -0,0 +1,61 @@
+"""Point lookup over stacked rectangles.
+
+Snap-to-window selection hit-tests the pointer against every window on
+screen for each motion event. RectIndex buckets the rectangles into a
+uniform grid once, so a lookup only looks at the few rectangles that
+overlap the pointer's grid cell.
+"""
+
+CELL_SIZE = 256
+
+
+class RectIndex:
+    """Topmost rectangle containing a point.
+
+    rects are (x, y, w, h) in stacking order, bottom first; later ones are
+    on top and win where they overlap.
+    """
+
+    def __init__(self, rects, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.rects = []
+        self._cells = {}  # (column, row) -> indexes into rects, bottom first
+        for rect in rects:
+            self.add(rect)
+
+    def add(self, rect):
+        """Add rect on top of everything already indexed."""
+        x, y, w, h = rect
+        if w <= 0 or h <= 0:
+            return
+        index = len(self.rects)
+        self.rects.append(rect)
+        size = self.cell_size
+        for column in range(x // size, (x + w - 1) // size + 1):
+            for row in range(y // size, (y + h - 1) // size + 1):
+                self._cells.setdefault((column, row), []).append(index)
+
+    def hit(self, x, y):
+        """The topmost rect containing (x, y), or None."""
+        cell = self._cells.get((x // self.cell_size, y // self.cell_size))
+        if not cell:
+            return None
+        for index in reversed(cell):
+            rx, ry, rw, rh = self.rects[index]
+            if rx <= x < rx + rw and ry <= y < ry + rh:
+                return self.rects[index]
+        return None
+
+    def __len__(self):
+        return len(self.rects)
+
+
+def clip_rect(rect, bounds):
+    """rect cut down to bounds (both (x, y, w, h)), or None if outside."""
+    x1 = max(rect[0], bounds[0])
+    y1 = max(rect[1], bounds[1])
+    x2 = min(rect[0] + rect[2], bounds[0] + bounds[2])
+    y2 = min(rect[1] + rect[3], bounds[1] + bounds[3])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app runs its modules from src/ as top-level imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import config
+from config import Config
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    monkeypatch.setattr(config, "CONFIG_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "CONFIG_FILE", str(path))
+    return path
+
+
+def saved(path):
+    return json.loads(path.read_text())
+
+
+def test_transaction_writes_once_at_the_end(config_file):
+    cfg = Config()
+    with cfg.transaction():
+        cfg.framerate = 60
+        cfg.quality_profile = "high"
+        assert saved(config_file)["framerate"] == 30  # Not written yet
+    assert saved(config_file)["framerate"] == 60
+    assert saved(config_file)["quality_profile"] == "high"
+
+
+def test_nested_transactions_write_at_the_outermost(config_file):
+    cfg = Config()
+    with cfg.transaction():
+        with cfg.transaction():
+            cfg.framerate = 24
+        assert saved(config_file)["framerate"] == 30
+    assert saved(config_file)["framerate"] == 24
+
+
+def test_transaction_without_changes_does_not_write(config_file):
+    cfg = Config()
+    config_file.write_text("{}")  # Would be overwritten by a save
+    with cfg.transaction():
+        pass
+    assert config_file.read_text() == "{}"
+
+
+def test_transaction_rolls_back_after_an_error(config_file):
+    cfg = Config()
+    before = config_file.read_text()
+    with pytest.raises(RuntimeError):
+        with cfg.transaction():
+            cfg.framerate = 15
+            cfg.extra_outputs = [{"format": "gif"}]
+            raise RuntimeError()
+    assert config_file.read_text() == before
+    assert cfg.framerate == 30
+    assert cfg.extra_outputs == []
+
+
+def test_error_in_nested_transaction_rolls_back_the_outermost(config_file):
+    cfg = Config()
+    with pytest.raises(RuntimeError):
+        with cfg.transaction():
+            cfg.framerate = 60
+            with cfg.transaction():
+                cfg.quality_profile = "high"
+                raise RuntimeError()
+    assert cfg.framerate == 30
+    assert cfg.quality_profile == "medium"
+    assert saved(config_file)["framerate"] == 30
+
+
+def test_in_memory_config_never_writes(config_file):
+    cfg = Config(persist=False)
+    with cfg.transaction():
+        cfg.framerate = 60
+    assert not config_file.exists()
@@ -0,0 +1,65 @@
+import pytest
+
+from control import ControlServer, PendingReply, parse_region
+
+
+def test_parse_region():
+    assert parse_region("0,0,1920,1080") == (0, 0, 1920, 1080)
+
+
+def test_parse_region_rounds_size_down_to_even():
+    assert parse_region("10,20,641,481") == (10, 20, 640, 480)
+
+
+def test_parse_region_allows_negative_position():
+    assert parse_region("-1920,0,800,600") == (-1920, 0, 800, 600)
+
+
+@pytest.mark.parametrize("text", ["", "1,2,3", "1,2,3,4,5", "a,b,c,d", "0,0,1.5,2"])
+def test_parse_region_rejects_malformed(text):
+    with pytest.raises(ValueError, match="X,Y,W,H"):
+        parse_region(text)
+
+
+@pytest.mark.parametrize("text", ["0,0,0,100", "0,0,1,100", "0,0,100,-4"])
+def test_parse_region_rejects_empty(text):
+    with pytest.raises(ValueError, match="empty"):
+        parse_region(text)
+
+
+def dispatch(handler, line="status"):
+    return ControlServer(handler, path="unused")._dispatch(line)
+
+
+def test_dispatch_reports_handler_failures():
+    def handler(command, args):
+        raise OSError("ffmpeg not found")
+
+    reply = dispatch(handler)
+    assert reply["ok"] is False
+    assert "ffmpeg not found" in reply["error"]
+
+
+def test_dispatch_reports_value_errors_as_given():
+    def handler(command, args):
+        raise ValueError("Not recording")
+
+    assert dispatch(handler, "stop") == {"ok": False, "error": "Not recording"}
+
+
+def test_pending_reply_is_sent_when_resolved():
+    pending = PendingReply()
+    assert dispatch(lambda command, args: pending) is pending
+    sent = []
+    pending._attach(sent.append)
+    assert sent == []
+    pending.resolve({"state": "recording"})
+    assert sent == [{"ok": True, "state": "recording"}]
+
+
+def test_pending_reply_resolved_before_attach_is_sent_right_away():
+    pending = PendingReply()
+    pending.fail("ffmpeg exited")
+    sent = []
+    pending._attach(sent.append)
+    assert sent == [{"ok": False, "error": "ffmpeg exited"}]
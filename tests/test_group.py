@@ -0,0 +1,67 @@
+import random
+
+from group import merge_stats, split_cpus
+from progress import parse_stats
+
+
+def test_equal_regions_get_equal_shares():
+    assert split_cpus([(0, 0, 100, 100), (100, 0, 100, 100)], [0, 1, 2, 3]) == [[0, 1], [2, 3]]
+
+
+def test_shares_follow_area():
+    # Spare CPUs are split 3:1 after each region gets one
+    assert split_cpus([(0, 0, 300, 100), (0, 0, 100, 100)], range(6)) == [[0, 1, 2, 3], [4, 5]]
+
+
+def test_cpus_are_sorted():
+    assert split_cpus([(0, 0, 10, 10), (0, 0, 10, 10)], {7, 5, 6, 4}) == [[4, 5], [6, 7]]
+
+
+def test_more_regions_than_cpus_share_round_robin():
+    regions = [(0, 0, 10, 10)] * 3
+    assert split_cpus(regions, [0, 1]) == [[0], [1], [0]]
+
+
+def test_every_cpu_is_used_once():
+    rng = random.Random(2)
+    for _ in range(200):
+        cpus = list(range(rng.randrange(2, 33)))
+        regions = [(0, 0, rng.randrange(2, 4000), rng.randrange(2, 3000))
+                   for _ in range(rng.randrange(1, len(cpus)))]
+        slices = split_cpus(regions, cpus)
+        assert len(slices) == len(regions)
+        assert all(slices)
+        assert sorted(cpu for cpu_slice in slices for cpu in cpu_slice) == cpus
+
+
+def stats(**values):
+    block = {"frame": "100", "fps": "30", "speed": "1.0x", "bitrate": "1000kbits/s",
+             "total_size": "1000", "out_time_us": "3000000", "progress": "continue"}
+    block.update(values)
+    return parse_stats(block)
+
+
+def test_merge_stats_takes_slowest_and_totals():
+    merged = merge_stats([stats(speed="0.8x", drop_frames="2", total_size="500"),
+                          stats(speed="1.1x", drop_frames="3", dup_frames="1")])
+    assert merged["speed"] == 0.8
+    assert merged["drop_frames"] == 5
+    assert merged["dup_frames"] == 1
+    assert merged["size_bytes"] == 1500
+    assert merged["bitrate_kbps"] == 2000
+    assert merged["ended"] is False
+
+
+def test_merge_stats_skips_missing_members_and_values():
+    merged = merge_stats([None, stats(speed="N/A"), stats(speed="0.9x")])
+    assert merged["speed"] == 0.9
+    assert merged["frame"] == 100
+
+
+def test_merge_stats_ended_only_when_all_ended():
+    assert merge_stats([stats(progress="end"), stats(progress="end")])["ended"] is True
+
+
+def test_merge_stats_without_stats():
+    assert merge_stats([None, None]) is None
+    assert merge_stats([]) is None
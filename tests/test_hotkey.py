@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("pynput.keyboard", exc_type=ImportError)  # Also needs an X display
+pytest.importorskip("gi")
+pytest.importorskip("Xlib")
+
+from hotkey import MODIFIER_MASKS, parse_hotkey  # noqa: E402
+
+SUPER = MODIFIER_MASKS["cmd"]
+SHIFT = MODIFIER_MASKS["shift"]
+CTRL = MODIFIER_MASKS["ctrl"]
+
+
+def test_modifiers_and_character():
+    assert parse_hotkey("<cmd>+<shift>+r") == (SUPER | SHIFT, ord("r"))
+
+
+def test_character_is_case_insensitive():
+    assert parse_hotkey("<ctrl>+R") == (CTRL, ord("r"))
+
+
+def test_super_is_an_alias_for_cmd():
+    assert parse_hotkey("<super>+g") == parse_hotkey("<cmd>+g")
+
+
+def test_named_keys():
+    assert parse_hotkey("<ctrl>+<print_screen>") == (CTRL, 0xff61)  # XK_Print
+    assert parse_hotkey("<f9>") == (0, 0xffc6)  # XK_F9
+
+
+@pytest.mark.parametrize("hotkey", [
+    "<ctrl>+<shift>",  # No key
+    "a+b",  # Two keys
+    "<ctrl>+ab",
+    "<ctrl>+<no_such_key>",
+    "<ctrl>+€",  # Outside Latin-1
+])
+def test_invalid_hotkeys(hotkey):
+    assert parse_hotkey(hotkey) is None
@@ -0,0 +1,34 @@
+from library import Library
+
+
+def make_library(tmp_path, rows):
+    library = Library(str(tmp_path / "library.db"), str(tmp_path / "thumbnails"))
+    with library._db:
+        library._db.executemany(
+            "INSERT INTO recordings VALUES (?, 0, 0, NULL, NULL, NULL, NULL, ?)", rows)
+    return library
+
+
+def test_pages_walk_newest_first_without_gaps(tmp_path):
+    # Ties on created are broken by path, newest-first like created
+    rows = [(f"/r/{name}{created}", created) for created in range(5) for name in "ab"]
+    library = make_library(tmp_path, rows)
+    seen = []
+    after = None
+    while True:
+        page = library.page(limit=3, after=after)
+        if not page:
+            break
+        seen.extend((entry["path"], entry["created"]) for entry in page)
+        after = (page[-1]["created"], page[-1]["path"])
+    assert seen == sorted(rows, key=lambda row: (row[1], row[0]), reverse=True)
+
+
+def test_pages_are_read_straight_off_the_index(tmp_path):
+    library = make_library(tmp_path, [])
+    plan = library._db.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM recordings WHERE (created, path) < (?, ?) "
+        "ORDER BY created DESC, path DESC LIMIT ?", (0, "", 50)).fetchall()
+    details = " ".join(row[-1] for row in plan)
+    assert "recordings_newest" in details
+    assert "TEMP B-TREE" not in details
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("gi")
+pytest.importorskip("cairo")
+
+from overlay import DAMAGE_MARGIN, selection_damage  # noqa: E402
+
+
+def test_no_cutout_before_or_after_damages_nothing():
+    assert selection_damage(None, None).is_empty()
+
+
+def test_new_cutout_damages_it_and_its_border():
+    damage = selection_damage(None, (100, 100, 50, 40))
+    assert damage.contains_point(125, 120)
+    assert damage.contains_point(100 - DAMAGE_MARGIN, 100 - DAMAGE_MARGIN)
+    assert not damage.contains_point(100 - DAMAGE_MARGIN - 1, 120)
+    assert not damage.contains_point(151 + DAMAGE_MARGIN, 120)
+
+
+def test_removed_cutout_damages_all_of_it():
+    damage = selection_damage((100, 100, 50, 40), None)
+    assert damage.contains_point(125, 120)
+
+
+def test_growing_damages_only_the_band_between():
+    damage = selection_damage((0, 0, 100, 100), (0, 0, 150, 100))
+    assert damage.contains_point(125, 50)  # Newly cleared
+    assert damage.contains_point(100, 50)  # Old border stroke
+    assert not damage.contains_point(50, 50)  # Clear before and after
+    assert not damage.contains_point(300, 300)  # Dark before and after
+
+
+def test_unchanged_cutout_damages_only_the_border():
+    damage = selection_damage((0, 0, 100, 100), (0, 0, 100, 100))
+    assert not damage.is_empty()
+    assert damage.contains_point(0, 50)
+    assert not damage.contains_point(50, 50)
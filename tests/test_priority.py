@@ -0,0 +1,34 @@
+import os
+import shutil
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from priority import background_wrapper, capture_wrapper
+
+
+def test_background_wrapper_is_empty_when_disabled():
+    assert background_wrapper(SimpleNamespace(background_low_priority=False)) == []
+
+
+def test_capture_wrapper_is_empty_at_default_priority():
+    config = SimpleNamespace(capture_priority="normal", capture_cpus="")
+    assert capture_wrapper(config) == []
+
+
+def test_capture_wrapper_pins_to_allowed_cpus():
+    cpu = min(os.sched_getaffinity(0))
+    config = SimpleNamespace(capture_priority="normal", capture_cpus=f"{cpu},{cpu}")
+    if not shutil.which("taskset"):
+        pytest.skip("taskset is not installed")
+    assert capture_wrapper(config) == ['taskset', '-c', str(cpu)]
+
+
+def test_background_wrapper_runs_the_command_at_nice_19():
+    if not shutil.which("nice"):
+        pytest.skip("nice is not installed")
+    wrapper = background_wrapper(SimpleNamespace(background_low_priority=True))
+    result = subprocess.run(wrapper + ['sh', '-c', 'cut -d" " -f19 /proc/self/stat'],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "19"
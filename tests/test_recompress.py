@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import recompress
+from recompress import DONE, Recompressor
+
+
+class FakeFfmpeg:
+    """Stands in for an ffmpeg encode: writes a small output file."""
+
+    spawned = []
+
+    def __init__(self, cmd, **kwargs):
+        self.spawned.append(cmd)
+        with open(cmd[-1], 'wb') as f:
+            f.write(b"\0" * 10)
+
+    def wait(self):
+        return 0
+
+    def poll(self):
+        return 0
+
+    def terminate(self):
+        pass
+
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    monkeypatch.setattr(recompress, "STATE_FILE", str(tmp_path / "state.json"))
+    FakeFfmpeg.spawned = []
+    monkeypatch.setattr(recompress.subprocess, "Popen", FakeFfmpeg)
+
+    def slow_probe(path):
+        time.sleep(0.2)  # Leaves other workers time to look for work
+        return 1.0, 100, 100, "h264"
+
+    monkeypatch.setattr(recompress, "probe", slow_probe)
+    monkeypatch.setattr(recompress, "x264_crf", lambda path: 23.0)
+    monkeypatch.setattr(Recompressor, "_is_idle", lambda self: True)
+    output_dir = tmp_path / "recordings"
+    output_dir.mkdir()
+    return output_dir
+
+
+def make_recording(directory, name):
+    path = directory / name
+    path.write_bytes(b"\0" * 1000)
+    old = time.time() - recompress.MIN_AGE_SECONDS - 60
+    os.utime(path, (old, old))
+    return str(path)
+
+
+def test_workers_never_encode_the_same_file_twice(recordings):
+    path = make_recording(recordings, "recording_20240101_120000.mp4")
+    config = SimpleNamespace(output_dir=str(recordings), recompress_workers=2,
+                             recompress_preset="slow", background_low_priority=False)
+    done = threading.Event()
+    recompressor = Recompressor(config)
+    recompressor.on_update = lambda: (recompressor.statuses()[path]["status"] == DONE
+                                      and done.set())
+    recompressor.start()
+    try:
+        assert done.wait(5)
+        time.sleep(0.5)  # Give the second worker a chance to pick it up again
+    finally:
+        recompressor.stop()
+    assert len(FakeFfmpeg.spawned) == 1
+    assert os.path.getsize(path) == 10
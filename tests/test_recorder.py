@@ -0,0 +1,45 @@
+from recorder import Recorder, with_bitrate
+
+
+def test_with_bitrate_replaces_crf_with_capped_bitrate():
+    args = with_bitrate(['-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-pix_fmt', 'yuv420p'],
+                        800.7)
+    assert '-crf' not in args
+    assert args == ['-c:v', 'libx264', '-preset', 'fast', '-pix_fmt', 'yuv420p',
+                    '-b:v', '800k', '-maxrate', '800k', '-bufsize', '1600k']
+
+
+def test_with_bitrate_drops_vp9_constant_quality_options():
+    args = with_bitrate(['-c:v', 'libvpx-vp9', '-crf', '31', '-b:v', '0', '-g', '60'], 500)
+    assert args == ['-c:v', 'libvpx-vp9', '-g', '60',
+                    '-b:v', '500k', '-maxrate', '500k', '-bufsize', '1000k']
+
+
+def test_with_bitrate_drops_lossless():
+    args = with_bitrate(['-c:v', 'libvpx-vp9', '-lossless', '1'], 500)
+    assert '-lossless' not in args
+
+
+def test_with_bitrate_gives_svtav1_no_peak_cap():
+    # -maxrate equal to -b:v is CBR to SVT-AV1, which it rejects
+    args = with_bitrate(['-c:v', 'libsvtav1', '-preset', '10', '-crf', '33'], 500)
+    assert args == ['-c:v', 'libsvtav1', '-preset', '10', '-b:v', '500k']
+
+
+def test_size_fit_within_budget_keeps_the_output(tmp_path):
+    output = tmp_path / "recording.mp4"
+    output.write_bytes(b"\0" * 100)
+    assert Recorder._size_fit_result(str(output), str(output), 100) == str(output)
+
+
+def test_size_fit_over_budget_after_last_pass_fails(tmp_path):
+    output = tmp_path / "recording.mp4"
+    output.write_bytes(b"\0" * 101)
+    assert Recorder._size_fit_result(str(output), str(output), 100) is None
+    assert output.exists()  # The only copy of the recording
+
+
+def test_size_fit_with_failed_conversion_fails(tmp_path):
+    output = tmp_path / "recording.mp4"
+    kept = tmp_path / "recording_capture.mkv"
+    assert Recorder._size_fit_result(str(kept), str(output), 100) is None
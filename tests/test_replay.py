@@ -0,0 +1,64 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from replay import ReplayBuffer
+
+
+class RunningProcess:
+    def poll(self):
+        return None
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    replay = ReplayBuffer(SimpleNamespace())
+    replay.process = RunningProcess()
+    replay._segment_dir = str(tmp_path / "ring")
+    os.mkdir(replay._segment_dir)
+    return replay
+
+
+def write_segments(replay, ages):
+    """Segments closed `age` seconds ago, oldest first; the last is being written."""
+    now = time.time()
+    for number, age in enumerate(ages):
+        path = os.path.join(replay._segment_dir, f"segment{number:06d}.ts")
+        with open(path, 'wb') as f:
+            f.write(b"\0" * 188)
+        os.utime(path, (now - age, now - age))
+
+
+def pinned(snapshot):
+    return [os.path.basename(path) for path in snapshot["segments"]]
+
+
+def test_snapshot_takes_the_fewest_segments_covering_the_window(buffer):
+    buffer.seconds = 6
+    # The newest segment has been written for 1.5 s; two more closed ones
+    # would leave it at 5.5 s, so three are needed
+    write_segments(buffer, [9.5, 7.5, 5.5, 3.5, 1.5, 0])
+    assert pinned(buffer.snapshot()) == ["segment000002.ts", "segment000003.ts",
+                                         "segment000004.ts", "segment000005.ts"]
+
+
+def test_snapshot_skips_a_segment_the_open_one_makes_up_for(buffer):
+    buffer.seconds = 5
+    # Nearly 2 s into the newest segment: two closed ones are enough
+    write_segments(buffer, [9.9, 7.9, 5.9, 3.9, 1.9, 0])
+    assert pinned(buffer.snapshot()) == ["segment000003.ts", "segment000004.ts",
+                                         "segment000005.ts"]
+
+
+def test_snapshot_takes_everything_when_the_buffer_is_short(buffer):
+    buffer.seconds = 30
+    write_segments(buffer, [3, 1, 0])
+    assert pinned(buffer.snapshot()) == ["segment000000.ts", "segment000001.ts",
+                                         "segment000002.ts"]
+
+
+def test_snapshot_of_an_empty_ring(buffer):
+    buffer.seconds = 6
+    assert buffer.snapshot() is None
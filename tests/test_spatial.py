@@ -0,0 +1,55 @@
+import random
+
+from spatial import RectIndex, clip_rect
+
+
+def brute_force_hit(rects, x, y):
+    for rx, ry, rw, rh in reversed(rects):
+        if rx <= x < rx + rw and ry <= y < ry + rh:
+            return rx, ry, rw, rh
+    return None
+
+
+def test_topmost_rect_wins():
+    index = RectIndex([(0, 0, 500, 500), (100, 100, 50, 50)])
+    assert index.hit(120, 120) == (100, 100, 50, 50)
+    assert index.hit(10, 10) == (0, 0, 500, 500)
+
+
+def test_edges_are_half_open():
+    index = RectIndex([(10, 20, 30, 40)])
+    assert index.hit(10, 20) == (10, 20, 30, 40)
+    assert index.hit(39, 59) == (10, 20, 30, 40)
+    assert index.hit(40, 30) is None
+    assert index.hit(20, 60) is None
+
+
+def test_negative_coordinates():
+    # Monitors left of or above the primary one
+    index = RectIndex([(-1920, -300, 1920, 1080)])
+    assert index.hit(-1, -1) == (-1920, -300, 1920, 1080)
+    assert index.hit(0, 0) is None
+
+
+def test_empty_rects_are_skipped():
+    index = RectIndex([(0, 0, 0, 100), (0, 0, 100, -5)])
+    assert len(index) == 0
+    assert index.hit(0, 0) is None
+
+
+def test_matches_brute_force():
+    rng = random.Random(1)
+    rects = [(rng.randrange(-500, 3000), rng.randrange(-500, 2000),
+              rng.randrange(1, 1200), rng.randrange(1, 900)) for _ in range(60)]
+    index = RectIndex(rects, cell_size=128)
+    for _ in range(2000):
+        x, y = rng.randrange(-600, 4300), rng.randrange(-600, 3000)
+        assert index.hit(x, y) == brute_force_hit(rects, x, y)
+
+
+def test_clip_rect():
+    bounds = (0, 0, 1920, 1080)
+    assert clip_rect((100, 100, 200, 200), bounds) == (100, 100, 200, 200)
+    assert clip_rect((-50, 1000, 200, 200), bounds) == (0, 1000, 150, 80)
+    assert clip_rect((1920, 0, 10, 10), bounds) is None
+    assert clip_rect((-10, -10, 10, 10), bounds) is None